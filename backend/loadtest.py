@@ -0,0 +1,234 @@
+"""Scenario load tests for the API.
+
+    python loadtest.py                                  # in-process (ASGI transport, same DB as the server)
+    python loadtest.py --url http://localhost:8001      # against a running server
+    python loadtest.py --update-baseline                # record the current numbers as the baseline
+    python loadtest.py --scenarios publish_lesson,admin_dashboard --threshold 0.2
+
+Every run re-seeds the database (demo data plus a synthetic course with --course-size
+students), so never point it at a database you care about. Reseeding needs the demo admin,
+so load the demo data once with seed.py first (or run the server with SEED_OPEN=true). Throughput and p50/p95/p99
+per endpoint are compared with loadtest_baseline.json; the run exits 1 when a scenario's
+throughput drops, or an endpoint's p95 grows, by more than --threshold. Baselines are
+machine specific: record them on the machine that runs the comparison.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+
+import httpx
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "loadtest_baseline.json")
+ADMIN = {"email": "admin@kidsintech.school", "password": "innovate@2025"}
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values: return 0.0
+    return sorted_values[min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))]
+
+
+class Recorder:
+    """Latencies per endpoint name plus wall time per scenario."""
+    def __init__(self):
+        self.samples = defaultdict(lambda: defaultdict(list))
+        self.errors = defaultdict(lambda: defaultdict(int))
+        self.wall = {}
+        self.scenario = None
+
+    async def call(self, client, name, method, url, token=None, **kwargs):
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+        start = time.perf_counter()
+        response = await client.request(method, url, headers=headers, **kwargs)
+        self.samples[self.scenario][name].append((time.perf_counter() - start) * 1000)
+        if response.status_code >= 400: self.errors[self.scenario][name] += 1
+        return response
+
+    def report(self):
+        out = {}
+        for scenario, endpoints in self.samples.items():
+            total = sum(len(v) for v in endpoints.values())
+            out[scenario] = {"requests": total, "wall_s": round(self.wall[scenario], 3),
+                             "throughput_rps": round(total / self.wall[scenario], 2) if self.wall[scenario] else 0.0, "endpoints": {}}
+            for name, values in endpoints.items():
+                values = sorted(values)
+                out[scenario]["endpoints"][name] = {"n": len(values), "errors": self.errors[scenario][name],
+                                                    "p50": round(percentile(values, 50), 2), "p95": round(percentile(values, 95), 2),
+                                                    "p99": round(percentile(values, 99), 2)}
+        return out
+
+
+async def gather_limited(limit, coros):
+    sem = asyncio.Semaphore(limit)
+    async def run(c):
+        async with sem: return await c
+    return await asyncio.gather(*(run(c) for c in coros))
+
+
+async def login(client, email, password):
+    r = await client.post("/api/auth/login", json={"email": email, "password": password})
+    r.raise_for_status()
+    return r.json()["token"]
+
+
+async def prepare(client, args):
+    """Seed, then locate the big synthetic course, one of its modules and its quiz."""
+    r = await client.post("/api/seed", json={"seed": args.seed, "students": args.course_size, "courses": 2, "enrollments": 2,
+                                              "modules": 2, "lessons": 3, "quizzes": 1, "questions": 5},
+                          headers={"Authorization": f"Bearer {await login(client, **ADMIN)}"}, timeout=None)
+    r.raise_for_status()
+    admin = await login(client, **ADMIN)
+    headers = {"Authorization": f"Bearer {admin}"}
+    courses = (await client.get("/api/courses", headers=headers)).json()
+    course = next((c for c in courses if c["course_id"].startswith("course_syn") and c["status"] == "published"), None)
+    if not course: sys.exit(f"Seed {args.seed} produced no published synthetic course; try another --seed")
+    modules = (await client.get(f"/api/courses/{course['course_id']}/modules", headers=headers)).json()
+    quiz = (await client.get("/api/quizzes", params={"course_id": course["course_id"]}, headers=headers)).json()[0]
+    return {"admin": admin, "course_id": course["course_id"], "module_id": modules[0]["module_id"], "quiz": quiz, "tokens": {}}
+
+
+async def student_tokens(client, ctx, n, concurrency):
+    missing = [i for i in range(n) if i not in ctx["tokens"]]
+    tokens = await gather_limited(concurrency, (login(client, f"syn{i:06d}@student.kidsintech.school", "student123") for i in missing))
+    ctx["tokens"].update(zip(missing, tokens))
+    return [ctx["tokens"][i] for i in range(n)]
+
+
+async def term_start_logins(client, rec, ctx, args):
+    """Students arrive together: log in, then load the dashboard and header."""
+    async def student(i):
+        r = await rec.call(client, "POST /api/auth/login", "POST", "/api/auth/login",
+                           json={"email": f"syn{i:06d}@student.kidsintech.school", "password": "student123"})
+        token = ctx["tokens"][i] = r.json()["token"]
+        await rec.call(client, "GET /api/auth/me", "GET", "/api/auth/me", token)
+        await rec.call(client, "GET /api/enrollments", "GET", "/api/enrollments", token)
+        await rec.call(client, "GET /api/notifications", "GET", "/api/notifications", token)
+        await rec.call(client, "GET /api/courses", "GET", "/api/courses", token)
+    await gather_limited(args.concurrency, (student(i) for i in range(args.logins)))
+
+
+async def quiz_submission(client, rec, ctx, args):
+    """A whole class submits the same quiz at the bell."""
+    tokens = await student_tokens(client, ctx, args.class_size, args.concurrency)
+    quiz, rng = ctx["quiz"], random.Random(args.seed)
+    answers = [[{"question_id": q["question_id"], "answer": rng.choice(q["options"])} for q in quiz["questions"]] for _ in tokens]
+    start = time.perf_counter()
+    await gather_limited(args.concurrency, (rec.call(client, "POST /api/quizzes/{quiz_id}/attempt", "POST", f"/api/quizzes/{quiz['quiz_id']}/attempt",
+                                                     token, json={"answers": a}) for token, a in zip(tokens, answers)))
+    return time.perf_counter() - start
+
+
+async def publish_lesson(client, rec, ctx, args):
+    """An instructor publishes lessons one after another to the --course-size course."""
+    for n in range(args.publishes):
+        await rec.call(client, "POST /api/modules/{module_id}/lessons", "POST", f"/api/modules/{ctx['module_id']}/lessons", ctx["admin"],
+                       json={"title": f"Load test lesson {n + 1}", "content": "<p>New material</p>", "status": "published"}, timeout=None)
+
+
+async def admin_dashboard(client, rec, ctx, args):
+    """Admins refreshing the dashboard and its neighbouring pages."""
+    pages = ["/api/analytics/overview", "/api/analytics/students", "/api/users", "/api/courses", "/api/notifications"]
+    async def refresh():
+        for page in pages:
+            await rec.call(client, f"GET {page}", "GET", page, ctx["admin"])
+    await gather_limited(args.concurrency, (refresh() for _ in range(args.refreshes)))
+
+
+SCENARIOS = {"term_start_logins": term_start_logins, "quiz_submission": quiz_submission,
+             "publish_lesson": publish_lesson, "admin_dashboard": admin_dashboard}
+
+
+def compare(report, baseline, threshold):
+    regressions = []
+    for scenario, cur in report.items():
+        base = baseline.get(scenario)
+        if not base: continue
+        if cur["throughput_rps"] < base["throughput_rps"] * (1 - threshold):
+            regressions.append(f"{scenario}: throughput {cur['throughput_rps']} rps < baseline {base['throughput_rps']} rps")
+        for name, stats in cur["endpoints"].items():
+            b = base["endpoints"].get(name)
+            if b and stats["p95"] > b["p95"] * (1 + threshold):
+                regressions.append(f"{scenario} {name}: p95 {stats['p95']}ms > baseline {b['p95']}ms")
+    return regressions
+
+
+def print_report(report):
+    print(f"{'scenario / endpoint':<58}{'n':>6}{'err':>5}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for scenario, cur in report.items():
+        print(f"{scenario} ({cur['requests']} requests in {cur['wall_s']}s, {cur['throughput_rps']} rps)")
+        for name, s in cur["endpoints"].items():
+            print(f"  {name:<56}{s['n']:>6}{s['errors']:>5}{s['p50']:>10}{s['p95']:>10}{s['p99']:>10}")
+
+
+async def run(args):
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url.rstrip("/"), timeout=60)
+        lifespan = None
+    else:
+        from server import app
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://loadtest", timeout=60)
+        lifespan = app.router.lifespan_context(app)
+        await lifespan.__aenter__()
+    rec = Recorder()
+    try:
+        ctx = await prepare(client, args)
+        for name in args.scenarios.split(","):
+            rec.scenario = name
+            start = time.perf_counter()
+            timed = await SCENARIOS[name](client, rec, ctx, args)
+            # Scenarios with untimed setup (logging the class in) return their own wall time
+            rec.wall[name] = timed if timed is not None else time.perf_counter() - start
+    finally:
+        await client.aclose()
+        if lifespan: await lifespan.__aexit__(None, None, None)
+    return rec.report()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run API load-test scenarios and compare against a baseline.")
+    parser.add_argument("--url", help="base URL of a running server; omit to run in-process")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--course-size", type=int, default=5000, help="students enrolled in the course lessons are published to")
+    parser.add_argument("--logins", type=int, default=500)
+    parser.add_argument("--class-size", type=int, default=200)
+    parser.add_argument("--publishes", type=int, default=3)
+    parser.add_argument("--refreshes", type=int, default=50)
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed relative regression, 0.25 = 25%%")
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--output", help="also write this run's report to a JSON file")
+    args = parser.parse_args()
+    unknown = set(args.scenarios.split(",")) - set(SCENARIOS)
+    if unknown: parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    if max(args.logins, args.class_size) > args.course_size: parser.error("--logins and --class-size cannot exceed --course-size")
+
+    report = asyncio.run(run(args))
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as f: json.dump(report, f, indent=2)
+    if args.update_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f: baseline = json.load(f)
+        baseline.update(report)
+        with open(args.baseline, "w") as f: json.dump(baseline, f, indent=2)
+        print(f"Baseline written to {args.baseline}")
+        return
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --update-baseline to record one")
+        return
+    with open(args.baseline) as f: baseline = json.load(f)
+    regressions = compare(report, baseline, args.threshold)
+    for r in regressions: print(f"REGRESSION {r}")
+    if regressions: sys.exit(1)
+    print(f"No regressions beyond {args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Exchange OAuth callback session_ids for user data over one pooled httpx client."""
+import time
+import random
+import asyncio
+from collections import OrderedDict
+
+import httpx
+
+try:
+    import h2  # noqa: F401  (httpx negotiates HTTP/2 over TLS only when h2 is installed)
+    HTTP2 = True
+except ImportError:
+    HTTP2 = False
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class SessionExchangeError(Exception):
+    """The upstream could not be reached or kept failing after all retries."""
+
+
+class SessionExchange:
+    """One application-lifetime client plus a short-lived cache of exchanged session_ids.
+
+    The auth callback page can post the same session_id twice (remounts, double clicks);
+    the second call is answered from the cache, or joins the in-flight request."""
+
+    def __init__(self, url, timeout=httpx.Timeout(10.0, connect=3.0), retries=3, backoff=0.2,
+                 cache_ttl=300, cache_size=1024, transport=None):
+        self.url, self.timeout, self.retries, self.backoff = url, timeout, retries, backoff
+        self.cache_ttl, self.cache_size, self.transport = cache_ttl, cache_size, transport
+        self.client = None
+        self.cache = OrderedDict()  # session_id -> (expires_at, data)
+        self.inflight = {}  # session_id -> Task
+
+    async def start(self):
+        if self.client is None:
+            self.client = httpx.AsyncClient(
+                http2=HTTP2, timeout=self.timeout, transport=self.transport,
+                limits=httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=60))
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+    async def fetch(self, session_id):
+        """User data for session_id, or None if the upstream rejects it."""
+        hit = self.cache.get(session_id)
+        if hit and hit[0] > time.monotonic():
+            self.cache.move_to_end(session_id)
+            return hit[1]
+        # The exchange runs as its own task: a caller that disconnects cancels only its own
+        # wait, never the request the other callers are sharing.
+        task = self.inflight.get(session_id)
+        if task is None:
+            task = self.inflight[session_id] = asyncio.ensure_future(self._exchange(session_id))
+            task.add_done_callback(lambda t: self._finished(session_id, t))
+        return await asyncio.shield(task)
+
+    def _finished(self, session_id, task):
+        if self.inflight.get(session_id) is task: del self.inflight[session_id]
+        if not task.cancelled(): task.exception()  # mark retrieved when every caller had gone
+
+    async def _exchange(self, session_id):
+        data = await self._fetch(session_id)
+        if data is not None:
+            self.cache[session_id] = (time.monotonic() + self.cache_ttl, data)
+            self.cache.move_to_end(session_id)
+            while len(self.cache) > self.cache_size: self.cache.popitem(last=False)
+        return data
+
+    async def _fetch(self, session_id):
+        await self.start()
+        for attempt in range(self.retries + 1):
+            last = attempt == self.retries
+            try:
+                resp = await self.client.get(self.url, headers={"X-Session-ID": session_id})
+            except httpx.TransportError as e:
+                if last: raise SessionExchangeError(f"Auth upstream unreachable: {e!r}") from e
+            else:
+                if resp.status_code == 200: return resp.json()
+                if resp.status_code not in RETRY_STATUSES: return None
+                if last: raise SessionExchangeError(f"Auth upstream returned {resp.status_code}")
+            # Exponential backoff with jitter: 0.2s, 0.4s, 0.8s ... (+/- 50%)
+            await asyncio.sleep(self.backoff * 2 ** attempt * random.uniform(0.5, 1.5))
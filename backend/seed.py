@@ -0,0 +1,30 @@
+"""Load the demo data plus synthetic volume straight into MongoDB.
+
+    python seed.py --students 100000 --courses 200 --attempts 500000 --submissions 200000 --events 2000000
+
+Uses MONGO_URL / DB_NAME from the environment (or backend/.env) like the server.
+Running servers pick the new data up on restart, which rebuilds their search index.
+
+POST /api/seed needs a super admin, so a fresh database (which has none yet) is loaded
+with this script first. Development servers started with SEED_OPEN=true let anyone reseed.
+"""
+import argparse
+import time
+
+from server import SEED_DEFAULTS, seed_dataset
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Wipe the database and seed demo + synthetic data.")
+    for key, default in SEED_DEFAULTS.items():
+        parser.add_argument(f"--{key}", type=int, default=default)
+    params = vars(parser.parse_args())
+    start = time.perf_counter()
+    stats = seed_dataset(params)
+    for col, n in stats.items():
+        print(f"{col:>15} {n:>10}")
+    print(f"Seeded in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,73 @@
 import os
+import re
+import html
+import math
+import time
 import uuid
+import socket
+import asyncio
+import logging
+import threading
+import sys
+import io
+import csv
+import json
+from contextvars import ContextVar
+import bisect
 import random
-import httpx
+import hashlib
+import functools
+import multiprocessing
+import mimetypes
+import ipaddress
+import orjson
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from email.utils import formatdate
+from urllib.parse import urlsplit, urljoin, quote
+from collections import OrderedDict, defaultdict, deque
 from datetime import datetime, timezone, timedelta
+import httpx
 from dotenv import load_dotenv
 load_dotenv()
 
 from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import JSONResponse, ORJSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from pymongo import MongoClient
+from starlette.middleware.gzip import GZipMiddleware, GZipResponder
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+from pymongo import MongoClient, UpdateOne, ReturnDocument, monitoring
+from pymongo.errors import PyMongoError, OperationFailure, BulkWriteError
 from jose import jwt, JWTError
 from passlib.context import CryptContext
-from typing import Optional
-
-app = FastAPI()
+from pydantic import BaseModel, ConfigDict
+from typing import Generic, Optional, TypeVar, Union
+from oauth_client import SessionExchange, SessionExchangeError
+import similarity
+import certificate_render
+import thumbnails
+
+class ZeroCopyGZipResponder(GZipResponder):
+    async def send_with_gzip(self, message):
+        if message["type"] != "http.response.zerocopy": return await super().send_with_gzip(message)
+        # Only RangeFileResponse sends these, with Content-Encoding: identity, so there is nothing to compress
+        if not self.started:
+            self.started = True
+            await self.send(self.initial_message)
+        await self.send(message)
+
+class ZeroCopyGZipMiddleware(GZipMiddleware):
+    """GZipMiddleware that passes http.response.zerocopy messages through instead of dropping them.
+
+    Only matters under an ASGI server that offers the zero-copy extension; the pinned
+    uvicorn does not, so there RangeFileResponse never sends one and this is plain gzip."""
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and "gzip" in Headers(scope=scope).get("Accept-Encoding", ""):
+            return await ZeroCopyGZipResponder(self.app, self.minimum_size, compresslevel=self.compresslevel)(scope, receive, send)
+        await self.app(scope, receive, send)
+
+app = FastAPI(default_response_class=ORJSONResponse)
 app.add_middleware(
     CORSMiddleware,
     allow_origin_regex=r".*",
@@ -21,20 +75,266 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
-
-client = MongoClient(os.environ["MONGO_URL"])
+app.add_middleware(ZeroCopyGZipMiddleware, minimum_size=1024)
+
+# ============ QUERY ACCOUNTING ============
+# Every Mongo command is attributed to the request that issued it through a contextvar.
+# Handlers call pymongo synchronously on the request's own context, so the listener
+# (which runs in the calling thread) always sees the right counters.
+request_stats = ContextVar("request_stats", default=None)
+route_stats = defaultdict(lambda: {"requests": 0, "queries": 0, "max_queries": 0, "db_ms": 0.0, "docs": 0})
+
+# Per-route command budgets, "METHOD /route/template" -> max commands. With
+# QUERY_BUDGET_MODE=enforce (test runs) a request over budget fails with 500.
+QUERY_BUDGET_DEFAULT = int(os.environ.get("QUERY_BUDGET_DEFAULT", "100"))
+QUERY_BUDGETS = json.loads(os.environ.get("QUERY_BUDGETS", "{}"))
+QUERY_BUDGET_MODE = os.environ.get("QUERY_BUDGET_MODE", "warn")
+
+class QueryCounter(monitoring.CommandListener):
+    def started(self, event):
+        stats = request_stats.get()
+        if stats is not None: stats["queries"] += 1
+
+    def succeeded(self, event):
+        stats = request_stats.get()
+        if stats is None: return
+        stats["db_ms"] += event.duration_micros / 1000
+        reply = event.reply
+        if "cursor" in reply:
+            stats["docs"] += len(reply["cursor"].get("firstBatch", reply["cursor"].get("nextBatch", [])))
+        elif reply.get("value") is not None:
+            stats["docs"] += 1
+
+    def failed(self, event):
+        stats = request_stats.get()
+        if stats is not None: stats["db_ms"] += event.duration_micros / 1000
+
+# ============ METRICS ============
+# Prometheus text exposition without a client library: a handful of histograms and
+# plain counters, all updated from the event loop or under the GIL with single ops.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+WAIT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5)
+
+class Histogram:
+    def __init__(self, name, doc, buckets, labels=()):
+        self.name, self.doc, self.buckets, self.labels = name, doc, buckets, labels
+        self.series = {}
+
+    def observe(self, value, *label_values):
+        s = self.series.get(label_values)
+        if s is None: s = self.series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+        s[0][bisect.bisect_left(self.buckets, value)] += 1
+        s[1] += value
+
+    def expose(self):
+        lines = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} histogram"]
+        for values, (counts, total) in sorted(self.series.items()):
+            labels = ",".join(f'{k}="{v}"' for k, v in zip(self.labels, values))
+            sep = "," if labels else ""
+            cum = 0
+            for le, c in zip((*self.buckets, "+Inf"), counts):
+                cum += c
+                lines.append(f'{self.name}_bucket{{{labels}{sep}le="{le}"}} {cum}')
+            lines.append(f"{self.name}_sum{{{labels}}} {total:.6f}")
+            lines.append(f"{self.name}_count{{{labels}}} {cum}")
+        return lines
+
+request_latency = Histogram("kit_http_request_duration_seconds", "Request latency by route template.", LATENCY_BUCKETS, ("method", "route"))
+request_counts = defaultdict(int)  # (method, route, status) -> requests
+loop_lag = Histogram("kit_event_loop_lag_seconds", "Delay of a periodic event loop wakeup past its deadline.", WAIT_BUCKETS)
+pool_wait = Histogram("kit_mongo_pool_checkout_seconds", "Time spent waiting to check a connection out of the pymongo pool.", WAIT_BUCKETS)
+gauges = {"in_flight": 0, "loop_lag": 0.0, "bcrypt_pending": 0, "pool_checked_out": 0, "pool_checkout_failures": 0}
+cache_counts = defaultdict(int)  # "hit" / "miss" / "not_modified" for the response cache
+cert_counts = defaultdict(int)  # "evaluated" / "issued" by the sweeper, "rendered" / "render_hit" by downloads
+image_counts = defaultdict(int)  # "hit" / "rendered" / "evicted" variants, "fetched" / "fetch_failed" / "source_evicted" sources
+
+class PoolMonitor(monitoring.ConnectionPoolListener):
+    """Checkout wait per operation; the start timestamp is per thread since checkout blocks the caller."""
+    def __init__(self):
+        self.local = threading.local()
+
+    def connection_check_out_started(self, event): self.local.start = time.perf_counter()
+
+    def connection_checked_out(self, event):
+        pool_wait.observe(time.perf_counter() - getattr(self.local, "start", time.perf_counter()))
+        gauges["pool_checked_out"] += 1
+
+    def connection_check_out_failed(self, event):
+        pool_wait.observe(time.perf_counter() - getattr(self.local, "start", time.perf_counter()))
+        gauges["pool_checkout_failures"] += 1
+
+    def connection_checked_in(self, event): gauges["pool_checked_out"] -= 1
+    def pool_created(self, event): pass
+    def pool_ready(self, event): pass
+    def pool_cleared(self, event): pass
+    def pool_closed(self, event): pass
+    def connection_created(self, event): pass
+    def connection_ready(self, event): pass
+    def connection_closed(self, event): pass
+
+client = MongoClient(os.environ["MONGO_URL"], event_listeners=[QueryCounter(), PoolMonitor()])
 db = client[os.environ["DB_NAME"]]
 
+# ============ PROFILING ============
+# A sampler thread snapshots the event loop thread's stack while one request runs.
+# Handlers interleave at await points, so a profile can include frames from other
+# requests that ran concurrently; under light load it is the request's own stack.
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_INTERVAL = float(os.environ.get("PROFILE_INTERVAL", "0.001"))
+SLOW_REQUEST_MS = float(os.environ.get("SLOW_REQUEST_MS", "1000"))
+profiles = deque(maxlen=int(os.environ.get("PROFILE_BUFFER", "20")))
+slow_requests = deque(maxlen=200)
+
+class StackSampler(threading.Thread):
+    def __init__(self, thread_id):
+        super().__init__(daemon=True, name="profiler")
+        self.thread_id, self.stop_event = thread_id, threading.Event()
+        self.stacks = defaultdict(int)  # (frame key, ...) root first -> samples
+
+    def run(self):
+        while not self.stop_event.wait(PROFILE_INTERVAL):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append((code.co_name, code.co_filename, code.co_firstlineno))
+                frame = frame.f_back
+            if stack: self.stacks[tuple(reversed(stack))] += 1
+
+    def stop(self):
+        self.stop_event.set()
+        self.join()
+
+def speedscope(name, stacks, duration_ms):
+    """Samples as a speedscope "sampled" profile; weights are in milliseconds."""
+    frames, index, samples, weights = [], {}, [], []
+    for stack, n in stacks.items():
+        for f in stack:
+            if f not in index:
+                index[f] = len(frames)
+                frames.append({"name": f[0], "file": f[1], "line": f[2]})
+        samples.append([index[f] for f in stack])
+        weights.append(round(n * PROFILE_INTERVAL * 1000, 3))
+    return {"$schema": "https://www.speedscope.app/file-format-schema.json", "shared": {"frames": frames},
+            "profiles": [{"type": "sampled", "name": name, "unit": "milliseconds", "startValue": 0,
+                          "endValue": round(duration_ms, 3), "samples": samples, "weights": weights}],
+            "name": name, "exporter": "kit-lms"}
+
+def collapsed(stacks):
+    """Folded stacks, the input format of flamegraph.pl and inferno."""
+    return "\n".join(";".join(f"{f[0]} ({os.path.basename(f[1])}:{f[2]})" for f in stack) + f" {n}"
+                     for stack, n in stacks.items()) + "\n"
+
+def wants_profile(request: Request):
+    if request.headers.get("x-profile") == "1":
+        try:
+            return get_user(request).get("role") == "super_admin"
+        except HTTPException:
+            return False
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+class AccountQueries:
+    """Query accounting, request metrics, profiling and query budgets for every HTTP request.
+
+    Plain ASGI rather than @app.middleware("http"): BaseHTTPMiddleware only relays
+    http.response.body, which would hide the server's zero-copy extension from
+    RangeFileResponse. Everything is recorded when the response starts, as call_next did."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http": return await self.app(scope, receive, send)
+        request = Request(scope, receive)
+        stats = {"queries": 0, "db_ms": 0.0, "docs": 0}
+        request_stats.set(stats)
+        request_loaders.set({})
+        sampler = StackSampler(threading.get_ident()) if wants_profile(request) else None
+        if sampler: sampler.start()
+        start = time.perf_counter()
+        replaced = False
+
+        async def send_accounted(message):
+            nonlocal replaced
+            if replaced: return
+            if message["type"] != "http.response.start": return await send(message)
+            if sampler: sampler.stop()
+            elapsed = time.perf_counter() - start
+            total_ms = elapsed * 1000
+            route = scope.get("route")
+            # Unmatched paths share one label so scanners can't blow up the series count
+            template = route.path if route else "unmatched"
+            key = f"{request.method} {template}"
+            request_latency.observe(elapsed, request.method, template)
+            request_counts[(request.method, template, message["status"])] += 1
+            agg = route_stats[key]
+            agg["requests"] += 1
+            agg["queries"] += stats["queries"]
+            agg["max_queries"] = max(agg["max_queries"], stats["queries"])
+            agg["db_ms"] += stats["db_ms"]
+            agg["docs"] += stats["docs"]
+            headers = MutableHeaders(scope=message)
+            headers["Server-Timing"] = f'db;dur={stats["db_ms"]:.2f};desc="{stats["queries"]} queries, {stats["docs"]} docs", app;dur={total_ms:.2f}'
+            if sampler:
+                profile_id = gid("prof_")
+                profiles.append({"profile_id": profile_id, "route": key, "path": request.url.path, "status": message["status"],
+                                 "duration_ms": round(total_ms, 2), "samples": sum(sampler.stacks.values()),
+                                 "created_at": datetime.now(timezone.utc).isoformat(), "stacks": dict(sampler.stacks)})
+                headers["X-Profile-Id"] = profile_id
+            if total_ms >= SLOW_REQUEST_MS:
+                entry = {"route": key, "path_params": request.path_params, "query_params": dict(request.query_params),
+                         "status": message["status"], "duration_ms": round(total_ms, 2), "queries": stats["queries"],
+                         "db_ms": round(stats["db_ms"], 2), "at": datetime.now(timezone.utc).isoformat()}
+                slow_requests.append(entry)
+                logging.getLogger("kit.slow").warning("Slow request %s %.0fms (%d queries)", key, total_ms, stats["queries"])
+            budget = QUERY_BUDGETS.get(key, QUERY_BUDGET_DEFAULT)
+            if route and stats["queries"] > budget:
+                msg = f"Query budget exceeded: {key} issued {stats['queries']} queries (budget {budget})"
+                if QUERY_BUDGET_MODE == "enforce":
+                    replaced = True  # the handler's own response is dropped
+                    return await JSONResponse({"detail": msg}, status_code=500, headers={"Server-Timing": headers["Server-Timing"]})(scope, receive, send)
+                logging.getLogger("kit.queries").warning(msg)
+            await send(message)
+
+        gauges["in_flight"] += 1
+        try:
+            await self.app(scope, receive, send_accounted)
+        finally:
+            gauges["in_flight"] -= 1
+            if sampler: sampler.stop()
+
+app.add_middleware(AccountQueries)
+
 JWT_SECRET = os.environ["JWT_SECRET"]
 pwd_ctx = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 def gid(p=""): return f"{p}{uuid.uuid4().hex[:12]}"
 def hpw(pw): return pwd_ctx.hash(pw)
 def vpw(pw, h): return pwd_ctx.verify(pw, h)
+
+# bcrypt is deliberately slow (~200ms); request handlers run it off the event loop
+bcrypt_pool = ThreadPoolExecutor(max_workers=int(os.environ.get("BCRYPT_WORKERS", "4")), thread_name_prefix="bcrypt")
+
+async def in_bcrypt_pool(fn, *args):
+    gauges["bcrypt_pending"] += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(bcrypt_pool, fn, *args)
+    finally:
+        gauges["bcrypt_pending"] -= 1
+
+async def ahpw(pw): return await in_bcrypt_pool(hpw, pw)
+async def avpw(pw, h): return await in_bcrypt_pool(vpw, pw, h)
 def mkjwt(d):
     return jwt.encode({**d, "exp": datetime.now(timezone.utc) + timedelta(hours=24)}, JWT_SECRET, algorithm="HS256")
 
 def get_user(request: Request):
+    # Resolved once per request; the response cache and the handler both ask for the viewer
+    u = getattr(request.state, "user", None)
+    if u: return u
+    request.state.user = _resolve_user(request)
+    return request.state.user
+
+def _resolve_user(request: Request):
     st = request.cookies.get("session_token")
     if st:
         sess = db.user_sessions.find_one({"session_token": st}, {"_id": 0})
@@ -71,12 +371,254 @@ def send_notification(title, message, ntype="system", target_role="all", target_
     notif = {
         "notification_id": gid("notif_"), "title": title, "message": message,
         "type": ntype, "target_role": target_role, "target_users": target_users or [],
-        "created_by": created_by, "read_by": [],
+        "created_by": created_by, "read_by": [], "version": next_version(),
         "created_at": datetime.now(timezone.utc).isoformat()
     }
     db.notifications.insert_one(notif)
     return {k: v for k, v in notif.items() if k != "_id"}
 
+def rollup_activity(logs):
+    """Fold activity log entries into hourly and daily rollup counters (per user, course and action)."""
+    buckets = {}  # one upsert per distinct rollup key, however many logs land in it
+    for log in logs:
+        ts = log["timestamp"]
+        for gran, bucket in (("hour", ts[:13]), ("day", ts[:10])):
+            key = (gran, bucket, log["user_id"], log.get("details", {}).get("course_id", ""), log["action"])
+            count, last_at = buckets.get(key, (0, ts))
+            buckets[key] = (count + 1, max(last_at, ts))
+    ops = [UpdateOne({"granularity": g, "bucket": b, "user_id": u, "course_id": c, "action": a},
+                     {"$inc": {"count": n}, "$max": {"last_at": last_at}}, upsert=True)
+           for (g, b, u, c, a), (n, last_at) in buckets.items()]
+    if ops: db.activity_rollups.bulk_write(ops, ordered=False)
+
+def log_activity(user_id, action, details=None):
+    log = {
+        "log_id": gid("log_"), "user_id": user_id, "action": action, "details": details or {},
+        "timestamp": datetime.now(timezone.utc).isoformat()
+    }
+    db.activity_logs.insert_one(log)
+    rollup_activity([log])
+    return log
+
+@app.on_event("startup")
+def backfill_activity_rollups():
+    """Databases from before the rollups have activity logs but no counters; fold the logs in once.
+    The counters claim keeps a second worker starting at the same time from counting them twice."""
+    if db.activity_rollups.find_one({}, {"_id": 1}) or not db.activity_logs.find_one({}, {"_id": 1}): return
+    started = datetime.now(timezone.utc).isoformat()
+    claim = db.counters.update_one({"_id": "activity_rollup_backfill"}, {"$setOnInsert": {"started_at": started}}, upsert=True)
+    if not claim.upserted_id: return
+    batch = []
+    # Logs written from here on are rolled up by log_activity itself
+    for log in db.activity_logs.find({"timestamp": {"$lt": started}}, {"_id": 0, "timestamp": 1, "user_id": 1, "action": 1, "details.course_id": 1}):
+        batch.append(log)
+        if len(batch) >= 5000:
+            rollup_activity(batch)
+            batch = []
+    rollup_activity(batch)
+
+# ============ CHANGE TRACKING ============
+# users, courses, enrollments and notifications carry a "version" from one global,
+# monotonic sequence; deletions leave a tombstone. Polling clients pass ?since=<version>.
+# Tombstones are kept for TOMBSTONE_RETENTION_DAYS; a client whose version predates the
+# oldest pruned one is sent a full snapshot ("full": true) instead of a delta.
+TOMBSTONE_RETENTION_DAYS = int(os.environ.get("TOMBSTONE_RETENTION_DAYS", "30"))
+TOMBSTONE_PRUNE_INTERVAL = 3600
+
+def next_version():
+    return db.counters.find_one_and_update({"_id": "change_seq"}, {"$inc": {"seq": 1}}, upsert=True, return_document=ReturnDocument.AFTER)["seq"]
+
+def current_version():
+    c = db.counters.find_one({"_id": "change_seq"})
+    return c["seq"] if c else 0
+
+def stamp(col, query):
+    db[col].update_many(query, {"$set": {"version": next_version()}})
+
+def tombstone(col, ids):
+    if not ids: return
+    now = datetime.now(timezone.utc).isoformat()
+    db.tombstones.insert_many([{"collection": col, "id": i, "version": next_version(), "created_at": now} for i in ids])
+
+def sync_point(since):
+    """since, or 0 (full resync) when tombstones after it may already have been pruned."""
+    horizon = db.counters.find_one({"_id": "tombstone_horizon"}) if since else None
+    return 0 if horizon and since < horizon["seq"] else since
+
+def prune_tombstones():
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=TOMBSTONE_RETENTION_DAYS)).isoformat()
+    last = db.tombstones.find_one({"created_at": {"$lt": cutoff}}, {"_id": 0, "version": 1}, sort=[("version", -1)])
+    if not last: return
+    db.counters.update_one({"_id": "tombstone_horizon"}, {"$max": {"seq": last["version"]}}, upsert=True)
+    db.tombstones.delete_many({"version": {"$lte": last["version"]}})
+
+async def tombstone_pruner():
+    loop = asyncio.get_running_loop()
+    while True:
+        try: await loop.run_in_executor(None, prune_tombstones)
+        except PyMongoError: logging.getLogger("kit.sync").exception("Tombstone pruning failed")
+        await asyncio.sleep(TOMBSTONE_PRUNE_INTERVAL)
+
+@app.on_event("startup")
+async def start_tombstone_pruner():
+    app.state.tombstone_pruner_task = asyncio.create_task(tombstone_pruner())
+
+def changed_since(since):
+    # Documents written before change tracking have no version and count as changed
+    return {"version": {"$not": {"$lte": since}}}
+
+def delta(col, since, version, changed, key=None):
+    """Delta envelope for ?since= polls, or 204 when nothing changed. since=0 always gets the
+    envelope: an empty snapshot (a search with no matches) must replace the client's list.
+
+    With key, rows that changed but are not in `changed` no longer match the viewer's query
+    (unpublished, reassigned, role changed) and are reported as deleted too."""
+    if not since: return {"version": version, "changed": changed, "deleted": [], "full": True}
+    deleted = [t["id"] for t in db.tombstones.find({"collection": col, "version": {"$gt": since}}, {"_id": 0, "id": 1})]
+    if key:
+        seen = [r[key] for r in changed]
+        deleted += [d[key] for d in db[col].find({"version": {"$gt": since}, key: {"$nin": seen}}, {"_id": 0, key: 1})]
+    if not changed and not deleted: return Response(status_code=204)
+    return {"version": version, "changed": changed, "deleted": list(dict.fromkeys(deleted)), "full": False}
+
+# ============ BATCH LOADERS ============
+# Handlers that enrich rows with names or titles collect the ids first and resolve them
+# through the request's loader: one $in query per collection, each id fetched at most once
+# per request however many rows (or helpers) ask for it.
+LOADER_FIELDS = {
+    "users": ("user_id", ["name", "email", "role", "picture"]),
+    "courses": ("course_id", ["title", "thumbnail", "category", "description", "level", "updated_at", "instructor_ids"]),
+    "assignments": ("assignment_id", ["title", "course_id", "max_score"]),
+}
+request_loaders = ContextVar("request_loaders", default=None)
+
+class Loader:
+    def __init__(self, col):
+        self.col = col
+        self.key, self.fields = LOADER_FIELDS[col]
+        self.docs = {}  # id -> doc, or None when it does not exist
+
+    def load_many(self, ids):
+        """{id: doc} for ids that exist, querying only for ids this request has not seen yet."""
+        ids = {i for i in ids if i}
+        missing = [i for i in ids if i not in self.docs]
+        if missing:
+            found = {d[self.key]: d for d in db[self.col].find({self.key: {"$in": missing}}, {"_id": 0, self.key: 1, **{f: 1 for f in self.fields}})}
+            for i in missing: self.docs[i] = found.get(i)
+        return {i: self.docs[i] for i in ids if self.docs[i] is not None}
+
+    def load(self, id):
+        return self.load_many([id]).get(id)
+
+def loader(col):
+    """The current request's loader for col (a fresh, unshared one outside a request)."""
+    loaders = request_loaders.get()
+    if loaders is None: return Loader(col)
+    if col not in loaders: loaders[col] = Loader(col)
+    return loaders[col]
+
+# ============ RESPONSE CACHE ============
+# Per-entity version counters, bumped by every write endpoint. A cached response
+# is valid while the versions of all entities it was built from are unchanged.
+entity_versions = defaultdict(int)
+response_cache = OrderedDict()
+RESPONSE_CACHE_SIZE = 2048
+
+def bump_version(*entities):
+    for e in entities: entity_versions[e] += 1
+
+def viewer_role(request):
+    try: return get_user(request)["role"]
+    except HTTPException: return "anon"
+
+def course_audience(request):
+    # Instructors only see their own courses, so their catalog is per user
+    role = viewer_role(request)
+    return f"instructor:{get_user(request)['user_id']}" if role == "instructor" else role
+
+def cached(*entities, audience=None):
+    """Cache a read endpoint's JSON body and answer If-None-Match with 304.
+
+    The key is the route + query string + audience(request), so viewers who would
+    see different data never share an entry. Handlers that raise are not cached."""
+    def deco(fn):
+        @functools.wraps(fn)
+        async def wrapper(**kwargs):
+            request = kwargs["request"]
+            key = (request.url.path, tuple(sorted(request.query_params.multi_items())), audience(request) if audience else "")
+            versions = tuple(entity_versions[e] for e in entities)
+            hit = response_cache.get(key)
+            if hit and hit[0] == versions:
+                response_cache.move_to_end(key)
+                _, etag, body = hit
+                cache_counts["hit"] += 1
+            else:
+                cache_counts["miss"] += 1
+                result = await fn(**kwargs)
+                if isinstance(result, Response): return result
+                body = ORJSONResponse(result).body
+                etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+                response_cache[key] = (versions, etag, body)
+                if len(response_cache) > RESPONSE_CACHE_SIZE: response_cache.popitem(last=False)
+            headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+            if etag in [t.strip() for t in request.headers.get("if-none-match", "").split(",")]:
+                cache_counts["not_modified"] += 1
+                return Response(status_code=304, headers=headers)
+            return Response(body, media_type="application/json", headers=headers)
+        return wrapper
+    return deco
+
+# ============ RESPONSE MODELS ============
+# Shapes of the large list endpoints, for the OpenAPI schema. Those handlers return
+# json_rows(...) so FastAPI neither validates each row against the model nor runs
+# jsonable_encoder over documents that are already plain JSON types.
+T = TypeVar("T")
+
+class Row(BaseModel):
+    model_config = ConfigDict(extra="allow")
+
+class Delta(BaseModel, Generic[T]):
+    version: int
+    changed: list[T]
+    deleted: list[str]
+    full: bool = False  # the client must replace its list, not merge
+
+class UserOut(Row):
+    user_id: str
+    email: str
+    name: str
+    role: str
+    status: str = "active"
+    points: int = 0
+
+class EnrollmentOut(Row):
+    enrollment_id: str
+    student_id: str
+    course_id: str
+    progress: float
+    status: str
+    completed_lessons: list[str] = []
+    course_title: str
+    total_lessons: int
+    student_name: str
+
+class StudentAnalyticsOut(UserOut):
+    enrolled_count: int
+    avg_progress: float
+    completed_courses: int
+    quiz_attempts: int
+    last_active: str
+
+class SubmissionOut(Row):
+    submission_id: str
+    assignment_id: str
+    student_id: str
+    grade: Optional[float] = None
+    student_name: str
+
+def json_rows(content):
+    return content if isinstance(content, Response) else ORJSONResponse(content)
+
 def recalc_enrollment_progress(course_id):
     """Recalculate progress for ALL enrollments of a course based on current lesson count."""
     total_lessons = db.lessons.count_documents({"course_id": course_id})
@@ -88,15 +630,151 @@ def recalc_enrollment_progress(course_id):
         # Filter out lessons that no longer exist
         existing = [lid for lid in completed if db.lessons.find_one({"lesson_id": lid})]
         progress = round(len(existing) / total_lessons * 100, 1)
-        update_data = {"completed_lessons": existing, "progress": progress}
+        update_data = {"completed_lessons": existing, "progress": progress, "version": next_version()}
         if progress < 100 and e.get("status") == "completed":
             update_data["status"] = "active"
         elif progress >= 100 and e.get("status") != "completed":
             update_data["status"] = "completed"
             update_data["completed_at"] = datetime.now(timezone.utc).isoformat()
         db.enrollments.update_one({"enrollment_id": e["enrollment_id"]}, {"$set": update_data})
+    bump_version("enrollments")
+    cert_pending_courses.add(course_id)
+
+@app.on_event("startup")
+def ensure_indexes():
+    db.activity_rollups.create_index([("granularity", 1), ("user_id", 1), ("course_id", 1), ("action", 1), ("bucket", 1)], unique=True)
+    db.activity_rollups.create_index([("granularity", 1), ("course_id", 1), ("bucket", 1)])
+    for col in ["users", "courses", "enrollments", "notifications"]:
+        db[col].create_index("version")
+    db.tombstones.create_index([("collection", 1), ("version", 1)])
+    db.cache_bus.create_index("updated_at", expireAfterSeconds=7 * 86400)  # resume tokens of workers that are gone
+    db.quiz_attempts.create_index([("quiz_id", 1), ("attempted_at", 1)])
+    db.submission_signatures.create_index("submission_id", unique=True)
+    db.submission_signatures.create_index("assignment_id")
+    db.certificate_status.create_index([("student_id", 1), ("course_id", 1)], unique=True)
+    db.certificates.create_index([("student_id", 1), ("course_id", 1)])
+    db.certificate_renders.create_index([("certificate_id", 1), ("format", 1)], unique=True)
+    db.uploads.create_index("upload_id", unique=True)
+    db.uploads.create_index([("owner_id", 1), ("status", 1)])
+    db.files.create_index("file_id", unique=True)
+    db.files.create_index("owner_id")
+    db.files.create_index("sha256")
+    db.lessons.create_index("video_sha256", sparse=True)
+    db.image_sources.create_index("key", unique=True)
+
+# ============ FILE STORAGE ============
+# Generated and uploaded files live under STORAGE_DIR/<area>/, named by the sha256 of
+# their bytes, so identical content is stored once and its digest doubles as the ETag.
+STORAGE_DIR = os.environ.get("STORAGE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "storage"))
+RANGE_RE = re.compile(r"bytes=(\d*)-(\d*)$")
+# Types a browser may render in place. Anything else (HTML, SVG, scripts) is sent as an
+# attachment: uploads are served from the API origin, where the session cookie is valid.
+INLINE_TYPES = {"application/pdf", "text/plain", "image/png", "image/jpeg", "image/gif", "image/webp",
+                "video/mp4", "video/webm", "video/ogg", "video/quicktime", "video/x-m4v", "audio/mpeg", "audio/ogg", "audio/wav"}
+
+def content_disposition(disposition, filename):
+    """RFC 6266 header value: an ASCII fallback name plus the UTF-8 name in filename*."""
+    if not filename: return disposition
+    fallback = re.sub(r'[^\x20-\x7e]|["\\]', "_", filename)
+    return f"{disposition}; filename=\"{fallback}\"; filename*=UTF-8''{quote(filename, safe='')}"
+
+def blob_path(area, digest, ext):
+    return os.path.join(STORAGE_DIR, area, digest[:2], f"{digest}.{ext}")
+
+def write_blob(area, data, ext):
+    digest = hashlib.sha256(data).hexdigest()
+    path = blob_path(area, digest, ext)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp, "wb") as f: f.write(data)
+        os.replace(tmp, path)  # readers never see a partial file
+    return digest
+
+def hash_file(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""): h.update(block)
+    return h.hexdigest()
+
+def adopt_blob(area, path, ext):
+    """Move a finished file into the store under its digest (or drop it if that content is already there)."""
+    digest = hash_file(path)
+    target = blob_path(area, digest, ext)
+    if os.path.exists(target): os.remove(path)
+    else:
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(path, target)
+    return digest
+
+class RangeFileResponse(Response):
+    """A file with ETag / If-None-Match and single byte-range (206) support.
+
+    The body is handed to the server's zero-copy extension when it offers one,
+    otherwise read in chunks off the event loop. The pinned uvicorn offers no such
+    extension, so under it every body takes the pread path; nothing is sendfile'd."""
+    chunk_size = 256 * 1024
+
+    def __init__(self, request, path, media_type, etag, cache_control="private, max-age=3600", filename=None):
+        st = os.stat(path)
+        self.path, self.media_type, self.background = path, media_type, None
+        self.start, self.end, self.status_code = 0, st.st_size, 200
+        headers = {"ETag": etag, "Cache-Control": cache_control, "Accept-Ranges": "bytes",
+                   "Last-Modified": formatdate(st.st_mtime, usegmt=True),
+                   "Content-Encoding": "identity",  # keeps GZipMiddleware from recompressing byte ranges
+                   "X-Content-Type-Options": "nosniff"}
+        disposition = "inline" if media_type.split(";")[0].strip().lower() in INLINE_TYPES else "attachment"
+        if filename or disposition == "attachment": headers["Content-Disposition"] = content_disposition(disposition, filename)
+        if etag in [t.strip() for t in request.headers.get("if-none-match", "").split(",")]:
+            self.status_code, self.end = 304, 0
+        elif request.headers.get("range") and request.headers.get("if-range", etag) == etag:
+            # Multiple or malformed ranges are ignored and the whole file is sent, as RFC 9110 allows
+            m = RANGE_RE.match(request.headers["range"].strip())
+            if m and (m.group(1) or m.group(2)):
+                first, last = m.group(1), m.group(2)
+                if first: start, end = int(first), min(int(last) + 1, st.st_size) if last else st.st_size
+                else: start, end = max(st.st_size - int(last), 0), st.st_size
+                if start >= end:
+                    self.status_code, self.end = 416, 0
+                    headers["Content-Range"] = f"bytes */{st.st_size}"
+                else:
+                    self.status_code, self.start, self.end = 206, start, end
+                    headers["Content-Range"] = f"bytes {start}-{end - 1}/{st.st_size}"
+        if self.status_code != 304: headers["Content-Length"] = str(self.end - self.start)
+        self.init_headers(headers)
+
+    async def __call__(self, scope, receive, send):
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        remaining, offset = self.end - self.start, self.start
+        if scope["method"].upper() == "HEAD" or not remaining:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+        if "http.response.zerocopy" in scope.get("extensions", {}):  # never true under uvicorn
+            with open(self.path, "rb") as f:
+                await send({"type": "http.response.zerocopy", "file": f, "offset": offset, "count": remaining, "more_body": False})
+            return
+        fd = os.open(self.path, os.O_RDONLY)
+        try:
+            while remaining:
+                chunk = await run_in_threadpool(os.pread, fd, min(self.chunk_size, remaining), offset)
+                if not chunk: break  # file shrank underneath us
+                offset, remaining = offset + len(chunk), remaining - len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": bool(remaining)})
+            if remaining: await send({"type": "http.response.body", "body": b"", "more_body": False})
+        finally:
+            os.close(fd)
 
 # ============ AUTH ============
+session_exchange = SessionExchange(os.environ.get("OAUTH_SESSION_URL", "https://demobackend.emergentagent.com/auth/v1/env/oauth/session-data"))
+
+@app.on_event("startup")
+async def start_session_exchange():
+    await session_exchange.start()
+
+@app.on_event("shutdown")
+async def close_session_exchange():
+    await session_exchange.close()
+
 @app.post("/api/auth/register")
 async def register(request: Request):
     body = await request.json()
@@ -104,12 +782,13 @@ async def register(request: Request):
         raise HTTPException(400, "Email already exists")
     user = {
         "user_id": gid("user_"), "email": body["email"], "name": body["name"],
-        "password_hash": hpw(body["password"]), "role": body.get("role", "student"),
+        "password_hash": await ahpw(body["password"]), "role": body.get("role", "student"),
         "picture": "", "bio": "", "status": "active", "points": 0,
-        "must_reset_password": False,
+        "must_reset_password": False, "version": next_version(),
         "created_at": datetime.now(timezone.utc).isoformat()
     }
     db.users.insert_one(user)
+    index_user(user)
     token = mkjwt({"user_id": user["user_id"], "role": user["role"]})
     return {"token": token, "user": {k: v for k, v in user.items() if k not in ["password_hash", "_id"]}}
 
@@ -117,7 +796,7 @@ async def register(request: Request):
 async def login(request: Request):
     body = await request.json()
     u = db.users.find_one({"email": body["email"]}, {"_id": 0})
-    if not u or not vpw(body["password"], u.get("password_hash", "")):
+    if not u or not await avpw(body["password"], u.get("password_hash", "")):
         raise HTTPException(401, "Invalid email or password")
     token = mkjwt({"user_id": u["user_id"], "role": u["role"]})
     user_data = {k: v for k, v in u.items() if k != "password_hash"}
@@ -129,32 +808,31 @@ async def auth_session(request: Request, response: Response):
     session_id = body.get("session_id")
     if not session_id:
         raise HTTPException(400, "session_id required")
-    async with httpx.AsyncClient() as client_http:
-        resp = await client_http.get(
-            "https://demobackend.emergentagent.com/auth/v1/env/oauth/session-data",
-            headers={"X-Session-ID": session_id}
-        )
-    if resp.status_code != 200:
+    try:
+        data = await session_exchange.fetch(session_id)
+    except SessionExchangeError:
+        raise HTTPException(502, "Authentication service unavailable")
+    if data is None:
         raise HTTPException(401, "Invalid session")
-    data = resp.json()
     existing = db.users.find_one({"email": data["email"]}, {"_id": 0})
     if existing:
-        db.users.update_one({"email": data["email"]}, {"$set": {"name": data["name"], "picture": data.get("picture", "")}})
+        db.users.update_one({"email": data["email"]}, {"$set": {"name": data["name"], "picture": data.get("picture", ""), "version": next_version()}})
         user_id = existing["user_id"]
     else:
         user_id = gid("user_")
         db.users.insert_one({
             "user_id": user_id, "email": data["email"], "name": data["name"],
             "picture": data.get("picture", ""), "role": "student", "bio": "",
-            "status": "active", "points": 0, "must_reset_password": False, "password_hash": "",
+            "status": "active", "points": 0, "must_reset_password": False, "password_hash": "", "version": next_version(),
             "created_at": datetime.now(timezone.utc).isoformat()
         })
+    reindex("users", user_id)
     session_token = data.get("session_token", gid("sess_"))
-    db.user_sessions.insert_one({
+    # Upsert: a repeated callback for the same session_id must not add a second session row
+    db.user_sessions.update_one({"session_token": session_token}, {"$set": {
         "user_id": user_id, "session_token": session_token,
         "expires_at": datetime.now(timezone.utc) + timedelta(days=7),
-        "created_at": datetime.now(timezone.utc)
-    })
+    }, "$setOnInsert": {"created_at": datetime.now(timezone.utc)}}, upsert=True)
     response.set_cookie("session_token", session_token, httponly=True, secure=True, samesite="none", path="/", max_age=7*24*3600)
     user = db.users.find_one({"user_id": user_id}, {"_id": 0})
     return {k: v for k, v in user.items() if k != "password_hash"}
@@ -162,7 +840,8 @@ async def auth_session(request: Request, response: Response):
 @app.get("/api/auth/me")
 async def auth_me(request: Request):
     u = get_user(request)
-    return {k: v for k, v in u.items() if k != "password_hash"}
+    keys = register_images([u.get("picture")])
+    return {**{k: v for k, v in u.items() if k != "password_hash"}, "pictures": image_variants(keys.get(u.get("picture")), AVATAR_VARIANTS)}
 
 @app.post("/api/auth/logout")
 async def logout(request: Request, response: Response):
@@ -208,7 +887,7 @@ async def reset_password(request: Request):
         db.password_resets.update_one({"token": token}, {"$set": {"used": True}})
     if not user_id:
         raise HTTPException(400, "Invalid request")
-    db.users.update_one({"user_id": user_id}, {"$set": {"password_hash": hpw(new_password), "must_reset_password": False}})
+    db.users.update_one({"user_id": user_id}, {"$set": {"password_hash": await ahpw(new_password), "must_reset_password": False, "version": next_version()}})
     return {"message": "Password updated successfully"}
 
 @app.post("/api/auth/change-password")
@@ -220,9 +899,9 @@ async def change_password(request: Request):
     if not new_pw or len(new_pw) < 6:
         raise HTTPException(400, "New password must be at least 6 characters")
     u = db.users.find_one({"user_id": user["user_id"]}, {"_id": 0})
-    if u.get("password_hash") and not vpw(current, u["password_hash"]):
+    if u.get("password_hash") and not await avpw(current, u["password_hash"]):
         raise HTTPException(400, "Current password is incorrect")
-    db.users.update_one({"user_id": user["user_id"]}, {"$set": {"password_hash": hpw(new_pw), "must_reset_password": False}})
+    db.users.update_one({"user_id": user["user_id"]}, {"$set": {"password_hash": await ahpw(new_pw), "must_reset_password": False, "version": next_version()}})
     return {"message": "Password changed successfully"}
 
 @app.put("/api/auth/profile")
@@ -236,18 +915,29 @@ async def update_profile(request: Request):
         mn = update.get("middle_name", user.get("middle_name", ""))
         ln = update.get("last_name", user.get("last_name", ""))
         update["name"] = f"{fn} {mn} {ln}".replace("  ", " ").strip()
+    update["version"] = next_version()
     db.users.update_one({"user_id": user["user_id"]}, {"$set": update})
+    reindex("users", user["user_id"])
     return db.users.find_one({"user_id": user["user_id"]}, {"_id": 0, "password_hash": 0})
 
 # ============ USERS ============
-@app.get("/api/users")
-async def list_users(request: Request, role: Optional[str] = None, search: Optional[str] = None):
+@app.get("/api/users", response_model=Union[list[UserOut], Delta[UserOut]])
+async def list_users(request: Request, role: Optional[str] = None, search: Optional[str] = None, since: Optional[int] = None):
     user = get_user(request)
     require_role(user, ["super_admin"])
     query = {}
     if role: query["role"] = role
-    if search: query["$or"] = [{"name": {"$regex": search, "$options": "i"}}, {"email": {"$regex": search, "$options": "i"}}]
-    return list(db.users.find(query, {"_id": 0, "password_hash": 0}))
+    if since is not None:
+        version, since = current_version(), sync_point(since)
+        query.update(changed_since(since))
+    if search:
+        ranked = search_index.ids("users", search)
+        query["user_id"] = {"$in": ranked}
+        rank = {uid: i for i, uid in enumerate(ranked)}
+        users = sorted(db.users.find(query, {"_id": 0, "password_hash": 0}), key=lambda u: rank[u["user_id"]])
+    else:
+        users = list(db.users.find(query, {"_id": 0, "password_hash": 0}))
+    return json_rows(delta("users", since, version, users, key="user_id") if since is not None else users)
 
 @app.get("/api/users/{user_id}")
 async def get_single_user(user_id: str, request: Request):
@@ -285,16 +975,17 @@ async def create_user(request: Request):
         "middle_name": body.get("middle_name", ""),
         "last_name": body.get("last_name", body.get("name", "").split()[-1] if body.get("name") and len(body.get("name", "").split()) > 1 else ""),
         "name": body.get("name", f"{body.get('first_name', '')} {body.get('middle_name', '')} {body.get('last_name', '')}".replace("  ", " ").strip()),
-        "password_hash": hpw(default_pw), "role": body.get("role", "student"),
+        "password_hash": await ahpw(default_pw), "role": body.get("role", "student"),
         "picture": body.get("picture", ""), "bio": body.get("bio", ""),
         "dob": body.get("dob", ""), "gender": body.get("gender", ""),
         "phone": body.get("phone", ""), "school_name": body.get("school_name", ""),
         "class_name": body.get("class_name", ""), "guardian_name": body.get("guardian_name", ""),
         "status": "active", "points": 0,
-        "must_reset_password": True,
+        "must_reset_password": True, "version": next_version(),
         "created_at": datetime.now(timezone.utc).isoformat()
     }
     db.users.insert_one(new_user)
+    index_user(new_user)
     # Notify admin about new user
     role_label = new_user["role"].replace("_", " ").title()
     send_notification(
@@ -313,9 +1004,11 @@ async def update_user(user_id: str, request: Request):
         raise HTTPException(403, "Cannot edit other users")
     update = {k: v for k, v in body.items() if k not in ["user_id", "password_hash", "_id"]}
     if "password" in body and body["password"]:
-        update["password_hash"] = hpw(body["password"])
+        update["password_hash"] = await ahpw(body["password"])
         del update["password"]
+    update["version"] = next_version()
     db.users.update_one({"user_id": user_id}, {"$set": update})
+    reindex("users", user_id)
     return db.users.find_one({"user_id": user_id}, {"_id": 0, "password_hash": 0})
 
 @app.delete("/api/users/{user_id}")
@@ -323,20 +1016,22 @@ async def delete_user(user_id: str, request: Request):
     user = get_user(request)
     require_role(user, ["super_admin"])
     db.users.delete_one({"user_id": user_id})
+    search_index.remove("users", user_id)
+    tombstone("users", [user_id])
     return {"message": "User deleted"}
 
 @app.put("/api/users/{user_id}/suspend")
 async def suspend_user(user_id: str, request: Request):
     user = get_user(request)
     require_role(user, ["super_admin"])
-    db.users.update_one({"user_id": user_id}, {"$set": {"status": "suspended"}})
+    db.users.update_one({"user_id": user_id}, {"$set": {"status": "suspended", "version": next_version()}})
     return {"message": "User suspended"}
 
 @app.put("/api/users/{user_id}/reactivate")
 async def reactivate_user(user_id: str, request: Request):
     user = get_user(request)
     require_role(user, ["super_admin"])
-    db.users.update_one({"user_id": user_id}, {"$set": {"status": "active"}})
+    db.users.update_one({"user_id": user_id}, {"$set": {"status": "active", "version": next_version()}})
     return {"message": "User reactivated"}
 
 # ============ ANNOUNCEMENTS ============
@@ -380,42 +1075,128 @@ async def delete_announcement(announcement_id: str, request: Request):
     return {"message": "Announcement deleted"}
 
 # ============ CERTIFICATE CHECK ============
+# Lesson completions and quiz attempts queue their (student, course) pair, and lesson or
+# quiz removals queue the whole course. A background sweeper evaluates the queue in bulk
+# every CERT_SWEEP_INTERVAL seconds, issues certificates with one insert_many and stores
+# each result in certificate_status, so a check is a lookup unless its pair is still queued.
+# The queue is per worker: a check served by another worker may lag by one interval.
+CERT_SWEEP_INTERVAL = float(os.environ.get("CERT_SWEEP_INTERVAL", "5"))
+CERT_SWEEP_CHUNK = 500
+CERT_MIN_QUIZ_AVG = 60
+CERT_TEMPLATE_FIELDS = ["name", "description", "course_id", "heading", "accent_color", "signatory"]
+cert_pending = set()
+cert_pending_courses = set()
+cert_lock = threading.Lock()  # sweeps and inline checks must not both issue the same certificate
+
+def evaluate_certificates(pairs):
+    """Evaluate (student_id, course_id) pairs with a fixed number of queries, issuing certificates
+    to newly eligible students. Returns {pair: status}, where status is None when not enrolled."""
+    pairs = set(pairs)
+    if not pairs: return {}
+    students, courses = list({s for s, _ in pairs}), list({c for _, c in pairs})
+    with cert_lock:
+        enrollments = {(e["student_id"], e["course_id"]): e for e in db.enrollments.find(
+            {"student_id": {"$in": students}, "course_id": {"$in": courses}}, {"_id": 0, "student_id": 1, "course_id": 1, "completed_lessons": 1})}
+        totals = {d["_id"]: d["n"] for d in db.lessons.aggregate([{"$match": {"course_id": {"$in": courses}}}, {"$group": {"_id": "$course_id", "n": {"$sum": 1}}}])}
+        quiz_course = {q["quiz_id"]: q["course_id"] for q in db.quizzes.find({"course_id": {"$in": courses}}, {"_id": 0, "quiz_id": 1, "course_id": 1})}
+        best = defaultdict(list)  # pair -> best score on each quiz the student attempted
+        for d in db.quiz_attempts.aggregate([{"$match": {"quiz_id": {"$in": list(quiz_course)}, "student_id": {"$in": students}}},
+                                             {"$group": {"_id": {"s": "$student_id", "q": "$quiz_id"}, "best": {"$max": "$score"}}}]):
+            best[(d["_id"]["s"], quiz_course[d["_id"]["q"]])].append(d["best"])
+        certs = {(c["student_id"], c["course_id"]): c for c in db.certificates.find(
+            {"student_id": {"$in": students}, "course_id": {"$in": courses}}, {"_id": 0, "certificate_id": 1, "student_id": 1, "course_id": 1})}
+        now = datetime.now(timezone.utc).isoformat()
+        statuses, issued = {}, []
+        for pair in pairs:
+            if pair not in enrollments:
+                statuses[pair] = None
+                continue
+            total, completed = totals.get(pair[1], 0), len(enrollments[pair].get("completed_lessons", []))
+            scores = best.get(pair)
+            avg_quiz = round(sum(scores) / len(scores), 1) if scores else 100
+            all_lessons_done = completed >= total and total > 0
+            eligible = all_lessons_done and avg_quiz >= CERT_MIN_QUIZ_AVG
+            if eligible and pair not in certs:
+                certs[pair] = {"certificate_id": gid("cert_"), "student_id": pair[0], "course_id": pair[1], "template_id": "", "issued_by": "system", "issued_at": now}
+                issued.append(certs[pair])
+            statuses[pair] = {"student_id": pair[0], "course_id": pair[1], "eligible": eligible, "lessons_completed": completed, "total_lessons": total,
+                              "avg_quiz_score": avg_quiz, "all_lessons_done": all_lessons_done,
+                              "certificate_id": certs[pair]["certificate_id"] if pair in certs else None, "evaluated_at": now}
+        if issued: db.certificates.insert_many(issued)
+        ops = [UpdateOne({"student_id": st["student_id"], "course_id": st["course_id"]}, {"$set": st}, upsert=True) for st in statuses.values() if st]
+        if ops: db.certificate_status.bulk_write(ops, ordered=False)
+    cert_counts["evaluated"] += len(ops)
+    cert_counts["issued"] += len(issued)
+    return statuses
+
+def sweep_course_certificates(course_id):
+    students = [e["student_id"] for e in db.enrollments.find({"course_id": course_id}, {"_id": 0, "student_id": 1})]
+    summary = {"course_id": course_id, "evaluated": 0, "eligible": 0, "certified": 0}
+    for i in range(0, len(students), CERT_SWEEP_CHUNK):
+        for st in evaluate_certificates((s, course_id) for s in students[i:i + CERT_SWEEP_CHUNK]).values():
+            if not st: continue
+            summary["evaluated"] += 1
+            summary["eligible"] += st["eligible"]
+            summary["certified"] += st["certificate_id"] is not None
+    return summary
+
+def sweep_pending_certificates(pairs, courses):
+    for course_id in courses: sweep_course_certificates(course_id)
+    pairs = [p for p in pairs if p[1] not in courses]
+    for i in range(0, len(pairs), CERT_SWEEP_CHUNK): evaluate_certificates(pairs[i:i + CERT_SWEEP_CHUNK])
+
+async def certificate_sweeper():
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(CERT_SWEEP_INTERVAL)
+        if not cert_pending and not cert_pending_courses: continue
+        pairs, courses = list(cert_pending), set(cert_pending_courses)
+        cert_pending.clear()
+        cert_pending_courses.clear()
+        try:
+            await loop.run_in_executor(None, sweep_pending_certificates, pairs, courses)
+        except PyMongoError:
+            logging.getLogger("kit.certificates").exception("Certificate sweep failed; requeueing")
+            cert_pending.update(pairs)
+            cert_pending_courses.update(courses)
+
+@app.on_event("startup")
+async def start_certificate_sweeper():
+    app.state.cert_sweeper_task = asyncio.create_task(certificate_sweeper())
+
 @app.get("/api/certificates/check/{course_id}")
 async def check_certificate(course_id: str, request: Request):
     user = get_user(request)
-    enrollment = db.enrollments.find_one({"student_id": user["user_id"], "course_id": course_id}, {"_id": 0})
-    if not enrollment:
-        return {"eligible": False, "reason": "Not enrolled"}
-    total_lessons = db.lessons.count_documents({"course_id": course_id})
-    completed = len(enrollment.get("completed_lessons", []))
-    all_lessons_done = completed >= total_lessons and total_lessons > 0
-    quizzes = list(db.quizzes.find({"course_id": course_id}, {"_id": 0}))
-    quiz_scores = []
-    for q in quizzes:
-        att = db.quiz_attempts.find_one({"quiz_id": q["quiz_id"], "student_id": user["user_id"]}, {"_id": 0}, sort=[("score", -1)])
-        if att:
-            quiz_scores.append(att["score"])
-    avg_quiz = round(sum(quiz_scores) / len(quiz_scores), 1) if quiz_scores else 100
-    eligible = all_lessons_done and avg_quiz >= 60
-    existing = db.certificates.find_one({"student_id": user["user_id"], "course_id": course_id}, {"_id": 0})
-    if eligible and not existing:
-        cert = {"certificate_id": gid("cert_"), "student_id": user["user_id"], "course_id": course_id, "template_id": "", "issued_by": "system", "issued_at": datetime.now(timezone.utc).isoformat()}
-        db.certificates.insert_one(cert)
+    pair = (user["user_id"], course_id)
+    status = None
+    if pair not in cert_pending and course_id not in cert_pending_courses:
+        status = db.certificate_status.find_one({"student_id": user["user_id"], "course_id": course_id}, {"_id": 0})
+    if status and not db.enrollments.find_one({"student_id": user["user_id"], "course_id": course_id}, {"_id": 1}): status = None
+    certificate = db.certificates.find_one({"certificate_id": status["certificate_id"]}, {"_id": 0}) if status and status["certificate_id"] else None
+    if status and status["certificate_id"] and not certificate: status = None  # revoked since it was evaluated
+    if not status:
+        cert_pending.discard(pair)
+        # cert_lock may be held by a sweep for a whole chunk; wait for it off the event loop
+        status = (await run_in_threadpool(evaluate_certificates, [pair]))[pair]
+        if not status:
+            return {"eligible": False, "reason": "Not enrolled"}
+        certificate = db.certificates.find_one({"certificate_id": status["certificate_id"]}, {"_id": 0}) if status["certificate_id"] else None
     return {
-        "eligible": eligible, "issued": existing is not None or eligible,
-        "lessons_completed": completed, "total_lessons": total_lessons,
-        "avg_quiz_score": avg_quiz, "all_lessons_done": all_lessons_done,
-        "certificate": existing or (db.certificates.find_one({"student_id": user["user_id"], "course_id": course_id}, {"_id": 0}) if eligible else None)
+        "eligible": status["eligible"], "issued": certificate is not None,
+        "lessons_completed": status["lessons_completed"], "total_lessons": status["total_lessons"],
+        "avg_quiz_score": status["avg_quiz_score"], "all_lessons_done": status["all_lessons_done"],
+        "certificate": certificate
     }
 
 # ============ COURSES ============
 @app.get("/api/courses")
-async def list_courses(request: Request, status: Optional[str] = None, category: Optional[str] = None, search: Optional[str] = None, instructor_id: Optional[str] = None):
+@cached("courses", "modules", "lessons", "enrollments", audience=course_audience)
+async def list_courses(request: Request, status: Optional[str] = None, category: Optional[str] = None, search: Optional[str] = None, instructor_id: Optional[str] = None, since: Optional[int] = None):
     query = {}
     if status: query["status"] = status
     if category: query["category"] = category
     if instructor_id: query["instructor_ids"] = instructor_id
-    if search: query["$or"] = [{"title": {"$regex": search, "$options": "i"}}, {"description": {"$regex": search, "$options": "i"}}]
+    if search: query["course_id"] = {"$in": search_index.ids("courses", search)}
     try:
         user = get_user(request)
         if user["role"] == "instructor": query["instructor_ids"] = user["user_id"]
@@ -423,20 +1204,39 @@ async def list_courses(request: Request, status: Optional[str] = None, category:
     except:
         query["status"] = "published"
         query["visibility"] = "public"
+    if since is not None:
+        version, since = current_version(), sync_point(since)
+        query.update(changed_since(since))
     courses = list(db.courses.find(query, {"_id": 0}))
     for c in courses:
         c["lesson_count"] = db.lessons.count_documents({"course_id": c["course_id"]})
         c["module_count"] = db.modules.count_documents({"course_id": c["course_id"]})
         c["enrollment_count"] = db.enrollments.count_documents({"course_id": c["course_id"]})
-    return courses
+    keys = register_images(c.get("thumbnail") for c in courses)
+    for c in courses:
+        c["thumbnails"] = image_variants(keys.get(c.get("thumbnail")), CARD_VARIANTS)
+    return delta("courses", since, version, courses, key="course_id") if since is not None else courses
+
+# Lesson metadata returned in course outlines; the body comes from GET /api/lessons/{lesson_id}
+LESSON_OUTLINE = {"_id": 0, "lesson_id": 1, "module_id": 1, "course_id": 1, "title": 1, "type": 1, "duration": 1, "order": 1, "status": 1}
+
+def course_modules(course_id, outline=True):
+    """Modules of a course with their lessons attached, loaded with one lessons query."""
+    modules = list(db.modules.find({"course_id": course_id}, {"_id": 0}).sort("order", 1))
+    by_module = defaultdict(list)
+    for l in db.lessons.find({"course_id": course_id}, LESSON_OUTLINE if outline else {"_id": 0}).sort("order", 1):
+        by_module[l["module_id"]].append(l)
+    for m in modules:
+        m["lessons"] = by_module[m["module_id"]]
+    return modules
 
 @app.get("/api/courses/{course_id}")
-async def get_course(course_id: str, request: Request):
+@cached("courses", "modules", "lessons", "enrollments")
+async def get_course(course_id: str, request: Request, outline: bool = True, since: Optional[int] = None):
     c = db.courses.find_one({"course_id": course_id}, {"_id": 0})
     if not c: raise HTTPException(404, "Course not found")
-    c["modules"] = list(db.modules.find({"course_id": course_id}, {"_id": 0}).sort("order", 1))
-    for m in c["modules"]:
-        m["lessons"] = list(db.lessons.find({"module_id": m["module_id"]}, {"_id": 0}).sort("order", 1))
+    if since and c.get("version", 0) <= since: return Response(status_code=204)
+    c["modules"] = course_modules(course_id, outline)
     c["enrollment_count"] = db.enrollments.count_documents({"course_id": course_id})
     return c
 
@@ -455,16 +1255,18 @@ async def create_course(request: Request):
         "status": body.get("status", "draft"), "visibility": body.get("visibility", "public"),
         "prerequisites": body.get("prerequisites", ""), "certificate_enabled": body.get("certificate_enabled", False),
         "created_by": user["user_id"], "created_at": datetime.now(timezone.utc).isoformat(),
-        "updated_at": datetime.now(timezone.utc).isoformat()
+        "updated_at": datetime.now(timezone.utc).isoformat(), "version": next_version()
     }
     db.courses.insert_one(course)
+    bump_version("courses")
+    index_course(course)
     # Auto-generate certificate template if certificate_enabled
     if course.get("certificate_enabled"):
         template = {
             "template_id": gid("tmpl_"),
             "name": f"{course['title']} Certificate",
             "description": f"Certificate of completion for {course['title']}",
-            "course_id": course["course_id"],
+            "course_id": course["course_id"], "version": 1,
             "created_at": datetime.now(timezone.utc).isoformat()
         }
         db.cert_templates.insert_one(template)
@@ -482,25 +1284,33 @@ async def update_course(course_id: str, request: Request):
     body = await request.json()
     update = {k: v for k, v in body.items() if k not in ["course_id", "_id"]}
     update["updated_at"] = datetime.now(timezone.utc).isoformat()
+    update["version"] = next_version()
     db.courses.update_one({"course_id": course_id}, {"$set": update})
+    # Enrollment rows embed course title/thumbnail, so they change with the course
+    stamp("enrollments", {"course_id": course_id})
+    bump_version("courses")
+    reindex("courses", course_id)
     return db.courses.find_one({"course_id": course_id}, {"_id": 0})
 
 @app.delete("/api/courses/{course_id}")
 async def delete_course(course_id: str, request: Request):
     user = get_user(request)
     require_role(user, ["super_admin"])
+    for l in db.lessons.find({"course_id": course_id}, {"lesson_id": 1, "_id": 0}):
+        search_index.remove("lessons", l["lesson_id"])
+    search_index.remove("courses", course_id)
     db.courses.delete_one({"course_id": course_id})
+    tombstone("courses", [course_id])
     db.modules.delete_many({"course_id": course_id})
     db.lessons.delete_many({"course_id": course_id})
+    bump_version("courses", "modules", "lessons")
     return {"message": "Course deleted"}
 
 # ============ MODULES ============
 @app.get("/api/courses/{course_id}/modules")
-async def list_modules(course_id: str):
-    modules = list(db.modules.find({"course_id": course_id}, {"_id": 0}).sort("order", 1))
-    for m in modules:
-        m["lessons"] = list(db.lessons.find({"module_id": m["module_id"]}, {"_id": 0}).sort("order", 1))
-    return modules
+@cached("modules", "lessons")
+async def list_modules(course_id: str, request: Request, outline: bool = True):
+    return course_modules(course_id, outline)
 
 @app.post("/api/courses/{course_id}/modules")
 async def create_module(course_id: str, request: Request):
@@ -517,7 +1327,8 @@ async def create_module(course_id: str, request: Request):
     }
     db.modules.insert_one(module)
     # Update course timestamp
-    db.courses.update_one({"course_id": course_id}, {"$set": {"updated_at": datetime.now(timezone.utc).isoformat()}})
+    db.courses.update_one({"course_id": course_id}, {"$set": {"updated_at": datetime.now(timezone.utc).isoformat(), "version": next_version()}})
+    bump_version("courses", "modules")
     # Recalculate progress for enrolled students & notify
     recalc_enrollment_progress(course_id)
     course = db.courses.find_one({"course_id": course_id}, {"_id": 0})
@@ -538,16 +1349,23 @@ async def update_module(module_id: str, request: Request):
     body = await request.json()
     update = {k: v for k, v in body.items() if k not in ["module_id", "_id"]}
     db.modules.update_one({"module_id": module_id}, {"$set": update})
-    return db.modules.find_one({"module_id": module_id}, {"_id": 0})
+    bump_version("modules")
+    mod = db.modules.find_one({"module_id": module_id}, {"_id": 0})
+    if mod: stamp("courses", {"course_id": mod["course_id"]})
+    return mod
 
 @app.delete("/api/modules/{module_id}")
 async def delete_module(module_id: str, request: Request):
     user = get_user(request)
     require_role(user, ["super_admin", "instructor"])
     mod = db.modules.find_one({"module_id": module_id}, {"_id": 0})
+    for l in db.lessons.find({"module_id": module_id}, {"lesson_id": 1, "_id": 0}):
+        search_index.remove("lessons", l["lesson_id"])
     db.modules.delete_one({"module_id": module_id})
     db.lessons.delete_many({"module_id": module_id})
+    bump_version("modules", "lessons")
     if mod:
+        stamp("courses", {"course_id": mod["course_id"]})
         recalc_enrollment_progress(mod["course_id"])
     return {"message": "Module deleted"}
 
@@ -557,11 +1375,14 @@ async def reorder_modules(course_id: str, request: Request):
     body = await request.json()
     for item in body.get("order", []):
         db.modules.update_one({"module_id": item["module_id"]}, {"$set": {"order": item["order"]}})
+    bump_version("modules")
+    stamp("courses", {"course_id": course_id})
     return {"message": "Reordered"}
 
 # ============ LESSONS ============
 @app.get("/api/modules/{module_id}/lessons")
-async def list_lessons(module_id: str):
+@cached("lessons")
+async def list_lessons(module_id: str, request: Request):
     return list(db.lessons.find({"module_id": module_id}, {"_id": 0}).sort("order", 1))
 
 @app.post("/api/modules/{module_id}/lessons")
@@ -582,8 +1403,10 @@ async def create_lesson(module_id: str, request: Request):
         "created_at": datetime.now(timezone.utc).isoformat()
     }
     db.lessons.insert_one(lesson)
+    index_lesson(lesson)
     # Update course timestamp
-    db.courses.update_one({"course_id": mod["course_id"]}, {"$set": {"updated_at": datetime.now(timezone.utc).isoformat()}})
+    db.courses.update_one({"course_id": mod["course_id"]}, {"$set": {"updated_at": datetime.now(timezone.utc).isoformat(), "version": next_version()}})
+    bump_version("courses", "lessons")
     # Recalculate progress for enrolled students & notify
     recalc_enrollment_progress(mod["course_id"])
     course = db.courses.find_one({"course_id": mod["course_id"]}, {"_id": 0})
@@ -596,6 +1419,13 @@ async def create_lesson(module_id: str, request: Request):
         )
     return {k: v for k, v in lesson.items() if k != "_id"}
 
+@app.get("/api/lessons/{lesson_id}")
+@cached("lessons")
+async def get_lesson(lesson_id: str, request: Request):
+    l = db.lessons.find_one({"lesson_id": lesson_id}, {"_id": 0})
+    if not l: raise HTTPException(404, "Lesson not found")
+    return l
+
 @app.put("/api/lessons/{lesson_id}")
 async def update_lesson(lesson_id: str, request: Request):
     user = get_user(request)
@@ -603,15 +1433,78 @@ async def update_lesson(lesson_id: str, request: Request):
     body = await request.json()
     update = {k: v for k, v in body.items() if k not in ["lesson_id", "_id"]}
     db.lessons.update_one({"lesson_id": lesson_id}, {"$set": update})
+    bump_version("lessons")
+    reindex("lessons", lesson_id)
+    lesson = db.lessons.find_one({"lesson_id": lesson_id}, {"_id": 0})
+    if lesson: stamp("courses", {"course_id": lesson["course_id"]})
+    return lesson
+
+# Self-hosted videos are uploaded through /api/uploads and then attached to the lesson.
+# /api/media/<sha256> serves them to anyone who can see the lesson (lessons are public, and
+# <video> elements cannot send a bearer token); the URL changes with the content, so
+# browsers and proxies may cache every byte range forever.
+VIDEO_TYPES = {"video/mp4", "video/webm", "video/ogg", "video/quicktime", "video/x-m4v"}
+MEDIA_LOOKUP_TTL = 60
+media_types = {}  # sha256 -> (content_type, expires); spares a lookup on every range request
+
+@app.put("/api/lessons/{lesson_id}/video")
+async def attach_lesson_video(lesson_id: str, request: Request):
+    user = get_user(request)
+    require_role(user, ["super_admin", "instructor"])
+    body = await request.json()
+    lesson = db.lessons.find_one({"lesson_id": lesson_id}, {"_id": 0, "course_id": 1})
+    if not lesson: raise HTTPException(404, "Lesson not found")
+    if user["role"] == "instructor":
+        course = db.courses.find_one({"course_id": lesson["course_id"]}, {"_id": 0, "instructor_ids": 1}) or {}
+        if user["user_id"] not in course.get("instructor_ids", []): raise HTTPException(403, "Insufficient permissions")
+    file = db.files.find_one({"file_id": body.get("file_id", "")}, {"_id": 0})
+    if not file or (user["role"] != "super_admin" and file["owner_id"] != user["user_id"]): raise HTTPException(400, "Unknown file_id")
+    if file["content_type"] not in VIDEO_TYPES: raise HTTPException(400, f"Unsupported video type {file['content_type']}")
+    update = {"video_url": f"/api/media/{file['sha256']}", "video_file_id": file["file_id"], "video_sha256": file["sha256"],
+              "video_content_type": file["content_type"], "video_size": file["size"]}
+    db.lessons.update_one({"lesson_id": lesson_id}, {"$set": update})
+    bump_version("lessons")
+    stamp("courses", {"course_id": lesson["course_id"]})
     return db.lessons.find_one({"lesson_id": lesson_id}, {"_id": 0})
 
+@app.delete("/api/lessons/{lesson_id}/video")
+async def detach_lesson_video(lesson_id: str, request: Request):
+    user = get_user(request)
+    require_role(user, ["super_admin", "instructor"])
+    lesson = db.lessons.find_one({"lesson_id": lesson_id}, {"_id": 0, "course_id": 1})
+    if not lesson: raise HTTPException(404, "Lesson not found")
+    if user["role"] == "instructor":
+        course = db.courses.find_one({"course_id": lesson["course_id"]}, {"_id": 0, "instructor_ids": 1}) or {}
+        if user["user_id"] not in course.get("instructor_ids", []): raise HTTPException(403, "Insufficient permissions")
+    lesson = db.lessons.find_one_and_update({"lesson_id": lesson_id}, {"$set": {"video_url": ""}, "$unset": {
+        "video_file_id": "", "video_sha256": "", "video_content_type": "", "video_size": ""}}, projection={"_id": 0, "course_id": 1, "video_sha256": 1})
+    if not lesson: raise HTTPException(404, "Lesson not found")
+    media_types.pop(lesson.get("video_sha256"), None)
+    bump_version("lessons")
+    stamp("courses", {"course_id": lesson["course_id"]})
+    return {"message": "Video removed"}
+
+@app.api_route("/api/media/{digest}", methods=["GET", "HEAD"])
+async def lesson_media(digest: str, request: Request):
+    hit = media_types.get(digest)
+    if not hit or hit[1] < time.monotonic():
+        lesson = db.lessons.find_one({"video_sha256": digest}, {"_id": 0, "video_content_type": 1})
+        if not lesson: raise HTTPException(404, "Media not found")
+        hit = media_types[digest] = (lesson["video_content_type"], time.monotonic() + MEDIA_LOOKUP_TTL)
+    path = blob_path("uploads", digest, "bin")
+    if not os.path.exists(path): raise HTTPException(404, "Media not found")
+    return RangeFileResponse(request, path, hit[0], f'"{digest}"', cache_control="public, max-age=31536000, immutable")
+
 @app.delete("/api/lessons/{lesson_id}")
 async def delete_lesson(lesson_id: str, request: Request):
     user = get_user(request)
     require_role(user, ["super_admin", "instructor"])
     lesson = db.lessons.find_one({"lesson_id": lesson_id}, {"_id": 0})
     db.lessons.delete_one({"lesson_id": lesson_id})
+    bump_version("lessons")
+    search_index.remove("lessons", lesson_id)
     if lesson:
+        stamp("courses", {"course_id": lesson["course_id"]})
         recalc_enrollment_progress(lesson["course_id"])
     return {"message": "Lesson deleted"}
 
@@ -628,7 +1521,7 @@ async def complete_lesson(lesson_id: str, request: Request):
         completed.append(lesson_id)
         total = db.lessons.count_documents({"course_id": lesson["course_id"]})
         progress = round(len(completed) / total * 100, 1) if total > 0 else 0
-        update_data = {"completed_lessons": completed, "progress": progress}
+        update_data = {"completed_lessons": completed, "progress": progress, "version": next_version()}
         if progress >= 100:
             update_data["status"] = "completed"
             update_data["completed_at"] = datetime.now(timezone.utc).isoformat()
@@ -639,11 +1532,9 @@ async def complete_lesson(lesson_id: str, request: Request):
                 ntype="course_completed", target_users=[user["user_id"]], created_by="system"
             )
         db.enrollments.update_one({"enrollment_id": enrollment["enrollment_id"]}, {"$set": update_data})
-    db.activity_logs.insert_one({
-        "log_id": gid("log_"), "user_id": user["user_id"], "action": "lesson_completed",
-        "details": {"lesson_id": lesson_id, "course_id": lesson["course_id"]},
-        "timestamp": datetime.now(timezone.utc).isoformat()
-    })
+        bump_version("enrollments")
+        cert_pending.add((user["user_id"], lesson["course_id"]))
+    log_activity(user["user_id"], "lesson_completed", {"lesson_id": lesson_id, "course_id": lesson["course_id"]})
     return {"message": "Lesson completed", "progress": progress}
 
 # ============ QUIZZES ============
@@ -701,7 +1592,8 @@ async def update_quiz(quiz_id: str, request: Request):
 async def delete_quiz(quiz_id: str, request: Request):
     user = get_user(request)
     require_role(user, ["super_admin", "instructor"])
-    db.quizzes.delete_one({"quiz_id": quiz_id})
+    quiz = db.quizzes.find_one_and_delete({"quiz_id": quiz_id}, {"_id": 0, "course_id": 1})
+    if quiz and quiz.get("course_id"): cert_pending_courses.add(quiz["course_id"])
     return {"message": "Quiz deleted"}
 
 @app.post("/api/quizzes/{quiz_id}/attempt")
@@ -730,6 +1622,7 @@ async def submit_quiz(quiz_id: str, request: Request):
         "attempted_at": datetime.now(timezone.utc).isoformat()
     }
     db.quiz_attempts.insert_one(attempt)
+    if quiz.get("course_id"): cert_pending.add((user["user_id"], quiz["course_id"]))
     return {k: v for k, v in attempt.items() if k != "_id"}
 
 # ============ ASSIGNMENTS ============
@@ -790,26 +1683,31 @@ async def delete_assignment(assignment_id: str, request: Request):
 async def submit_assignment(assignment_id: str, request: Request):
     user = get_user(request)
     body = await request.json()
+    file_url = body.get("file_url", "")
+    if body.get("file_id"):
+        if not db.files.find_one({"file_id": body["file_id"], "owner_id": user["user_id"]}, {"_id": 1}): raise HTTPException(400, "Unknown file_id")
+        file_url = f"/api/files/{body['file_id']}"
     submission = {
         "submission_id": gid("sub_"), "assignment_id": assignment_id,
         "student_id": user["user_id"], "content": body.get("content", ""),
-        "file_url": body.get("file_url", ""), "grade": None, "feedback": "",
+        "file_url": file_url, "file_id": body.get("file_id", ""), "grade": None, "feedback": "",
         "graded_by": "", "submitted_at": datetime.now(timezone.utc).isoformat()
     }
     db.submissions.insert_one(submission)
+    store_signatures([submission])
     return {k: v for k, v in submission.items() if k != "_id"}
 
-@app.get("/api/submissions")
+@app.get("/api/submissions", response_model=list[SubmissionOut])
 async def list_submissions(request: Request, assignment_id: Optional[str] = None):
     user = get_user(request)
     query = {}
     if assignment_id: query["assignment_id"] = assignment_id
     if user["role"] == "student": query["student_id"] = user["user_id"]
     subs = list(db.submissions.find(query, {"_id": 0}))
+    students = loader("users").load_many(s["student_id"] for s in subs)
     for s in subs:
-        student = db.users.find_one({"user_id": s["student_id"]}, {"_id": 0, "password_hash": 0})
-        s["student_name"] = student["name"] if student else "Unknown"
-    return subs
+        s["student_name"] = students[s["student_id"]]["name"] if s["student_id"] in students else "Unknown"
+    return json_rows(subs)
 
 @app.put("/api/submissions/{submission_id}/grade")
 async def grade_submission(submission_id: str, request: Request):
@@ -822,6 +1720,226 @@ async def grade_submission(submission_id: str, request: Request):
     }})
     return db.submissions.find_one({"submission_id": submission_id}, {"_id": 0})
 
+GRADE_BATCH_MAX = 1000
+
+@app.put("/api/submissions/grade-batch")
+async def grade_submissions_batch(request: Request):
+    user = get_user(request)
+    require_role(user, ["super_admin", "instructor"])
+    body = await request.json()
+    items = body.get("grades") if isinstance(body, dict) else None
+    if not isinstance(items, list) or not items: raise HTTPException(400, "grades must be a non-empty list")
+    if len(items) > GRADE_BATCH_MAX: raise HTTPException(400, f"At most {GRADE_BATCH_MAX} grades per batch")
+    grades = {}  # submission_id -> item; a repeated id keeps its last grade
+    for item in items:
+        if not isinstance(item, dict) or not isinstance(item.get("submission_id"), str): raise HTTPException(400, "Each grade needs a submission_id")
+        grade = item.get("grade")
+        if grade is not None and (isinstance(grade, bool) or not isinstance(grade, (int, float)) or grade < 0):
+            raise HTTPException(400, f"Invalid grade for {item['submission_id']}")
+        grades[item["submission_id"]] = item
+    subs = {s["submission_id"]: s["assignment_id"] for s in db.submissions.find(
+        {"submission_id": {"$in": list(grades)}}, {"_id": 0, "submission_id": 1, "assignment_id": 1})}
+    forbidden = []
+    if user["role"] == "instructor":
+        own = {c["course_id"] for c in db.courses.find({"instructor_ids": user["user_id"]}, {"_id": 0, "course_id": 1})}
+        allowed = {a["assignment_id"] for a in db.assignments.find(
+            {"assignment_id": {"$in": list(set(subs.values()))}, "course_id": {"$in": list(own)}}, {"_id": 0, "assignment_id": 1})}
+        forbidden = [sid for sid, aid in subs.items() if aid not in allowed]
+    now = datetime.now(timezone.utc).isoformat()
+    # feedback is only overwritten by entries that send it; a grade-only entry keeps the existing comments
+    ops = [UpdateOne({"submission_id": sid}, {"$set": {"grade": grades[sid].get("grade"), "graded_by": user["user_id"], "graded_at": now,
+                                                       **({"feedback": grades[sid]["feedback"]} if "feedback" in grades[sid] else {})}})
+           for sid in subs if sid not in forbidden]
+    result = db.submissions.bulk_write(ops, ordered=False) if ops else None
+    return {"requested": len(grades), "matched": result.matched_count if result else 0, "modified": result.modified_count if result else 0,
+            "not_found": [sid for sid in grades if sid not in subs], "forbidden": forbidden, "graded_at": now}
+
+# ============ UPLOADS ============
+# Resumable uploads: POST /api/uploads opens a session for a declared size, the client
+# PUTs chunks at ?offset= (the bytes already on disk, readable via GET), and the last chunk
+# moves the file into the content-addressed store. Chunks stream straight to disk, and a
+# declared sha256 that is already stored completes the upload without any bytes sent.
+UPLOAD_MAX_BYTES = int(os.environ.get("UPLOAD_MAX_BYTES", str(100 * 1024 * 1024)))
+UPLOAD_QUOTA_BYTES = int(os.environ.get("UPLOAD_QUOTA_BYTES", str(500 * 1024 * 1024)))
+MEDIA_MAX_BYTES = int(os.environ.get("MEDIA_MAX_BYTES", str(2 * 1024 ** 3)))  # staff uploads (lesson videos)
+MEDIA_QUOTA_BYTES = int(os.environ.get("MEDIA_QUOTA_BYTES", str(50 * 1024 ** 3)))
+UPLOAD_CHUNK_BYTES = 8 * 1024 * 1024
+UPLOAD_SESSION_HOURS = 24
+UPLOAD_LOCK_SECONDS = 300
+
+def upload_limits(user):
+    """(max file size, quota) for the user; instructors and admins upload course media."""
+    if user["role"] in ("super_admin", "instructor"): return MEDIA_MAX_BYTES, MEDIA_QUOTA_BYTES
+    return UPLOAD_MAX_BYTES, UPLOAD_QUOTA_BYTES
+
+def upload_part_path(upload_id):
+    return os.path.join(STORAGE_DIR, "uploads", "partial", f"{upload_id}.part")
+
+def part_size(upload_id):
+    try: return os.path.getsize(upload_part_path(upload_id))
+    except FileNotFoundError: return 0
+
+def purge_expired_uploads(owner_id):
+    now = datetime.now(timezone.utc).isoformat()
+    for u in db.uploads.find({"owner_id": owner_id, "status": "uploading", "expires_at": {"$lt": now}}, {"_id": 0, "upload_id": 1}):
+        try: os.remove(upload_part_path(u["upload_id"]))
+        except FileNotFoundError: pass
+    db.uploads.delete_many({"owner_id": owner_id, "status": "uploading", "expires_at": {"$lt": now}})
+
+def storage_used(owner_id):
+    """Bytes stored plus bytes reserved by open sessions; deduplicated files still count for each owner."""
+    used = next(db.files.aggregate([{"$match": {"owner_id": owner_id}}, {"$group": {"_id": None, "n": {"$sum": "$size"}}}]), {"n": 0})["n"]
+    reserved = next(db.uploads.aggregate([{"$match": {"owner_id": owner_id, "status": "uploading"}}, {"$group": {"_id": None, "n": {"$sum": "$size"}}}]), {"n": 0})["n"]
+    return used + reserved
+
+def file_record(upload, digest):
+    record = {"file_id": gid("file_"), "owner_id": upload["owner_id"], "filename": upload["filename"], "content_type": upload["content_type"],
+              "size": upload["size"], "sha256": digest, "created_at": datetime.now(timezone.utc).isoformat()}
+    db.files.insert_one(record)
+    record.pop("_id", None)
+    return {**record, "url": f"/api/files/{record['file_id']}"}
+
+def upload_status(upload, offset, file=None):
+    out = {k: upload[k] for k in ("upload_id", "filename", "size", "status")}
+    return {**out, "offset": offset, "chunk_size": UPLOAD_CHUNK_BYTES, **({"file": file} if file else {})}
+
+@app.post("/api/uploads")
+async def create_upload(request: Request):
+    user = get_user(request)
+    body = await request.json()
+    size = body.get("size")
+    # No path, control characters (CR/LF would split headers) or quotes in stored names
+    filename = re.sub(r'[\x00-\x1f\x7f"\\]', "", os.path.basename(str(body.get("filename", "")).replace("\\", "/"))).strip()[:255]
+    if not filename: raise HTTPException(400, "filename is required")
+    if isinstance(size, bool) or not isinstance(size, int) or size <= 0: raise HTTPException(400, "size must be a positive integer")
+    max_file, quota = upload_limits(user)
+    if size > max_file: raise HTTPException(413, f"Files are limited to {max_file} bytes")
+    purge_expired_uploads(user["user_id"])
+    if storage_used(user["user_id"]) + size > quota: raise HTTPException(413, "Storage quota exceeded")
+    now = datetime.now(timezone.utc)
+    upload = {"upload_id": gid("upl_"), "owner_id": user["user_id"], "filename": filename, "size": size,
+              "content_type": body.get("content_type") or mimetypes.guess_type(filename)[0] or "application/octet-stream", "status": "uploading",
+              "created_at": now.isoformat(), "expires_at": (now + timedelta(hours=UPLOAD_SESSION_HOURS)).isoformat()}
+    digest = str(body.get("sha256", "")).lower()
+    # Only the caller's own files can complete without bytes: a digest alone must not grant
+    # access to someone else's content. Other duplicates are still stored once by adopt_blob.
+    if re.fullmatch(r"[0-9a-f]{64}", digest) and db.files.find_one({"sha256": digest, "size": size, "owner_id": user["user_id"]}, {"_id": 1}) \
+            and os.path.exists(blob_path("uploads", digest, "bin")):
+        upload["status"] = "complete"
+        db.uploads.insert_one(upload)
+        return upload_status(upload, size, file_record(upload, digest))
+    db.uploads.insert_one(upload)
+    return upload_status(upload, 0)
+
+@app.get("/api/uploads/{upload_id}")
+async def get_upload(upload_id: str, request: Request):
+    user = get_user(request)
+    upload = db.uploads.find_one({"upload_id": upload_id, "owner_id": user["user_id"]}, {"_id": 0})
+    if not upload: raise HTTPException(404, "Upload not found")
+    if upload["status"] == "complete":
+        file = db.files.find_one({"file_id": upload.get("file_id")}, {"_id": 0}) if upload.get("file_id") else None
+        return upload_status(upload, upload["size"], file and {**file, "url": f"/api/files/{file['file_id']}"})
+    return upload_status(upload, part_size(upload_id))
+
+@app.put("/api/uploads/{upload_id}")
+async def upload_chunk(upload_id: str, request: Request, offset: int):
+    user = get_user(request)
+    now = datetime.now(timezone.utc)
+    # One writer per session across all workers; a crashed writer's lock lapses after UPLOAD_LOCK_SECONDS
+    upload = db.uploads.find_one_and_update(
+        {"upload_id": upload_id, "owner_id": user["user_id"], "status": "uploading", "locked_until": {"$not": {"$gt": now.isoformat()}}},
+        {"$set": {"locked_until": (now + timedelta(seconds=UPLOAD_LOCK_SECONDS)).isoformat()}}, projection={"_id": 0})
+    if not upload:
+        if not db.uploads.find_one({"upload_id": upload_id, "owner_id": user["user_id"]}, {"_id": 1}): raise HTTPException(404, "Upload not found")
+        raise HTTPException(409, "Upload is complete or another chunk is being written")
+    try:
+        if int(request.headers.get("content-length") or 0) > UPLOAD_CHUNK_BYTES: raise HTTPException(413, "Chunk too large")
+        path = upload_part_path(upload_id)
+        current = part_size(upload_id)
+        if offset != current: return JSONResponse({"detail": "Offset mismatch", "offset": current}, status_code=409)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        written = 0
+        with open(path, "ab") as f:
+            async for chunk in request.stream():
+                if current + written + len(chunk) > upload["size"]: raise HTTPException(413, "Chunk runs past the declared size")
+                if written + len(chunk) > UPLOAD_CHUNK_BYTES: raise HTTPException(413, "Chunk too large")  # chunked bodies have no Content-Length
+                await run_in_threadpool(f.write, chunk)
+                written += len(chunk)
+        offset = current + written
+        if offset < upload["size"]: return upload_status(upload, offset)
+        digest = await run_in_threadpool(adopt_blob, "uploads", path, "bin")
+        file = file_record(upload, digest)
+        upload["status"] = "complete"
+        db.uploads.update_one({"upload_id": upload_id}, {"$set": {"status": "complete", "file_id": file["file_id"]}})
+        return upload_status(upload, offset, file)
+    finally:
+        db.uploads.update_one({"upload_id": upload_id}, {"$unset": {"locked_until": ""}})
+
+@app.delete("/api/uploads/{upload_id}")
+async def cancel_upload(upload_id: str, request: Request):
+    user = get_user(request)
+    result = db.uploads.delete_one({"upload_id": upload_id, "owner_id": user["user_id"], "status": "uploading"})
+    if not result.deleted_count: raise HTTPException(404, "Upload not found")
+    try: os.remove(upload_part_path(upload_id))
+    except FileNotFoundError: pass
+    return {"message": "Upload cancelled"}
+
+@app.get("/api/storage/quota")
+async def upload_quota(request: Request):
+    user = get_user(request)
+    used, (max_file, quota) = storage_used(user["user_id"]), upload_limits(user)
+    return {"used": used, "quota": quota, "available": max(quota - used, 0), "max_file": max_file}
+
+@app.get("/api/files/{file_id}")
+async def download_file(file_id: str, request: Request):
+    user = get_user(request)
+    file = db.files.find_one({"file_id": file_id}, {"_id": 0})
+    if not file: raise HTTPException(404, "File not found")
+    if user["role"] == "student" and file["owner_id"] != user["user_id"]: raise HTTPException(403, "Insufficient permissions")
+    if user["role"] == "instructor" and file["owner_id"] != user["user_id"]:
+        # Other people's files only when attached to a submission or lesson in one of the instructor's courses
+        own = [c["course_id"] for c in db.courses.find({"instructor_ids": user["user_id"]}, {"_id": 0, "course_id": 1})]
+        assignments = [a["assignment_id"] for a in db.assignments.find({"course_id": {"$in": own}}, {"_id": 0, "assignment_id": 1})]
+        if not (db.submissions.find_one({"file_id": file_id, "assignment_id": {"$in": assignments}}, {"_id": 1})
+                or db.lessons.find_one({"video_file_id": file_id, "course_id": {"$in": own}}, {"_id": 1})):
+            raise HTTPException(403, "Insufficient permissions")
+    path = blob_path("uploads", file["sha256"], "bin")
+    if not os.path.exists(path): raise HTTPException(410, "File content is no longer available")
+    return RangeFileResponse(request, path, file["content_type"], f'"{file["sha256"]}"', filename=file["filename"])
+
+# ============ SIMILARITY ============
+# MinHash signatures live beside the submissions so list endpoints never carry them
+def store_signatures(subs):
+    docs = [{"submission_id": s["submission_id"], "assignment_id": s["assignment_id"], "student_id": s["student_id"],
+             "signature": sig} for s in subs if (sig := similarity.signature(s.get("content", "")))]
+    try:
+        if docs: db.submission_signatures.insert_many(docs, ordered=False)
+    except BulkWriteError:
+        pass  # a concurrent backfill already stored some of them
+
+@app.get("/api/assignments/{assignment_id}/similarity")
+async def assignment_similarity(assignment_id: str, request: Request, threshold: float = 0.5, limit: int = 100):
+    user = get_user(request)
+    require_role(user, ["super_admin", "instructor"])
+    assignment = db.assignments.find_one({"assignment_id": assignment_id}, {"_id": 0, "course_id": 1})
+    if not assignment: raise HTTPException(404, "Assignment not found")
+    if user["role"] == "instructor":
+        course = db.courses.find_one({"course_id": assignment.get("course_id")}, {"_id": 0, "instructor_ids": 1}) or {}
+        if user["user_id"] not in course.get("instructor_ids", []): raise HTTPException(403, "Insufficient permissions")
+    if not 0 < threshold <= 1: raise HTTPException(400, "threshold must be in (0, 1]")
+    # Backfill submissions made before signatures were stored (or imported directly)
+    signed = {d["submission_id"] for d in db.submission_signatures.find({"assignment_id": assignment_id}, {"_id": 0, "submission_id": 1})}
+    missing = [s for s in db.submissions.find({"assignment_id": assignment_id}, {"_id": 0, "submission_id": 1, "assignment_id": 1, "student_id": 1, "content": 1})
+               if s["submission_id"] not in signed]
+    store_signatures(missing)
+    docs = list(db.submission_signatures.find({"assignment_id": assignment_id}, {"_id": 0}))
+    pairs = [(a, b, sim) for a, b, sim in similarity.near_duplicates([d["signature"] for d in docs], threshold)
+             if docs[a]["student_id"] != docs[b]["student_id"]]  # a student's own resubmissions are expected to match
+    students = loader("users").load_many(docs[i]["student_id"] for a, b, _ in pairs[:limit] for i in (a, b))
+    def side(d): return {"submission_id": d["submission_id"], "student_id": d["student_id"], "student_name": students.get(d["student_id"], {}).get("name", "Unknown")}
+    return {"assignment_id": assignment_id, "submissions": len(docs), "threshold": threshold, "total_pairs": len(pairs),
+            "pairs": [{"a": side(docs[a]), "b": side(docs[b]), "similarity": round(sim, 3)} for a, b, sim in pairs[:limit]]}
+
 # ============ ENROLLMENTS ============
 @app.post("/api/enrollments")
 async def enroll(request: Request):
@@ -833,32 +1951,40 @@ async def enroll(request: Request):
         raise HTTPException(400, "Already enrolled")
     enrollment = {
         "enrollment_id": gid("enr_"), "student_id": student_id, "course_id": course_id,
-        "progress": 0, "status": "active", "completed_lessons": [],
+        "progress": 0, "status": "active", "completed_lessons": [], "version": next_version(),
         "enrolled_at": datetime.now(timezone.utc).isoformat()
     }
     db.enrollments.insert_one(enrollment)
+    bump_version("enrollments")
+    stamp("courses", {"course_id": course_id})
     return {k: v for k, v in enrollment.items() if k != "_id"}
 
-@app.get("/api/enrollments")
-async def list_enrollments(request: Request, student_id: Optional[str] = None, course_id: Optional[str] = None):
+@app.get("/api/enrollments", response_model=Union[list[EnrollmentOut], Delta[EnrollmentOut]])
+async def list_enrollments(request: Request, student_id: Optional[str] = None, course_id: Optional[str] = None, since: Optional[int] = None):
     user = get_user(request)
     query = {}
     if student_id: query["student_id"] = student_id
     elif user["role"] == "student": query["student_id"] = user["user_id"]
     if course_id: query["course_id"] = course_id
+    if since is not None:
+        version, since = current_version(), sync_point(since)
+        query.update(changed_since(since))
     enrollments = list(db.enrollments.find(query, {"_id": 0}))
+    courses = loader("courses").load_many(e["course_id"] for e in enrollments)
+    students = loader("users").load_many(e["student_id"] for e in enrollments)
+    totals = {d["_id"]: d["n"] for d in db.lessons.aggregate([{"$match": {"course_id": {"$in": list({e["course_id"] for e in enrollments})}}},
+                                                              {"$group": {"_id": "$course_id", "n": {"$sum": 1}}}])} if enrollments else {}
     for e in enrollments:
-        course = db.courses.find_one({"course_id": e["course_id"]}, {"_id": 0})
+        course = courses.get(e["course_id"])
         e["course_title"] = course["title"] if course else "Unknown"
         e["course_thumbnail"] = course.get("thumbnail", "") if course else ""
         e["course_category"] = course.get("category", "") if course else ""
         e["course_description"] = course.get("description", "") if course else ""
         e["course_level"] = course.get("level", "") if course else ""
         e["course_updated_at"] = course.get("updated_at", "") if course else ""
-        e["total_lessons"] = db.lessons.count_documents({"course_id": e["course_id"]})
-        student = db.users.find_one({"user_id": e["student_id"]}, {"_id": 0, "password_hash": 0})
-        e["student_name"] = student["name"] if student else "Unknown"
-    return enrollments
+        e["total_lessons"] = totals.get(e["course_id"], 0)
+        e["student_name"] = students[e["student_id"]]["name"] if e["student_id"] in students else "Unknown"
+    return json_rows(delta("enrollments", since, version, enrollments) if since is not None else enrollments)
 
 @app.post("/api/admin/students/enroll")
 async def admin_enroll_student(request: Request):
@@ -876,7 +2002,7 @@ async def admin_enroll_student(request: Request):
         if cid not in existing_course_ids:
             enrollment = {
                 "enrollment_id": gid("enr_"), "student_id": student_id, "course_id": cid,
-                "progress": 0, "status": "active", "completed_lessons": [],
+                "progress": 0, "status": "active", "completed_lessons": [], "version": next_version(),
                 "enrolled_at": datetime.now(timezone.utc).isoformat()
             }
             db.enrollments.insert_one(enrollment)
@@ -886,15 +2012,195 @@ async def admin_enroll_student(request: Request):
     for e in existing:
         if e["course_id"] not in course_ids:
             db.enrollments.delete_one({"enrollment_id": e["enrollment_id"]})
+            tombstone("enrollments", [e["enrollment_id"]])
             removed.append(e["course_id"])
+    bump_version("enrollments")
+    if added or removed: stamp("courses", {"course_id": {"$in": added + removed}})
     return {"message": "Enrollments updated", "added": added, "removed": removed}
 
 @app.delete("/api/enrollments/{enrollment_id}")
 async def unenroll(enrollment_id: str, request: Request):
     get_user(request)
+    e = db.enrollments.find_one({"enrollment_id": enrollment_id}, {"_id": 0, "course_id": 1})
     db.enrollments.delete_one({"enrollment_id": enrollment_id})
+    bump_version("enrollments")
+    if e:
+        tombstone("enrollments", [enrollment_id])
+        stamp("courses", {"course_id": e["course_id"]})
     return {"message": "Unenrolled"}
 
+# ============ GRADEBOOK ============
+GRADEBOOK_WEIGHTS = {"quiz": 0.4, "assignment": 0.4, "progress": 0.2}
+
+def column_stats(m):
+    """nan-aware stats for each column of m; columns with no scores get None."""
+    if not m.shape[0]: return [{"count": 0, "mean": None, "median": None, "std": None, "min": None, "max": None} for _ in range(m.shape[1])]
+    n = (~np.isnan(m)).sum(axis=0)
+    has = n > 0
+    safe = np.where(np.isnan(m) & ~has, 0, m)  # zero-fill empty columns so nan* functions don't warn
+    stats = {"count": n, "mean": np.nanmean(safe, axis=0), "median": np.nanmedian(safe, axis=0),
+             "std": np.nanstd(safe, axis=0), "min": np.nanmin(safe, axis=0), "max": np.nanmax(safe, axis=0)}
+    return [{k: (int(v[j]) if k == "count" else round(float(v[j]), 2) if has[j] else None) for k, v in stats.items()}
+            for j in range(m.shape[1])]
+
+def build_gradebook(student_ids, quiz_ids, assignment_ids, best, grades, progress, weights, missing="zero"):
+    """students x [quizzes, assignments, progress] matrix (percent, nan = no score) plus weighted totals.
+
+    best / grades: (student_id, quiz_id|assignment_id, percent) triples; progress: student_id -> percent."""
+    row = {sid: i for i, sid in enumerate(student_ids)}
+    col = {cid: j for j, cid in enumerate([*quiz_ids, *assignment_ids])}
+    nq, na = len(quiz_ids), len(assignment_ids)
+    m = np.full((len(student_ids), nq + na + 1), np.nan)
+    cells = [*best, *grades]
+    r = np.fromiter((row.get(t[0], -1) for t in cells), np.intp, len(cells))
+    c = np.fromiter((col.get(t[1], -1) for t in cells), np.intp, len(cells))
+    v = np.fromiter((np.nan if t[2] is None else t[2] for t in cells), float, len(cells))
+    ok = (r >= 0) & (c >= 0)
+    m[r[ok], c[ok]] = v[ok]
+    m[:, -1] = [progress.get(sid, 0) for sid in student_ids]
+    # missing="zero": unsubmitted work scores 0. missing="exclude": averages use submitted work only,
+    # and a category with nothing submitted drops out of that student's weighting.
+    num, den = np.zeros(len(student_ids)), np.zeros(len(student_ids))
+    for kind, block in (("quiz", m[:, :nq]), ("assignment", m[:, nq:nq + na]), ("progress", m[:, -1:])):
+        if not block.shape[1] or weights.get(kind, 0) <= 0: continue
+        if missing == "zero":
+            avg, has = np.nan_to_num(block).mean(axis=1), np.ones(len(student_ids), bool)
+        else:
+            n = (~np.isnan(block)).sum(axis=1)
+            avg, has = np.nansum(block, axis=1) / np.maximum(n, 1), n > 0
+        num += avg * weights[kind] * has
+        den += weights[kind] * has
+    totals = np.divide(num, den, out=np.full(len(student_ids), np.nan), where=den > 0)
+    return m, totals
+
+@app.get("/api/courses/{course_id}/gradebook")
+async def course_gradebook(course_id: str, request: Request, quiz_weight: float = GRADEBOOK_WEIGHTS["quiz"],
+                           assignment_weight: float = GRADEBOOK_WEIGHTS["assignment"], progress_weight: float = GRADEBOOK_WEIGHTS["progress"],
+                           missing: str = "zero"):
+    user = get_user(request)
+    require_role(user, ["super_admin", "instructor"])
+    course = db.courses.find_one({"course_id": course_id}, {"_id": 0, "title": 1, "instructor_ids": 1})
+    if not course: raise HTTPException(404, "Course not found")
+    if user["role"] == "instructor" and user["user_id"] not in course.get("instructor_ids", []): raise HTTPException(403, "Insufficient permissions")
+    if missing not in ("zero", "exclude"): raise HTTPException(400, "missing must be zero or exclude")
+    weights = {"quiz": quiz_weight, "assignment": assignment_weight, "progress": progress_weight}
+    if any(w < 0 for w in weights.values()) or not sum(weights.values()): raise HTTPException(400, "Weights must be non-negative and not all zero")
+
+    quizzes = list(db.quizzes.find({"course_id": course_id}, {"_id": 0, "quiz_id": 1, "title": 1}).sort("created_at", 1))
+    assignments = list(db.assignments.find({"course_id": course_id}, {"_id": 0, "assignment_id": 1, "title": 1, "max_score": 1}).sort("created_at", 1))
+    # The three bulk reads: enrollments, best attempt per (quiz, student), best grade per (assignment, student)
+    enrollments = list(db.enrollments.find({"course_id": course_id}, {"_id": 0, "student_id": 1, "progress": 1}))
+    best = [(r["_id"]["s"], r["_id"]["q"], r["best"]) for r in db.quiz_attempts.aggregate([
+        {"$match": {"quiz_id": {"$in": [q["quiz_id"] for q in quizzes]}}},
+        {"$group": {"_id": {"q": "$quiz_id", "s": "$student_id"}, "best": {"$max": "$score"}}}])]
+    max_score = {a["assignment_id"]: a.get("max_score") or 100 for a in assignments}
+    grades = [(r["_id"]["s"], r["_id"]["a"], r["best"] / max_score[r["_id"]["a"]] * 100) for r in db.submissions.aggregate([
+        {"$match": {"assignment_id": {"$in": list(max_score)}, "grade": {"$ne": None}}},
+        {"$group": {"_id": {"a": "$assignment_id", "s": "$student_id"}, "best": {"$max": "$grade"}}}])]
+    names = {u["user_id"]: u for u in db.users.find({"user_id": {"$in": [e["student_id"] for e in enrollments]}}, {"_id": 0, "user_id": 1, "name": 1, "email": 1})}
+    enrollments.sort(key=lambda e: names.get(e["student_id"], {}).get("name", ""))
+    student_ids = [e["student_id"] for e in enrollments]
+
+    m, totals = build_gradebook(student_ids, [q["quiz_id"] for q in quizzes], list(max_score), best, grades,
+                                {e["student_id"]: e.get("progress", 0) for e in enrollments}, weights, missing)
+    stats = column_stats(m)
+    columns = ([{"id": q["quiz_id"], "type": "quiz", "title": q["title"]} for q in quizzes]
+               + [{"id": a["assignment_id"], "type": "assignment", "title": a["title"], "max_score": max_score[a["assignment_id"]]} for a in assignments]
+               + [{"id": "progress", "type": "progress", "title": "Lesson progress"}])
+    for c, st in zip(columns, stats): c["stats"] = st
+    # orjson writes nan as null, so missing cells need no per-cell conversion
+    return json_rows({
+        "course_id": course_id, "course_title": course["title"], "weights": weights, "missing": missing,
+        "columns": columns,
+        "students": [{"student_id": sid, "name": names.get(sid, {}).get("name", "Unknown"), "email": names.get(sid, {}).get("email", "")} for sid in student_ids],
+        "scores": m.round(1).tolist(), "totals": totals.round(1).tolist(),
+        "total_stats": column_stats(totals.reshape(-1, 1))[0],
+    })
+
+# ============ ITEM ANALYSIS ============
+# Results are cached per quiz and keyed on (attempt count, latest attempt, quiz content),
+# so a new attempt or an edited question is picked up by every worker on its next read.
+item_analysis_cache = OrderedDict()
+ITEM_ANALYSIS_CACHE_SIZE = 256
+
+def item_analysis(questions, attempts):
+    A, Q = len(attempts), len(questions)
+    qids = [q["question_id"] for q in questions]
+    options = [list(q.get("options") or []) for q in questions]
+    for opts, q in zip(options, questions):
+        if q.get("correct_answer") not in opts: opts.append(q.get("correct_answer"))
+    index = [{o: k for k, o in enumerate(opts)} for opts in options]
+    # choices[i, j]: option index attempt i picked for question j; -1 blank, len(options) anything else
+    choices = np.full((A, Q), -1, dtype=np.int32)
+    column = {qid: j for j, qid in enumerate(qids)}
+    code = {(qid, o): k for j, qid in enumerate(qids) for o, k in index[j].items()}
+    other = [len(opts) for opts in options]
+    rows, cols, codes = [], [], []
+    for i, att in enumerate(attempts):
+        for a in att.get("answers") or ():
+            qid, ans = a.get("question_id"), a.get("answer")
+            j = column.get(qid)
+            if j is None or ans is None or ans == "": continue
+            rows.append(i); cols.append(j); codes.append(code.get((qid, ans), other[j]) if isinstance(ans, (str, int, float)) else other[j])
+    choices[rows, cols] = codes
+    key = np.array([index[j][q.get("correct_answer")] for j, q in enumerate(questions)], dtype=np.int32)
+    correct = (choices == key).astype(float)
+
+    difficulty, discrimination, var = np.full(Q, np.nan), np.full(Q, np.nan), 0.0
+    if A:
+        difficulty = correct.mean(axis=0)
+        # Corrected point-biserial: each item against the rest score (total minus the item itself)
+        rest = correct.sum(axis=1, keepdims=True) - correct
+        dc, dr = correct - difficulty, rest - rest.mean(axis=0)
+        denom = np.sqrt((dc ** 2).sum(axis=0) * (dr ** 2).sum(axis=0))
+        np.divide((dc * dr).sum(axis=0), denom, out=discrimination, where=denom > 0)
+        var = correct.sum(axis=1).var()
+    kr20 = Q / (Q - 1) * (1 - (difficulty * (1 - difficulty)).sum() / var) if Q > 1 and var > 0 else None
+
+    def num(x, digits=3): return None if x is None or np.isnan(x) else round(float(x), digits)
+    items = []
+    for j, q in enumerate(questions):
+        counts = np.bincount(choices[:, j] + 1, minlength=len(options[j]) + 2)  # shift so blank (-1) lands in bin 0
+        flags = []
+        if A and difficulty[j] > 0.9: flags.append("too_easy")
+        if A and difficulty[j] < 0.2: flags.append("too_hard")
+        if not np.isnan(discrimination[j]) and discrimination[j] < 0.2: flags.append("low_discrimination")
+        items.append({"question_id": q["question_id"], "question": q.get("question", ""), "difficulty": num(difficulty[j]),
+                      "discrimination": num(discrimination[j]), "answered": int(A - counts[0]), "blank": int(counts[0]),
+                      "other": int(counts[-1]), "flags": flags,
+                      "options": [{"option": o, "count": int(counts[k + 1]), "share": round(float(counts[k + 1]) / A, 3) if A else 0,
+                                   "correct": o == q.get("correct_answer")} for k, o in enumerate(options[j])]})
+    scores = np.array([a.get("score", 0) for a in attempts], dtype=float)
+    hist, edges = np.histogram(scores, bins=np.arange(0, 101, 10))
+    return {"attempts": A, "questions": items, "reliability_kr20": num(kr20),
+            "score_distribution": {"bins": [{"from": int(lo), "to": int(hi), "count": int(c)} for lo, hi, c in zip(edges, edges[1:], hist)],
+                                   "mean": num(scores.mean()) if A else None, "median": num(np.median(scores)) if A else None,
+                                   "std": num(scores.std()) if A else None}}
+
+@app.get("/api/quizzes/{quiz_id}/analysis")
+async def quiz_item_analysis(quiz_id: str, request: Request):
+    user = get_user(request)
+    require_role(user, ["super_admin", "instructor"])
+    quiz = db.quizzes.find_one({"quiz_id": quiz_id}, {"_id": 0})
+    if not quiz: raise HTTPException(404, "Quiz not found")
+    if user["role"] == "instructor":
+        course = db.courses.find_one({"course_id": quiz.get("course_id")}, {"_id": 0, "instructor_ids": 1}) or {}
+        if user["user_id"] not in course.get("instructor_ids", []): raise HTTPException(403, "Insufficient permissions")
+    head = next(db.quiz_attempts.aggregate([{"$match": {"quiz_id": quiz_id}},
+                                           {"$group": {"_id": None, "n": {"$sum": 1}, "last": {"$max": "$attempted_at"}}}]), {"n": 0, "last": None})
+    cache_key = (head["n"], head["last"], hashlib.sha1(orjson.dumps(quiz, option=orjson.OPT_SORT_KEYS)).hexdigest())
+    hit = item_analysis_cache.get(quiz_id)
+    if hit and hit[0] == cache_key:
+        item_analysis_cache.move_to_end(quiz_id)
+        return json_rows(hit[1])
+    attempts = list(db.quiz_attempts.find({"quiz_id": quiz_id}, {"_id": 0, "answers": 1, "score": 1, "passed": 1}, batch_size=10000))
+    result = {"quiz_id": quiz_id, "title": quiz["title"], **item_analysis(quiz.get("questions", []), attempts),
+              "pass_rate": round(sum(1 for a in attempts if a.get("passed")) / len(attempts), 3) if attempts else None,
+              "generated_at": datetime.now(timezone.utc).isoformat()}
+    item_analysis_cache[quiz_id] = (cache_key, result)
+    if len(item_analysis_cache) > ITEM_ANALYSIS_CACHE_SIZE: item_analysis_cache.popitem(last=False)
+    return json_rows(result)
+
 # ============ ANALYTICS ============
 @app.get("/api/analytics/overview")
 async def analytics_overview(request: Request):
@@ -925,20 +2231,23 @@ async def analytics_overview(request: Request):
         "completed_enrollments": completed_enrollments, "total_enrollments": total_enrollments
     }
 
-@app.get("/api/analytics/students")
+@app.get("/api/analytics/students", response_model=list[StudentAnalyticsOut])
 async def analytics_students(request: Request):
     user = get_user(request)
     require_role(user, ["super_admin", "instructor"])
     students = list(db.users.find({"role": "student"}, {"_id": 0, "password_hash": 0}))
+    last_seen = {r["_id"]: r["last_at"] for r in db.activity_rollups.aggregate([
+        {"$match": {"granularity": "day", "user_id": {"$in": [s["user_id"] for s in students]}}},
+        {"$group": {"_id": "$user_id", "last_at": {"$max": "$last_at"}}}
+    ])}
     for s in students:
         enrs = list(db.enrollments.find({"student_id": s["user_id"]}, {"_id": 0}))
         s["enrolled_count"] = len(enrs)
         s["avg_progress"] = round(sum(e.get("progress", 0) for e in enrs) / len(enrs), 1) if enrs else 0
         s["completed_courses"] = sum(1 for e in enrs if e.get("status") == "completed")
         s["quiz_attempts"] = db.quiz_attempts.count_documents({"student_id": s["user_id"]})
-        last_log = db.activity_logs.find_one({"user_id": s["user_id"]}, {"_id": 0}, sort=[("timestamp", -1)])
-        s["last_active"] = last_log["timestamp"] if last_log else s.get("created_at", "")
-    return students
+        s["last_active"] = last_seen.get(s["user_id"]) or s.get("created_at", "")
+    return json_rows(students)
 
 @app.get("/api/analytics/courses")
 async def analytics_courses(request: Request):
@@ -966,15 +2275,43 @@ async def analytics_instructors(request: Request):
         i["graded_submissions"] = db.submissions.count_documents({"graded_by": i["user_id"]})
     return instructors
 
+@app.get("/api/analytics/activity")
+async def analytics_activity(request: Request, granularity: str = "day", course_id: Optional[str] = None, user_id: Optional[str] = None, action: Optional[str] = None, start: Optional[str] = None, end: Optional[str] = None):
+    user = get_user(request)
+    if granularity not in ["hour", "day"]:
+        raise HTTPException(400, "granularity must be 'hour' or 'day'")
+    if user["role"] == "student": user_id = user["user_id"]
+    query = {"granularity": granularity}
+    if course_id: query["course_id"] = course_id
+    if user_id: query["user_id"] = user_id
+    if action: query["action"] = action
+    if start or end:
+        # Buckets are ISO prefixes, so truncating the bounds keeps string comparison correct
+        n = 13 if granularity == "hour" else 10
+        query["bucket"] = {}
+        if start: query["bucket"]["$gte"] = start[:n]
+        if end: query["bucket"]["$lte"] = end[:n]
+    series = list(db.activity_rollups.aggregate([
+        {"$match": query},
+        {"$group": {"_id": {"bucket": "$bucket", "action": "$action"}, "count": {"$sum": "$count"}, "users": {"$addToSet": "$user_id"}}},
+        {"$sort": {"_id.bucket": 1}}
+    ]))
+    return {"granularity": granularity, "course_id": course_id, "user_id": user_id, "series": [
+        {"bucket": r["_id"]["bucket"], "action": r["_id"]["action"], "count": r["count"], "active_users": len(r["users"])} for r in series
+    ]}
+
 # ============ NOTIFICATIONS ============
 @app.get("/api/notifications")
-async def list_notifications(request: Request):
+async def list_notifications(request: Request, since: Optional[int] = None):
     user = get_user(request)
     query = {"$or": [{"target_role": "all"}, {"target_role": user["role"]}, {"target_users": user["user_id"]}]}
+    if since is not None:
+        version, since = current_version(), sync_point(since)
+        query.update(changed_since(since))
     notifs = list(db.notifications.find(query, {"_id": 0}).sort("created_at", -1).limit(50))
     for n in notifs:
         n["is_read"] = user["user_id"] in n.get("read_by", [])
-    return notifs
+    return delta("notifications", since, version, notifs) if since is not None else notifs
 
 @app.post("/api/notifications")
 async def create_notification(request: Request):
@@ -985,7 +2322,7 @@ async def create_notification(request: Request):
         "notification_id": gid("notif_"), "title": body["title"],
         "message": body.get("message", ""), "type": body.get("type", "announcement"),
         "target_role": body.get("target_role", "all"), "target_users": body.get("target_users", []),
-        "created_by": user["user_id"], "read_by": [],
+        "created_by": user["user_id"], "read_by": [], "version": next_version(),
         "created_at": datetime.now(timezone.utc).isoformat()
     }
     db.notifications.insert_one(notif)
@@ -994,7 +2331,7 @@ async def create_notification(request: Request):
 @app.put("/api/notifications/{notification_id}/read")
 async def mark_notification_read(notification_id: str, request: Request):
     user = get_user(request)
-    db.notifications.update_one({"notification_id": notification_id}, {"$addToSet": {"read_by": user["user_id"]}})
+    db.notifications.update_one({"notification_id": notification_id}, {"$addToSet": {"read_by": user["user_id"]}, "$set": {"version": next_version()}})
     return {"message": "Marked as read"}
 
 # ============ CERTIFICATES ============
@@ -1005,11 +2342,11 @@ async def list_certificates(request: Request, student_id: Optional[str] = None):
     if student_id: query["student_id"] = student_id
     elif user["role"] == "student": query["student_id"] = user["user_id"]
     certs = list(db.certificates.find(query, {"_id": 0}))
+    courses = loader("courses").load_many(c.get("course_id") for c in certs)
+    students = loader("users").load_many(c.get("student_id") for c in certs)
     for c in certs:
-        course = db.courses.find_one({"course_id": c.get("course_id")}, {"_id": 0})
-        c["course_title"] = course["title"] if course else "Unknown"
-        student = db.users.find_one({"user_id": c.get("student_id")}, {"_id": 0, "password_hash": 0})
-        c["student_name"] = student["name"] if student else "Unknown"
+        c["course_title"] = courses[c["course_id"]]["title"] if c.get("course_id") in courses else "Unknown"
+        c["student_name"] = students[c["student_id"]]["name"] if c.get("student_id") in students else "Unknown"
     return certs
 
 @app.post("/api/certificates/templates")
@@ -1017,7 +2354,9 @@ async def create_cert_template(request: Request):
     user = get_user(request)
     require_role(user, ["super_admin"])
     body = await request.json()
-    template = {"template_id": gid("tmpl_"), "name": body["name"], "description": body.get("description", ""), "course_id": body.get("course_id", ""), "created_at": datetime.now(timezone.utc).isoformat()}
+    template = {"template_id": gid("tmpl_"), "name": body["name"], "description": body.get("description", ""), "course_id": body.get("course_id", ""),
+                "heading": body.get("heading", ""), "accent_color": body.get("accent_color", ""), "signatory": body.get("signatory", ""),
+                "version": 1, "created_at": datetime.now(timezone.utc).isoformat()}
     db.cert_templates.insert_one(template)
     return {k: v for k, v in template.items() if k != "_id"}
 
@@ -1028,10 +2367,336 @@ async def issue_certificate(request: Request):
     body = await request.json()
     cert = {"certificate_id": gid("cert_"), "student_id": body["student_id"], "course_id": body["course_id"], "template_id": body.get("template_id", ""), "issued_by": user["user_id"], "issued_at": datetime.now(timezone.utc).isoformat()}
     db.certificates.insert_one(cert)
+    db.certificate_status.update_one({"student_id": cert["student_id"], "course_id": cert["course_id"]}, {"$set": {"certificate_id": cert["certificate_id"]}})
     return {k: v for k, v in cert.items() if k != "_id"}
 
+@app.post("/api/certificates/sweep/{course_id}")
+async def sweep_certificates(course_id: str, request: Request):
+    user = get_user(request)
+    require_role(user, ["super_admin"])
+    if not db.courses.find_one({"course_id": course_id}, {"_id": 1}): raise HTTPException(404, "Course not found")
+    start = time.perf_counter()
+    summary = await asyncio.get_running_loop().run_in_executor(None, sweep_course_certificates, course_id)
+    return {**summary, "elapsed_s": round(time.perf_counter() - start, 3)}
+
+@app.put("/api/certificates/templates/{template_id}")
+async def update_cert_template(template_id: str, request: Request):
+    user = get_user(request)
+    require_role(user, ["super_admin"])
+    body = await request.json()
+    updates = {k: body[k] for k in CERT_TEMPLATE_FIELDS if k in body}
+    # Every edit gets a new version, so certificates drawn from the old one are re-rendered
+    template = db.cert_templates.find_one_and_update({"template_id": template_id}, {"$set": updates, "$inc": {"version": 1}},
+                                                     projection={"_id": 0}, return_document=ReturnDocument.AFTER)
+    if not template: raise HTTPException(404, "Template not found")
+    return template
+
+# ============ CERTIFICATE RENDERING ============
+# certificate_renders maps (certificate, format) to the digest of the rendered file and the
+# template version it was drawn from. A download renders at most once per template version;
+# concurrent downloads of a certificate that is not rendered yet wait for the same render.
+CERT_RENDER_WORKERS = int(os.environ.get("CERT_RENDER_WORKERS", "2"))
+render_pool = None
+render_inflight = {}  # (certificate_id, format) -> Task rendering it
+
+async def single_flight(inflight, key, make):
+    """Await make() once per key however many callers ask concurrently.
+
+    The work runs as its own task and callers wait through asyncio.shield, so a client that
+    disconnects cancels only its own wait, not the work the other callers are sharing."""
+    task = inflight.get(key)
+    if task is None:
+        task = inflight[key] = asyncio.ensure_future(make())
+        def finished(t):
+            if inflight.get(key) is t: del inflight[key]
+            if not t.cancelled(): t.exception()  # mark retrieved when every caller had gone
+        task.add_done_callback(finished)
+    return await asyncio.shield(task)
+
+def get_render_pool():
+    global render_pool
+    if render_pool is None:
+        # spawn, not fork: the server process holds Mongo sockets and monitor threads
+        render_pool = ProcessPoolExecutor(CERT_RENDER_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return render_pool
+
+@app.on_event("shutdown")
+def stop_render_pool():  # shared with the thumbnail renderer
+    if render_pool is not None: render_pool.shutdown(wait=False, cancel_futures=True)
+
+def certificate_template(cert):
+    if cert.get("template_id"): return db.cert_templates.find_one({"template_id": cert["template_id"]}, {"_id": 0})
+    return db.cert_templates.find_one({"course_id": cert["course_id"]}, {"_id": 0}, sort=[("created_at", -1)])
+
+async def render_certificate(cert, fmt):
+    template = certificate_template(cert)
+    version = f"{template['template_id']}@{template.get('version', 1)}" if template else "default"
+    version += f"/r{certificate_render.RENDERER_VERSION}"
+    key = (cert["certificate_id"], fmt)
+    entry = db.certificate_renders.find_one({"certificate_id": key[0], "format": fmt}, {"_id": 0})
+    if entry and entry["template_version"] == version and os.path.exists(blob_path("certificates", entry["sha256"], fmt)):
+        cert_counts["render_hit"] += 1
+        return entry
+    return await single_flight(render_inflight, key, lambda: draw_certificate(cert, fmt, template, version))
+
+async def draw_certificate(cert, fmt, template, version):
+    student, course = loader("users").load(cert["student_id"]) or {}, loader("courses").load(cert["course_id"]) or {}
+    spec = {"student_name": student.get("name", "Student"), "course_title": course.get("title", ""), "issued_at": cert["issued_at"],
+            "certificate_id": cert["certificate_id"], **{k: (template or {}).get(k, "") for k in ("heading", "description", "accent_color", "signatory")}}
+    data = await asyncio.get_running_loop().run_in_executor(get_render_pool(), certificate_render.render, spec, fmt)
+    digest = await run_in_threadpool(write_blob, "certificates", data, fmt)
+    entry = {"certificate_id": cert["certificate_id"], "format": fmt, "template_version": version, "sha256": digest, "size": len(data),
+             "rendered_at": datetime.now(timezone.utc).isoformat()}
+    db.certificate_renders.update_one({"certificate_id": cert["certificate_id"], "format": fmt}, {"$set": entry}, upsert=True)
+    cert_counts["rendered"] += 1
+    return entry
+
+@app.get("/api/certificates/{certificate_id}/download")
+async def download_certificate(certificate_id: str, request: Request, format: str = "pdf"):
+    user = get_user(request)
+    if format not in certificate_render.FORMATS: raise HTTPException(400, "format must be pdf or png")
+    cert = db.certificates.find_one({"certificate_id": certificate_id}, {"_id": 0})
+    if not cert: raise HTTPException(404, "Certificate not found")
+    if user["role"] == "student" and cert["student_id"] != user["user_id"]: raise HTTPException(403, "Insufficient permissions")
+    entry = await render_certificate(cert, format)
+    return RangeFileResponse(request, blob_path("certificates", entry["sha256"], format), certificate_render.FORMATS[format],
+                             f'"{entry["sha256"]}"', filename=f"certificate-{certificate_id}.{format}")
+
+# ============ IMAGES ============
+# Course thumbnails and profile pictures stay plain URLs: remote, or /api/files/<file_id>
+# for uploads. Responses name resized copies /api/images/<key>/<variant>.<format>, key
+# being a hash of the source URL. The first request for a key fetches the source once
+# into STORAGE_DIR/images; variants are rendered in the render pool and kept on disk
+# under STORAGE_DIR/thumbs. Both directories evict their least recently used files past
+# IMAGE_SOURCE_CACHE_BYTES / IMAGE_CACHE_BYTES; an evicted source is fetched again on demand.
+# Only staff register arbitrary URLs directly; students can register their own uploads.
+# A URL's bytes never change (a new thumbnail is a new key, a new renderer a new ?v=), so
+# browsers and proxies may cache them forever.
+IMAGE_CACHE_BYTES = int(os.environ.get("IMAGE_CACHE_BYTES", str(512 * 1024 * 1024)))
+IMAGE_SOURCE_CACHE_BYTES = int(os.environ.get("IMAGE_SOURCE_CACHE_BYTES", str(1024 * 1024 * 1024)))
+IMAGE_SOURCE_MAX_BYTES = int(os.environ.get("IMAGE_SOURCE_MAX_BYTES", str(20 * 1024 * 1024)))
+IMAGE_FETCH_PRIVATE = os.environ.get("IMAGE_FETCH_PRIVATE", "false").lower() == "true"  # allow intranet hosts (development)
+IMAGE_RETRY_SECONDS = 600  # a source that failed to fetch is not retried for this long
+IMAGE_MAX_REDIRECTS = 3
+CARD_VARIANTS = ("card", "card_2x")
+AVATAR_VARIANTS = ("avatar", "avatar_2x")
+known_images = set()  # keys this worker has already registered in image_sources
+image_client = None
+source_inflight = {}  # key -> Task fetching the source
+variant_inflight = {}  # cache path -> Task rendering the variant
+
+class DiskLRU:
+    """Files under a directory, least recently used first, deleted past `limit` bytes.
+
+    Each worker tracks the files it has used; files another worker wrote join on first use
+    here, and on restart the order comes back from atime."""
+
+    def __init__(self, directory, limit, counter):
+        self.directory, self.limit, self.counter = directory, limit, counter
+        self.files = OrderedDict()  # path -> size
+        self.bytes = 0
+
+    def touch(self, path, size):
+        self.bytes += size - self.files.pop(path, 0)
+        self.files[path] = size
+        while self.bytes > self.limit and len(self.files) > 1:
+            old, old_size = self.files.popitem(last=False)
+            self.bytes -= old_size
+            image_counts[self.counter] += 1
+            try: os.remove(old)
+            except FileNotFoundError: pass
+
+    def forget(self, path):
+        self.bytes -= self.files.pop(path, 0)
+
+    def load(self):
+        entries = []
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if name.endswith(".tmp"): continue  # another worker mid-write
+                st = os.stat(os.path.join(root, name))
+                entries.append((st.st_atime, os.path.join(root, name), st.st_size))
+        for _, path, size in sorted(entries): self.touch(path, size)
+
+variant_cache = DiskLRU(os.path.join(STORAGE_DIR, "thumbs"), IMAGE_CACHE_BYTES, "evicted")
+source_cache = DiskLRU(os.path.join(STORAGE_DIR, "images"), IMAGE_SOURCE_CACHE_BYTES, "source_evicted")
+
+class ImageFetchError(Exception):
+    """The source URL could not be downloaded."""
+
+def image_key(url):
+    return hashlib.sha256(url.encode()).hexdigest()[:32]
+
+def register_images(urls):
+    """{url: key} for the usable URLs, recording any this worker has not seen in image_sources."""
+    keys = {u: image_key(u) for u in urls if u and (u.startswith(("http://", "https://")) or re.fullmatch(r"/api/files/file_\w+", u))}
+    new = {k: u for u, k in keys.items() if k not in known_images}
+    if new:
+        now = datetime.now(timezone.utc).isoformat()
+        try: db.image_sources.bulk_write([UpdateOne({"key": k}, {"$setOnInsert": {"key": k, "url": u, "created_at": now}}, upsert=True)
+                                          for k, u in new.items()], ordered=False)
+        except BulkWriteError: pass  # lost an upsert race to another worker; the entry exists either way
+        known_images.update(new)
+    return keys
+
+def image_variants(key, variants):
+    if not key: return {}
+    return {v: {fmt: f"/api/images/{key}/{v}.{fmt}?v={thumbnails.RENDERER_VERSION}" for fmt in thumbnails.FORMATS} for v in variants}
+
+def get_image_client():
+    global image_client
+    if image_client is None:
+        image_client = httpx.AsyncClient(timeout=httpx.Timeout(10.0, connect=3.0), headers={"User-Agent": "KIT-LMS image fetcher"},
+                                         limits=httpx.Limits(max_connections=10, max_keepalive_connections=5))
+    return image_client
+
+@app.on_event("shutdown")
+async def close_image_client():
+    if image_client is not None: await image_client.aclose()
+
+async def resolve_public(host):
+    """The address to connect to for host, refusing hosts that resolve to loopback, private or
+    link-local addresses. Callers connect to this address rather than the name, so a second,
+    different DNS answer (rebinding) cannot point the request somewhere internal."""
+    try: infos = await asyncio.get_running_loop().getaddrinfo(host, None)
+    except socket.gaierror as e: raise ImageFetchError(f"Cannot resolve {host}") from e
+    addresses = [ipaddress.ip_address(info[4][0].split("%")[0]) for info in infos]
+    if not all(a.is_global for a in addresses): raise ImageFetchError(f"{host} is not a public host")
+    return addresses[0]
+
+async def fetch_image(url):
+    """The bytes behind url. Redirects are followed by hand so every hop is checked."""
+    for _ in range(IMAGE_MAX_REDIRECTS + 1):
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https") or not parts.hostname: raise ImageFetchError("Only http(s) image URLs are supported")
+        target, headers, extensions = url, {}, {}
+        if not IMAGE_FETCH_PRIVATE:
+            address = await resolve_public(parts.hostname)
+            netloc = f"[{address}]" if address.version == 6 else str(address)
+            target = parts._replace(netloc=f"{netloc}:{parts.port}" if parts.port else netloc).geturl()
+            headers["Host"] = parts.netloc.rsplit("@", 1)[-1]
+            if parts.scheme == "https": extensions["sni_hostname"] = parts.hostname  # TLS still verifies the name
+        try:
+            async with get_image_client().stream("GET", target, headers=headers, extensions=extensions) as resp:
+                if resp.is_redirect and "location" in resp.headers:
+                    url = urljoin(url, resp.headers["location"])
+                    continue
+                if resp.status_code != 200: raise ImageFetchError(f"Image source returned {resp.status_code}")
+                if int(resp.headers.get("content-length") or 0) > IMAGE_SOURCE_MAX_BYTES: raise ImageFetchError("Image source is too large")
+                data = bytearray()
+                async for chunk in resp.aiter_bytes():
+                    data += chunk
+                    if len(data) > IMAGE_SOURCE_MAX_BYTES: raise ImageFetchError("Image source is too large")
+                return bytes(data)
+        except httpx.HTTPError as e:
+            raise ImageFetchError(f"Image source unreachable: {e!r}") from e
+    raise ImageFetchError("Too many redirects")
+
+def source_path(src):
+    return blob_path(src["area"], src["sha256"], "bin")
+
+async def image_source(key):
+    """The image_sources entry for key, with its bytes in the store (fetched on first use)."""
+    src = db.image_sources.find_one({"key": key}, {"_id": 0})
+    if not src: raise HTTPException(404, "Image not found")
+    if src.get("sha256") and os.path.exists(source_path(src)):
+        if src["area"] == "images": source_cache.touch(source_path(src), os.path.getsize(source_path(src)))
+        return src
+    if src.get("failed_until", "") > datetime.now(timezone.utc).isoformat(): raise HTTPException(404, "Image source unavailable")
+    return await single_flight(source_inflight, key, lambda: load_image_source(src))
+
+async def load_image_source(src):
+    key = src["key"]
+    try:
+        if src["url"].startswith("/api/files/"):
+            file = db.files.find_one({"file_id": src["url"].rsplit("/", 1)[1]}, {"_id": 0})
+            if not file or not file["content_type"].startswith("image/"): raise ImageFetchError("Not an uploaded image")
+            update = {"area": "uploads", "sha256": file["sha256"]}
+        else:
+            data = await fetch_image(src["url"])
+            update = {"area": "images", "sha256": await run_in_threadpool(write_blob, "images", data, "bin")}
+            source_cache.touch(blob_path("images", update["sha256"], "bin"), len(data))
+            image_counts["fetched"] += 1
+    except ImageFetchError as e:
+        image_counts["fetch_failed"] += 1
+        retry = (datetime.now(timezone.utc) + timedelta(seconds=IMAGE_RETRY_SECONDS)).isoformat()
+        db.image_sources.update_one({"key": key}, {"$set": {"error": str(e), "failed_until": retry}})
+        raise HTTPException(404, "Image source unavailable")
+    update["fetched_at"] = datetime.now(timezone.utc).isoformat()
+    db.image_sources.update_one({"key": key}, {"$set": update, "$unset": {"error": "", "failed_until": ""}})
+    return {**src, **update}
+
+def variant_path(key, variant, fmt):
+    return os.path.join(STORAGE_DIR, "thumbs", key[:2], f"{key}-{variant}-r{thumbnails.RENDERER_VERSION}.{fmt}")
+
+@app.on_event("startup")
+def load_image_caches():
+    variant_cache.load()
+    source_cache.load()
+
+def write_variant(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp, "wb") as f: f.write(data)
+    os.replace(tmp, path)
+
+def read_variant(path):
+    with open(path, "rb") as f: return f.read()
+
+async def image_variant(key, variant, fmt):
+    """The bytes of a variant, from the disk cache or rendered from the source."""
+    path = variant_path(key, variant, fmt)
+    try:
+        data = await run_in_threadpool(read_variant, path)
+        variant_cache.touch(path, len(data))
+        image_counts["hit"] += 1
+        return data
+    except FileNotFoundError:
+        variant_cache.forget(path)  # evicted, possibly by another worker
+    return await single_flight(variant_inflight, path, lambda: render_image_variant(key, variant, fmt, path))
+
+async def render_image_variant(key, variant, fmt, path):
+    src = await image_source(key)
+    try: data = await asyncio.get_running_loop().run_in_executor(get_render_pool(), thumbnails.resize, source_path(src), variant, fmt)
+    except ValueError as e: raise HTTPException(422, str(e))
+    await run_in_threadpool(write_variant, path, data)
+    variant_cache.touch(path, len(data))
+    image_counts["rendered"] += 1
+    return data
+
+@app.post("/api/images")
+async def register_image(request: Request):
+    """Register a source (url, or file_id of an uploaded image) and fetch it now, so a bad URL fails when it is saved."""
+    user = get_user(request)
+    body = await request.json()
+    url = f"/api/files/{body['file_id']}" if body.get("file_id") else str(body.get("url", "")).strip()
+    if not url.startswith("/api/files/"): require_role(user, ["super_admin", "instructor"])
+    if url.startswith("/api/files/"):
+        file = db.files.find_one({"file_id": url.rsplit("/", 1)[1]}, {"_id": 0, "owner_id": 1, "content_type": 1})
+        if not file or (user["role"] != "super_admin" and file["owner_id"] != user["user_id"]): raise HTTPException(400, "Unknown file_id")
+        if not file["content_type"].startswith("image/"): raise HTTPException(400, f"Unsupported image type {file['content_type']}")
+    key = register_images([url]).get(url)
+    if not key: raise HTTPException(400, "url must be an http(s) URL")
+    try: await image_source(key)
+    except HTTPException:
+        src = db.image_sources.find_one({"key": key}, {"_id": 0, "error": 1}) or {}
+        raise HTTPException(400, f"Could not fetch image: {src.get('error', 'unavailable')}")
+    return {"url": url, "key": key, "variants": image_variants(key, thumbnails.VARIANTS)}
+
+@app.api_route("/api/images/{key}/{variant}.{fmt}", methods=["GET", "HEAD"])
+async def get_image(key: str, variant: str, fmt: str, request: Request):
+    if variant not in thumbnails.VARIANTS or fmt not in thumbnails.FORMATS or not re.fullmatch(r"[0-9a-f]{32}", key):
+        raise HTTPException(404, "Image not found")
+    etag = f'"{key}-{variant}-r{thumbnails.RENDERER_VERSION}.{fmt}"'
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=31536000, immutable",
+               "Content-Encoding": "identity"}  # already compressed; keeps GZipMiddleware away
+    if etag in [t.strip() for t in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers=headers)
+    return Response(await image_variant(key, variant, fmt), media_type=thumbnails.FORMATS[fmt], headers=headers)
+
 # ============ SETTINGS ============
 @app.get("/api/settings")
+@cached("settings", audience=viewer_role)
 async def get_settings(request: Request):
     user = get_user(request)
     require_role(user, ["super_admin"])
@@ -1045,10 +2710,12 @@ async def update_settings(request: Request):
     body = await request.json()
     body["key"] = "platform"
     db.settings.update_one({"key": "platform"}, {"$set": body}, upsert=True)
+    bump_version("settings")
     return db.settings.find_one({"key": "platform"}, {"_id": 0})
 
 # ============ ROLES ============
 @app.get("/api/roles")
+@cached("roles", audience=viewer_role)
 async def list_roles(request: Request):
     user = get_user(request)
     require_role(user, ["super_admin"])
@@ -1063,22 +2730,592 @@ async def list_roles(request: Request):
         return defaults
     return roles
 
+# ============ EXPORT ============
+# Rows stream from a cursor in EXPORT_BATCH chunks; each chunk resolves its names with
+# one $in per related collection. Student names are looked up per chunk (memory stays
+# flat for millions of rows); courses, assignments and quizzes are few and kept for the run.
+EXPORT_BATCH = 1000
+EXPORTS = {
+    "enrollments": ["enrollment_id", "student_id", "student_name", "student_email", "course_id", "course_title",
+                    "status", "progress", "lessons_completed", "enrolled_at", "completed_at"],
+    "submissions": ["submission_id", "assignment_id", "assignment_title", "course_id", "course_title", "student_id",
+                    "student_name", "student_email", "grade", "feedback", "graded_by", "submitted_at", "graded_at"],
+    "quiz_attempts": ["attempt_id", "quiz_id", "quiz_title", "course_id", "course_title", "student_id", "student_name",
+                      "student_email", "score", "passed", "attempted_at"],
+    "users": ["user_id", "email", "name", "role", "status", "school_name", "class_name", "points", "created_at"],
+}
+
+def lookup(col, key, ids, fields, cache):
+    missing = list({i for i in ids if i and i not in cache})
+    if missing:
+        for d in db[col].find({key: {"$in": missing}}, {"_id": 0, key: 1, **{f: 1 for f in fields}}):
+            cache[d[key]] = d
+    return cache
+
+def export_batch(kind, docs, cache):
+    if kind == "users": return docs
+    if kind == "submissions":
+        assignments = lookup("assignments", "assignment_id", [d["assignment_id"] for d in docs], ["title", "course_id"], cache["assignments"])
+        for d in docs:
+            a = assignments.get(d["assignment_id"], {})
+            d["assignment_title"], d["course_id"] = a.get("title", ""), a.get("course_id", "")
+    if kind == "quiz_attempts":
+        quizzes = lookup("quizzes", "quiz_id", [d["quiz_id"] for d in docs], ["title", "course_id"], cache["quizzes"])
+        for d in docs:
+            q = quizzes.get(d["quiz_id"], {})
+            d["quiz_title"], d["course_id"] = q.get("title", ""), q.get("course_id", "")
+    courses = lookup("courses", "course_id", [d["course_id"] for d in docs], ["title"], cache["courses"])
+    students = lookup("users", "user_id", [d["student_id"] for d in docs], ["name", "email"], {})
+    for d in docs:
+        s = students.get(d["student_id"], {})
+        d["student_name"], d["student_email"] = s.get("name", "Unknown"), s.get("email", "")
+        d["course_title"] = courses.get(d["course_id"], {}).get("title", "Unknown")
+        if kind == "enrollments": d["lessons_completed"] = len(d.get("completed_lessons", []))
+    return docs
+
+def export_rows(kind, query):
+    cache = {"courses": {}, "assignments": {}, "quizzes": {}}
+    batch = []
+    for doc in db[kind].find(query, {"_id": 0, "password_hash": 0}, batch_size=EXPORT_BATCH):
+        batch.append(doc)
+        if len(batch) == EXPORT_BATCH:
+            yield export_batch(kind, batch, cache)
+            batch = []
+    if batch: yield export_batch(kind, batch, cache)
+
+def csv_cell(v):
+    if v is None: return ""
+    # Spreadsheets evaluate cells starting with these as formulas
+    if isinstance(v, str) and v[:1] in ("=", "+", "-", "@"): return "'" + v
+    return v
+
+def export_csv(kind, batches):
+    columns = EXPORTS[kind]
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(columns)
+    yield buf.getvalue()
+    for docs in batches:
+        buf.seek(0)
+        buf.truncate()
+        writer.writerows([csv_cell(d.get(c)) for c in columns] for d in docs)
+        yield buf.getvalue()
+
+def export_ndjson(kind, batches):
+    columns = EXPORTS[kind]
+    for docs in batches:
+        yield b"".join(orjson.dumps({c: d.get(c) for c in columns}) + b"\n" for d in docs)
+
+@app.get("/api/export/{kind}")
+async def export(kind: str, request: Request, format: str = "csv", course_id: Optional[str] = None, role: Optional[str] = None):
+    user = get_user(request)
+    require_role(user, ["super_admin", "instructor"])
+    if kind not in EXPORTS: raise HTTPException(404, "Unknown export")
+    if format not in ("csv", "ndjson"): raise HTTPException(400, "format must be csv or ndjson")
+    if kind == "users" and user["role"] != "super_admin": raise HTTPException(403, "Insufficient permissions")
+    query = {}
+    if kind == "users":
+        if role: query["role"] = role
+    else:
+        course_ids = [course_id] if course_id else None
+        if user["role"] == "instructor":
+            own = [c["course_id"] for c in db.courses.find({"instructor_ids": user["user_id"]}, {"course_id": 1, "_id": 0})]
+            course_ids = [c for c in course_ids if c in own] if course_ids else own
+        if course_ids is not None:
+            if kind == "enrollments": query["course_id"] = {"$in": course_ids}
+            if kind == "submissions": query["assignment_id"] = {"$in": [a["assignment_id"] for a in db.assignments.find({"course_id": {"$in": course_ids}}, {"assignment_id": 1, "_id": 0})]}
+            if kind == "quiz_attempts": query["quiz_id"] = {"$in": [q["quiz_id"] for q in db.quizzes.find({"course_id": {"$in": course_ids}}, {"quiz_id": 1, "_id": 0})]}
+    rows = export_rows(kind, query)
+    body, media_type = (export_csv(kind, rows), "text/csv; charset=utf-8") if format == "csv" else (export_ndjson(kind, rows), "application/x-ndjson")
+    filename = f"{kind}-{datetime.now(timezone.utc):%Y%m%d}.{format}"
+    return StreamingResponse(body, media_type=media_type, headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+# ============ SEARCH ============
+TOKEN_RE = re.compile(r"\w+")
+
+def tokenize(text):
+    return TOKEN_RE.findall((text or "").lower())
+
+def within_one_edit(a, b):
+    """True if a and b differ by at most one insertion, deletion, substitution or adjacent swap."""
+    if abs(len(a) - len(b)) > 1: return False
+    if len(a) > len(b): a, b = b, a
+    i = 0
+    while i < len(a) and a[i] == b[i]: i += 1
+    if len(a) == len(b): return a[i + 1:] == b[i + 1:] or (a[i:i + 2] == b[i:i + 2][::-1] and a[i + 2:] == b[i + 2:])
+    return a[i:] == b[i + 1:]
+
+class SearchIndex:
+    """In-process inverted index over (kind, id) documents with prefix and one-typo matching.
+
+    Each document is a list of (text, weight) fields plus a small meta dict used for
+    visibility filtering, so a query never has to touch Mongo to rank or filter.
+    Documents may belong to a group (lessons are grouped by course) so scoped queries
+    only walk that group's postings, and may keep their plain text for snippets."""
+    PREFIX_FACTOR, FUZZY_FACTOR, MAX_EXPANSIONS = 0.6, 0.4, 50
+    SNIPPET_RADIUS = 80
+
+    def __init__(self):
+        self.postings = defaultdict(dict)  # term -> {(kind, id): weighted term frequency}
+        self.terms = []                    # sorted vocabulary for prefix scans
+        self.docs = {}                     # (kind, id) -> (set of terms, meta, group)
+        self.groups = defaultdict(set)     # (kind, group) -> {(kind, id)}
+        self.texts = {}                    # (kind, id) -> plain text used for snippets
+
+    def clear(self):
+        self.postings.clear(); self.terms.clear(); self.docs.clear(); self.groups.clear(); self.texts.clear()
+
+    def add(self, kind, doc_id, fields, meta=None, group=None, text=None):
+        key = (kind, doc_id)
+        self.remove(kind, doc_id)
+        weights = defaultdict(float)
+        for field, w in fields:
+            for t in tokenize(field): weights[t] += w
+        for t, w in weights.items():
+            if t not in self.postings: bisect.insort(self.terms, t)
+            self.postings[t][key] = w
+        self.docs[key] = (set(weights), meta or {}, group)
+        if group is not None: self.groups[(kind, group)].add(key)
+        if text: self.texts[key] = text
+
+    def remove(self, kind, doc_id):
+        key = (kind, doc_id)
+        entry = self.docs.pop(key, None)
+        if not entry: return
+        self.texts.pop(key, None)
+        if entry[2] is not None:
+            members = self.groups[(kind, entry[2])]
+            members.discard(key)
+            if not members: del self.groups[(kind, entry[2])]
+        for t in entry[0]:
+            posting = self.postings[t]
+            posting.pop(key, None)
+            if not posting:
+                del self.postings[t]
+                del self.terms[bisect.bisect_left(self.terms, t)]
+
+    def meta(self, kind, doc_id):
+        entry = self.docs.get((kind, doc_id))
+        return entry[1] if entry else None
+
+    def expand(self, term):
+        """Map a query term to matching vocabulary terms with a match-quality factor."""
+        out = {}
+        if term in self.postings: out[term] = 1.0
+        i = bisect.bisect_left(self.terms, term)
+        while i < len(self.terms) and self.terms[i].startswith(term) and len(out) < self.MAX_EXPANSIONS:
+            out.setdefault(self.terms[i], self.PREFIX_FACTOR)
+            i += 1
+        if not out and len(term) >= 4:
+            # Typo tolerance: only scan the slice of the vocabulary sharing the first letter
+            i = bisect.bisect_left(self.terms, term[0])
+            while i < len(self.terms) and self.terms[i][0] == term[0] and len(out) < self.MAX_EXPANSIONS:
+                if within_one_edit(term, self.terms[i]): out[self.terms[i]] = self.FUZZY_FACTOR
+                i += 1
+        return out
+
+    def search(self, query, kinds=None, group=None):
+        """Return [((kind, id), score)] for documents matching every query term, best first.
+
+        With group=(kind, group_id) only that group's documents are considered."""
+        scope = self.groups.get(group, set()) if group else None
+        if group: kinds = {group[0]}
+        scores = None
+        n = max(len(self.docs), 1)
+        for qt in set(tokenize(query)):
+            term_scores = defaultdict(float)
+            for t, factor in self.expand(qt).items():
+                posting = self.postings[t]
+                idf = math.log(1 + n / len(posting))
+                keys = posting if scope is None or len(posting) <= len(scope) else (k for k in scope if k in posting)
+                for key in keys:
+                    if kinds is not None and key[0] not in kinds or scope is not None and key not in scope: continue
+                    term_scores[key] = max(term_scores[key], posting[key] * factor * idf)
+            if scores is None: scores = term_scores
+            else: scores = {k: v + term_scores[k] for k, v in scores.items() if k in term_scores}
+            if not scores: return []
+        return sorted((scores or {}).items(), key=lambda kv: -kv[1])
+
+    def ids(self, kind, query):
+        return [key[1] for key, _ in self.search(query, {kind})]
+
+    def matched_terms(self, query):
+        return {t for qt in tokenize(query) for t in self.expand(qt)}
+
+    def snippet(self, kind, doc_id, terms):
+        """Return an HTML-escaped excerpt around the first matched term, with matches wrapped in <mark>."""
+        text = self.texts.get((kind, doc_id), "")
+        hits = [m for m in TOKEN_RE.finditer(text) if m.group().lower() in terms]
+        if not hits: return html.escape(text[:2 * self.SNIPPET_RADIUS])
+        lo = max(hits[0].start() - self.SNIPPET_RADIUS, 0)
+        hi = min(hits[0].end() + self.SNIPPET_RADIUS, len(text))
+        out, pos = [], lo
+        for m in hits:
+            if m.start() < lo or m.end() > hi: continue
+            out.append(html.escape(text[pos:m.start()]) + "<mark>" + html.escape(m.group()) + "</mark>")
+            pos = m.end()
+        out.append(html.escape(text[pos:hi]))
+        return ("…" if lo > 0 else "") + "".join(out) + ("…" if hi < len(text) else "")
+
+search_index = SearchIndex()
+
+def index_course(c):
+    search_index.add("courses", c["course_id"], [(c.get("title", ""), 3), (c.get("category", ""), 2), (c.get("description", ""), 1)],
+                     {"title": c.get("title", ""), "status": c.get("status"), "visibility": c.get("visibility"), "instructor_ids": c.get("instructor_ids", [])})
+
+TAG_RE = re.compile(r"<[^>]+>")
+
+def strip_html(content):
+    return " ".join(html.unescape(TAG_RE.sub(" ", content or "")).split())
+
+def index_lesson(l):
+    text = strip_html(l.get("content", ""))
+    search_index.add("lessons", l["lesson_id"], [(l.get("title", ""), 3), (text, 1)],
+                     {"title": l.get("title", ""), "course_id": l.get("course_id"), "module_id": l.get("module_id"), "lesson_type": l.get("type")},
+                     group=l.get("course_id"), text=text)
+
+def index_user(u):
+    search_index.add("users", u["user_id"], [(u.get("name", ""), 3), (u.get("email", ""), 2)],
+                     {"title": u.get("name", ""), "email": u.get("email", ""), "role": u.get("role")})
+
+SEARCH_SOURCES = {"courses": ("course_id", index_course), "lessons": ("lesson_id", index_lesson), "users": ("user_id", index_user)}
+# Mongo _id -> (kind, id), so change-stream delete events (which only carry _id) can be unindexed
+search_oids = {}
+
+def index_doc(kind, doc):
+    id_field, indexer = SEARCH_SOURCES[kind]
+    if "_id" in doc: search_oids[doc["_id"]] = (kind, doc[id_field])
+    indexer(doc)
+
+def reindex(kind, doc_id):
+    id_field, _ = SEARCH_SOURCES[kind]
+    doc = db[kind].find_one({id_field: doc_id}, {"password_hash": 0})
+    if doc: index_doc(kind, doc)
+    else: search_index.remove(kind, doc_id)
+
+@app.on_event("startup")
+def rebuild_search_index():
+    search_index.clear()
+    search_oids.clear()
+    for kind in SEARCH_SOURCES:
+        for doc in db[kind].find({}, {"password_hash": 0}):
+            index_doc(kind, doc)
+
+def course_visible(meta, user):
+    if not meta: return False
+    if user is None: return meta["status"] == "published" and meta["visibility"] == "public"
+    if user["role"] == "student": return meta["status"] == "published"
+    if user["role"] == "instructor": return user["user_id"] in meta["instructor_ids"]
+    return True
+
+@app.get("/api/search")
+async def search(request: Request, q: str = "", types: str = "courses,lessons,users", course_id: Optional[str] = None, page: int = 1, limit: int = 20):
+    try: user = get_user(request)
+    except HTTPException: user = None
+    kinds = {t for t in types.split(",") if t in SEARCH_SOURCES}
+    if not user or user["role"] != "super_admin": kinds.discard("users")
+    if not kinds: return {"query": q, "total": 0, "page": max(page, 1), "limit": min(max(limit, 1), 100), "results": []}
+    page, limit = max(page, 1), min(max(limit, 1), 100)
+    results = []
+    for (kind, doc_id), score in search_index.search(q, kinds, group=("lessons", course_id) if kinds == {"lessons"} and course_id else None):
+        meta = search_index.meta(kind, doc_id)
+        if kind == "courses":
+            if course_id and doc_id != course_id or not course_visible(meta, user): continue
+        elif kind == "lessons":
+            if course_id and meta["course_id"] != course_id: continue
+            if not course_visible(search_index.meta("courses", meta["course_id"]), user): continue
+        results.append({"type": kind, "id": doc_id, "score": round(score, 3), **meta})
+    total, results = len(results), results[(page - 1) * limit:page * limit]
+    terms = search_index.matched_terms(q)
+    for r in results:
+        r.pop("instructor_ids", None)
+        if r["type"] == "lessons": r["snippet"] = search_index.snippet("lessons", r["id"], terms)
+    return {"query": q, "total": total, "page": page, "limit": limit, "results": results}
+
+@app.get("/api/courses/{course_id}/lessons/search")
+async def search_course_lessons(course_id: str, request: Request, q: str = "", limit: int = 20):
+    try: user = get_user(request)
+    except HTTPException: user = None
+    if not course_visible(search_index.meta("courses", course_id), user):
+        raise HTTPException(404, "Course not found")
+    hits = search_index.search(q, group=("lessons", course_id))[:min(max(limit, 1), 100)]
+    terms = search_index.matched_terms(q)
+    return [{"lesson_id": doc_id, "score": round(score, 3), **search_index.meta(kind, doc_id),
+             "snippet": search_index.snippet(kind, doc_id, terms)} for (kind, doc_id), score in hits]
+
+# ============ CACHE INVALIDATION BUS ============
+# Version counters and the search index live in each worker's memory. With several
+# uvicorn workers, a write handled by one worker is replayed into every other worker
+# by tailing MongoDB change streams (replica set or sharded cluster required).
+CACHE_BUS_COLLECTIONS = ["courses", "modules", "lessons", "quizzes", "users", "enrollments", "settings", "roles"]
+log = logging.getLogger("kit.cache_bus")
+
+def apply_change(change):
+    """Replay one change-stream event into this worker's caches. Runs on the event loop."""
+    op = change["operationType"]
+    if op in ["drop", "rename", "dropDatabase", "invalidate"]:
+        bump_version(*CACHE_BUS_COLLECTIONS)
+        rebuild_search_index()
+        return
+    coll = change["ns"]["coll"]
+    bump_version(coll)
+    if coll not in SEARCH_SOURCES: return
+    if op == "delete":
+        key = search_oids.pop(change["documentKey"]["_id"], None)
+        if key: search_index.remove(*key)
+    elif change.get("fullDocument"):
+        index_doc(coll, {k: v for k, v in change["fullDocument"].items() if k != "password_hash"})
+
+class CacheBus:
+    """Background thread tailing change streams on CACHE_BUS_COLLECTIONS.
+
+    Events are handed to the event loop with call_soon_threadsafe so the caches are only
+    ever mutated from the loop thread. The resume token is persisted in db.cache_bus
+    (at most once per TOKEN_FLUSH_SECONDS) so a restarted worker resumes where it left off."""
+    TOKEN_FLUSH_SECONDS = 1.0
+
+    def __init__(self, bus_id):
+        self.bus_id = bus_id
+        self.state = "stopped"
+        self.stopping = threading.Event()
+        self.thread = None
+        self.loop = None
+
+    def start(self, loop):
+        self.loop = loop
+        self.stopping.clear()
+        self.thread = threading.Thread(target=self.run, name="cache-bus", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopping.set()
+        if self.thread: self.thread.join(timeout=5)
+        self.state = "stopped"
+
+    def run(self):
+        while not self.stopping.is_set():
+            saved = db.cache_bus.find_one({"_id": self.bus_id}) or {}
+            try:
+                self.tail(saved.get("token"))
+            except OperationFailure as e:
+                if e.code == 40573:  # change streams need a replica set
+                    log.warning("Cache bus disabled: %s", e)
+                    self.state = "disabled"
+                    return
+                if saved.get("token") and e.code in [260, 280, 286]:
+                    # Resume point is gone from the oplog: start fresh and drop everything cached
+                    log.warning("Cache bus resume failed, resyncing: %s", e)
+                    db.cache_bus.delete_one({"_id": self.bus_id})
+                    self.loop.call_soon_threadsafe(apply_change, {"operationType": "invalidate"})
+                    continue
+                log.warning("Cache bus error, retrying: %s", e)
+                self.state = "retrying"
+                self.stopping.wait(2)
+            except PyMongoError as e:
+                log.warning("Cache bus error, retrying: %s", e)
+                self.state = "retrying"
+                self.stopping.wait(2)
+            except Exception:
+                log.exception("Cache bus stopped")
+                self.state = "disabled"
+                return
+
+    def tail(self, token):
+        pipeline = [{"$match": {"$or": [{"ns.coll": {"$in": CACHE_BUS_COLLECTIONS}}, {"operationType": {"$in": ["dropDatabase", "invalidate"]}}]}}]
+        with db.watch(pipeline, full_document="updateLookup", resume_after=token, max_await_time_ms=1000) as stream:
+            self.state = "running"
+            flushed = time.monotonic()
+            while not self.stopping.is_set() and stream.alive:
+                change = stream.try_next()
+                if change is not None:
+                    self.loop.call_soon_threadsafe(apply_change, change)
+                if stream.resume_token and time.monotonic() - flushed >= self.TOKEN_FLUSH_SECONDS:
+                    db.cache_bus.update_one({"_id": self.bus_id}, {"$set": {"token": stream.resume_token, "updated_at": datetime.now(timezone.utc)}}, upsert=True)
+                    flushed = time.monotonic()
+
+# One bus id per worker process: workers on one host must not share a resume token
+cache_bus = CacheBus(os.environ.get("CACHE_BUS_ID", f"{socket.gethostname()}:{os.getpid()}"))
+
+@app.on_event("startup")
+async def start_cache_bus():
+    if os.environ.get("CACHE_BUS", "1") != "0":
+        cache_bus.start(asyncio.get_running_loop())
+
+@app.on_event("shutdown")
+def stop_cache_bus():
+    cache_bus.stop()
+
 # ============ SEED DATA ============
-@app.post("/api/seed")
-async def seed_data():
-    for col in ["users", "courses", "modules", "lessons", "quizzes", "assignments", "enrollments", "quiz_attempts", "submissions", "notifications", "certificates", "cert_templates", "activity_logs", "settings", "roles", "user_sessions", "password_resets"]:
+# The demo accounts and courses are always loaded; these knobs add synthetic volume on
+# top. Counts are totals except modules/lessons/quizzes/assignments (per course, per
+# module for lessons) and enrollments (per student). The same seed gives the same data.
+SEED_DEFAULTS = {"seed": 42, "schools": 0, "instructors": 0, "students": 0, "courses": 0, "modules": 4, "lessons": 5,
+                 "quizzes": 2, "questions": 5, "assignments": 2, "enrollments": 3, "attempts": 0, "submissions": 0,
+                 "events": 0, "batch": 5000}
+# POST /api/seed refuses more than this; seed.py on the command line is not capped
+SEED_LIMITS = {"seed": 2 ** 32, "schools": 100, "instructors": 1000, "students": 20000, "courses": 200, "modules": 20,
+               "lessons": 20, "quizzes": 10, "questions": 50, "assignments": 10, "enrollments": 10, "attempts": 100000,
+               "submissions": 100000, "events": 200000, "batch": 10000}
+SEED_OPEN = os.environ.get("SEED_OPEN", "false").lower() == "true"  # anyone may reseed (development databases only)
+SEED_FIRST_NAMES = ("Amara", "Ben", "Chloe", "Daniel", "Elif", "Felix", "Grace", "Hiro", "Ines", "Jonah", "Kofi", "Lena",
+                    "Mateo", "Nia", "Oscar", "Priya", "Quinn", "Rosa", "Sami", "Tara", "Umar", "Vera", "Wei", "Yara", "Zane")
+SEED_LAST_NAMES = ("Adeyemi", "Baker", "Costa", "Dubois", "Evans", "Fischer", "Gupta", "Hughes", "Ito", "Jensen", "Khan",
+                   "Lopez", "Murphy", "Nguyen", "Okafor", "Patel", "Rossi", "Silva", "Tanaka", "Walsh")
+SEED_TOWNS = ("Riverside", "Hillcrest", "Oakwood", "Lakeview", "Northgate", "Westbrook", "Southfield", "Eastwood", "Maple", "Cedar")
+SEED_TOPICS = ("Python", "JavaScript", "Robotics", "Game Design", "Web Design", "Data Science", "Scratch", "3D Modelling",
+               "Cyber Safety", "App Development", "Electronics", "Animation")
+SEED_WORDS = ("variables", "loops", "functions", "events", "sprites", "sensors", "arrays", "conditions", "debugging",
+              "layouts", "colours", "motors", "datasets", "charts", "algorithms", "networks", "pixels", "servers")
+SEED_ACTIONS = ("lesson_viewed", "lesson_completed", "quiz_attempted", "assignment_submitted")
+
+def insert_batches(col, docs, size, after=None):
+    """insert_many in fixed-size batches from any iterable; after(batch) runs once per batch."""
+    n, batch = 0, []
+    for d in docs:
+        batch.append(d)
+        if len(batch) >= size:
+            db[col].insert_many(batch, ordered=False)
+            if after: after(batch)
+            n, batch = n + len(batch), []
+    if batch:
+        db[col].insert_many(batch, ordered=False)
+        if after: after(batch)
+    return n + len(batch)
+
+def seed_synthetic(p, rng, hashes, now, v):
+    if not (p["courses"] or p["students"]): return
+    base = datetime.now(timezone.utc)
+    def person(): return f"{rng.choice(SEED_FIRST_NAMES)} {rng.choice(SEED_LAST_NAMES)}"
+    def past(days): return (base - timedelta(seconds=rng.randint(0, days * 86400))).isoformat()
+    schools = [f"{rng.choice(SEED_TOWNS)} {rng.choice(('Primary', 'Academy', 'High School', 'Junior School'))} {i + 1}" for i in range(max(p["schools"], 1))]
+    instructors = [f"user_syninst{i:05d}" for i in range(p["instructors"] or max(1, p["courses"] // 4))]
+    insert_batches("users", ({"user_id": uid, "email": f"instructor{i:05d}@kidsintech.school", "name": person(), "password_hash": hashes["instructor123"],
+                              "role": "instructor", "picture": "", "bio": "", "status": "active", "points": 0, "must_reset_password": False,
+                              "school_name": rng.choice(schools), "created_at": now, "version": v} for i, uid in enumerate(instructors)), p["batch"])
+
+    courses, modules, lessons, quizzes, assignments = [], [], [], [], []
+    course_lessons, course_quizzes, course_assignments = {}, defaultdict(list), defaultdict(list)
+    for ci in range(p["courses"]):
+        cid, topic, owner = f"course_syn{ci:05d}", rng.choice(SEED_TOPICS), rng.choice(instructors)
+        published = rng.random() < 0.9
+        courses.append({"course_id": cid, "title": f"{topic} {rng.choice(('Basics', 'Projects', 'Lab', 'Challenge', 'Studio'))} {ci + 1}",
+                        "slug": f"syn-{ci:05d}", "description": f"Learn {topic} through {rng.choice(SEED_WORDS)} and {rng.choice(SEED_WORDS)}.",
+                        "thumbnail": "", "category": topic, "level": rng.choice(("beginner", "intermediate", "advanced")), "duration_weeks": rng.randint(4, 12),
+                        "instructor_ids": [owner], "status": "published" if published else "draft",
+                        "visibility": "public" if published else "private", "prerequisites": "", "certificate_enabled": True,
+                        "created_by": owner, "created_at": now, "updated_at": now, "version": v})
+        course_lessons[cid] = []
+        for mi in range(p["modules"]):
+            mid = f"mod_syn{ci:05d}{mi:03d}"
+            modules.append({"module_id": mid, "course_id": cid, "title": f"{topic} {rng.choice(SEED_WORDS).title()}", "description": f"Module {mi + 1}",
+                            "order": mi + 1, "estimated_duration": "2 hours", "unlock_rule": "sequential", "created_at": now})
+            for li in range(p["lessons"]):
+                lid = f"les_syn{ci:05d}{mi:03d}{li:03d}"
+                words = rng.sample(SEED_WORDS, 3)
+                lessons.append({"lesson_id": lid, "module_id": mid, "course_id": cid, "title": f"{words[0].title()} and {words[1]}",
+                                "type": rng.choice(("text", "video")), "duration": f"{rng.randint(5, 40)} min",
+                                "content": f"<h2>{words[0].title()}</h2><p>In this lesson we use {words[1]} to explore {words[2]} in {topic}.</p>",
+                                "video_url": "", "youtube_url": "", "order": li + 1, "status": "published", "quiz_id": "", "created_at": now})
+                course_lessons[cid].append(lid)
+        for qi in range(p["quizzes"]):
+            questions = []
+            for n in range(p["questions"]):
+                options = rng.sample(SEED_WORDS, 4)
+                questions.append({"question_id": f"q{n + 1}", "question": f"Which idea goes with {rng.choice(SEED_WORDS)}?", "type": "multiple_choice",
+                                  "options": options, "correct_answer": options[0]})
+            quiz = {"quiz_id": f"quiz_syn{ci:05d}{qi:02d}", "title": f"{topic} Quiz {qi + 1}", "course_id": cid, "questions": questions, "time_limit": 15,
+                    "attempts_allowed": 3, "pass_mark": 70, "auto_grade": True, "created_by": instructors[0], "created_at": now}
+            quizzes.append(quiz)
+            course_quizzes[cid].append(quiz)
+        for ai in range(p["assignments"]):
+            aid = f"asgn_syn{ci:05d}{ai:02d}"
+            assignments.append({"assignment_id": aid, "title": f"{topic} Project {ai + 1}", "description": f"Build something with {rng.choice(SEED_WORDS)}.",
+                                "course_id": cid, "module_id": "", "due_date": (base + timedelta(days=rng.randint(1, 30))).isoformat(),
+                                "allow_file_upload": True, "allow_text_submission": True, "allow_resubmission": True, "max_score": 100,
+                                "created_by": instructors[0], "created_at": now})
+            course_assignments[cid].append(aid)
+    for col, docs in (("courses", courses), ("modules", modules), ("lessons", lessons), ("quizzes", quizzes), ("assignments", assignments)):
+        insert_batches(col, docs, p["batch"])
+
+    insert_batches("users", ({"user_id": f"user_syn{i:06d}", "email": f"syn{i:06d}@student.kidsintech.school", "name": person(),
+                              "password_hash": hashes["student123"], "role": "student", "picture": "", "bio": "", "status": "active",
+                              "points": rng.randint(0, 2000), "must_reset_password": False, "school_name": rng.choice(schools),
+                              "created_at": now, "version": v} for i in range(p["students"])), p["batch"])
+
+    open_courses = [c["course_id"] for c in courses if c["status"] == "published"]
+    enrolled = []  # (student_id, course_id)
+    def enrollment_docs():
+        for i in range(p["students"]):
+            sid = f"user_syn{i:06d}"
+            for cid in rng.sample(open_courses, min(p["enrollments"], len(open_courses))):
+                les = course_lessons[cid]
+                done = rng.randint(0, len(les))
+                progress = round(done / len(les) * 100, 1) if les else 0
+                e = {"enrollment_id": f"enr_syn{len(enrolled):08d}", "student_id": sid, "course_id": cid, "progress": progress,
+                     "status": "completed" if les and done == len(les) else "active", "completed_lessons": les[:done], "enrolled_at": past(120), "version": v}
+                if e["status"] == "completed": e["completed_at"] = now
+                enrolled.append((sid, cid))
+                yield e
+    insert_batches("enrollments", enrollment_docs(), p["batch"])
+    if not enrolled: return
+
+    def attempt_docs():
+        for n in range(p["attempts"]):
+            sid, cid = rng.choice(enrolled)
+            if not course_quizzes[cid]: continue
+            quiz, ability = rng.choice(course_quizzes[cid]), rng.random()
+            answers = [{"question_id": q["question_id"], "answer": q["correct_answer"] if rng.random() < ability else rng.choice(q["options"])} for q in quiz["questions"]]
+            right = sum(a["answer"] == q["correct_answer"] for a, q in zip(answers, quiz["questions"]))
+            score = round(right / len(answers) * 100, 1) if answers else 0
+            yield {"attempt_id": f"att_syn{n:08d}", "quiz_id": quiz["quiz_id"], "student_id": sid, "answers": answers, "score": score,
+                   "passed": score >= quiz["pass_mark"], "attempted_at": past(90)}
+    insert_batches("quiz_attempts", attempt_docs(), p["batch"])
+
+    def submission_docs():
+        seen = set()
+        for n in range(p["submissions"]):
+            sid, cid = rng.choice(enrolled)
+            if not course_assignments[cid]: continue
+            aid = rng.choice(course_assignments[cid])
+            if (aid, sid) in seen: continue
+            seen.add((aid, sid))
+            graded = rng.random() < 0.5
+            yield {"submission_id": f"sub_syn{n:08d}", "assignment_id": aid, "student_id": sid,
+                   "content": f"My project uses {rng.choice(SEED_WORDS)} and {rng.choice(SEED_WORDS)}.", "file_url": "",
+                   "grade": rng.randint(50, 100) if graded else None, "feedback": "Nice work!" if graded else "",
+                   "graded_by": instructors[0] if graded else "", "submitted_at": past(60)}
+    insert_batches("submissions", submission_docs(), p["batch"])
+
+    def event_docs():
+        for n in range(p["events"]):
+            sid, cid = rng.choice(enrolled)
+            details = {"course_id": cid}
+            action = rng.choice(SEED_ACTIONS)
+            if action.startswith("lesson_") and course_lessons[cid]: details["lesson_id"] = rng.choice(course_lessons[cid])
+            yield {"log_id": f"log_syn{n:09d}", "user_id": sid, "action": action, "details": details, "timestamp": past(90)}
+    insert_batches("activity_logs", event_docs(), p["batch"], after=rollup_activity)
+
+def seed_dataset(params):
+    """Wipe the database and load the demo accounts/courses plus any synthetic volume in params."""
+    rng = random.Random(params["seed"])
+    def rid(p): return f"{p}{rng.getrandbits(48):012x}"  # like gid(), but the same seed gives the same ids
+    for col in ["users", "courses", "modules", "lessons", "quizzes", "assignments", "enrollments", "quiz_attempts", "submissions", "notifications", "certificates", "cert_templates", "activity_logs", "activity_rollups", "settings", "roles", "user_sessions", "password_resets", "tombstones", "submission_signatures", "certificate_status", "certificate_renders", "uploads", "files"]:
         db[col].delete_many({})
 
     now = datetime.now(timezone.utc).isoformat()
+    v = next_version()
+    # The wiped tombstones can't be replayed, so every cursor from before the reseed resyncs in full
+    db.counters.update_one({"_id": "tombstone_horizon"}, {"$max": {"seq": v}}, upsert=True)
+    hashes = {pw: hpw(pw) for pw in ("innovate@2025", "instructor123", "student123")}
 
     # Admin - Kids In Tech
-    db.users.insert_one({"user_id": "user_admin001", "email": "admin@kidsintech.school", "name": "Alex Morgan", "password_hash": hpw("innovate@2025"), "role": "super_admin", "picture": "", "bio": "KIT Platform Administrator", "status": "active", "points": 0, "must_reset_password": False, "created_at": now})
+    db.users.insert_one({"user_id": "user_admin001", "email": "admin@kidsintech.school", "name": "Alex Morgan", "password_hash": hashes["innovate@2025"], "role": "super_admin", "picture": "", "bio": "KIT Platform Administrator", "status": "active", "points": 0, "must_reset_password": False, "created_at": now, "version": v})
 
     # Instructors
     instructors = [
-        {"user_id": "user_inst001", "email": "sarah@kidsintech.school", "name": "Sarah Chen", "password_hash": hpw("instructor123"), "role": "instructor", "picture": "", "bio": "Senior Web Development Instructor - 10+ years teaching coding to kids", "status": "active", "points": 0, "must_reset_password": False, "created_at": now},
-        {"user_id": "user_inst002", "email": "james@kidsintech.school", "name": "James Wilson", "password_hash": hpw("instructor123"), "role": "instructor", "picture": "", "bio": "Data Science Educator - Making complex topics fun and accessible", "status": "active", "points": 0, "must_reset_password": False, "created_at": now},
-        {"user_id": "user_inst003", "email": "maria@kidsintech.school", "name": "Maria Garcia", "password_hash": hpw("instructor123"), "role": "instructor", "picture": "", "bio": "Creative Design Teacher - Inspiring the next generation of designers", "status": "active", "points": 0, "must_reset_password": False, "created_at": now},
+        {"user_id": "user_inst001", "email": "sarah@kidsintech.school", "name": "Sarah Chen", "password_hash": hashes["instructor123"], "role": "instructor", "picture": "", "bio": "Senior Web Development Instructor - 10+ years teaching coding to kids", "status": "active", "points": 0, "must_reset_password": False, "created_at": now, "version": v},
+        {"user_id": "user_inst002", "email": "james@kidsintech.school", "name": "James Wilson", "password_hash": hashes["instructor123"], "role": "instructor", "picture": "", "bio": "Data Science Educator - Making complex topics fun and accessible", "status": "active", "points": 0, "must_reset_password": False, "created_at": now, "version": v},
+        {"user_id": "user_inst003", "email": "maria@kidsintech.school", "name": "Maria Garcia", "password_hash": hashes["instructor123"], "role": "instructor", "picture": "", "bio": "Creative Design Teacher - Inspiring the next generation of designers", "status": "active", "points": 0, "must_reset_password": False, "created_at": now, "version": v},
     ]
     db.users.insert_many(instructors)
 
@@ -1086,7 +3323,7 @@ async def seed_data():
     student_names = ["Liam Johnson", "Emma Williams", "Noah Brown", "Olivia Davis", "Ethan Martinez", "Ava Anderson", "Mason Taylor", "Sophia Thomas", "Lucas Jackson", "Isabella White"]
     students = []
     for i, name in enumerate(student_names):
-        students.append({"user_id": f"user_stu{i+1:03d}", "email": f"{name.split()[0].lower()}@student.kidsintech.school", "name": name, "password_hash": hpw("student123"), "role": "student", "picture": "", "bio": "Enthusiastic learner", "status": "active", "points": (i+1)*50, "must_reset_password": False, "created_at": now})
+        students.append({"user_id": f"user_stu{i+1:03d}", "email": f"{name.split()[0].lower()}@student.kidsintech.school", "name": name, "password_hash": hashes["student123"], "role": "student", "picture": "", "bio": "Enthusiastic learner", "status": "active", "points": (i+1)*50, "must_reset_password": False, "created_at": now, "version": v})
     db.users.insert_many(students)
 
     # Courses
@@ -1101,6 +3338,7 @@ async def seed_data():
         c["created_by"] = c["instructor_ids"][0]
         c["created_at"] = now
         c["updated_at"] = now
+        c["version"] = v
     db.courses.insert_many(courses_data)
 
     # Modules & Lessons
@@ -1151,18 +3389,20 @@ async def seed_data():
         ],
     }
 
-    all_lesson_ids = []
+    all_lesson_ids, modules, lessons = [], [], []
     for course_id, mods in modules_lessons.items():
         for mi, mod_data in enumerate(mods):
-            mod_id = gid("mod_")
-            db.modules.insert_one({"module_id": mod_id, "course_id": course_id, "title": mod_data["title"], "description": f"Module {mi+1}", "order": mi + 1, "estimated_duration": "2 hours", "unlock_rule": "sequential", "created_at": now})
+            mod_id = rid("mod_")
+            modules.append({"module_id": mod_id, "course_id": course_id, "title": mod_data["title"], "description": f"Module {mi+1}", "order": mi + 1, "estimated_duration": "2 hours", "unlock_rule": "sequential", "created_at": now})
             for li, les_data in enumerate(mod_data["lessons"]):
-                les_id = gid("les_")
-                db.lessons.insert_one({"lesson_id": les_id, "module_id": mod_id, "course_id": course_id, "title": les_data["title"], "type": les_data["type"], "duration": les_data["duration"], "content": les_data["content"], "video_url": "", "youtube_url": "", "order": li + 1, "status": "published", "quiz_id": "", "created_at": now})
+                les_id = rid("les_")
+                lessons.append({"lesson_id": les_id, "module_id": mod_id, "course_id": course_id, "title": les_data["title"], "type": les_data["type"], "duration": les_data["duration"], "content": les_data["content"], "video_url": "", "youtube_url": "", "order": li + 1, "status": "published", "quiz_id": "", "created_at": now})
                 all_lesson_ids.append({"lesson_id": les_id, "course_id": course_id})
+    db.modules.insert_many(modules)
+    db.lessons.insert_many(lessons)
 
     # Quizzes
-    db.quizzes.insert_many([
+    quizzes = [
         {"quiz_id": "quiz_001", "title": "HTML & CSS Quiz", "course_id": "course_001", "questions": [
             {"question_id": "q1", "question": "What does HTML stand for?", "type": "multiple_choice", "options": ["Hyper Text Markup Language", "High Tech Modern Language", "Hyper Transfer Markup Language", "Home Tool Markup Language"], "correct_answer": "Hyper Text Markup Language"},
             {"question_id": "q2", "question": "CSS stands for Cascading Style Sheets", "type": "true_false", "options": ["True", "False"], "correct_answer": "True"},
@@ -1176,27 +3416,29 @@ async def seed_data():
             {"question_id": "q6", "question": "Which is not a Python type?", "type": "multiple_choice", "options": ["list", "tuple", "array", "dict"], "correct_answer": "array"},
             {"question_id": "q7", "question": "Python lists are mutable", "type": "true_false", "options": ["True", "False"], "correct_answer": "True"},
         ], "time_limit": 10, "attempts_allowed": 3, "pass_mark": 70, "auto_grade": True, "created_by": "user_inst002", "created_at": now},
-    ])
+    ]
+    db.quizzes.insert_many(quizzes)
 
     # Assignments
-    db.assignments.insert_many([
+    assignments = [
         {"assignment_id": "asgn_001", "title": "Build a Landing Page", "description": "Create a responsive landing page using HTML and CSS.", "course_id": "course_001", "module_id": "", "due_date": (datetime.now(timezone.utc) + timedelta(days=14)).isoformat(), "allow_file_upload": True, "allow_text_submission": True, "allow_resubmission": True, "max_score": 100, "created_by": "user_inst001", "created_at": now},
         {"assignment_id": "asgn_002", "title": "Data Analysis Project", "description": "Analyze the provided dataset using Pandas.", "course_id": "course_002", "module_id": "", "due_date": (datetime.now(timezone.utc) + timedelta(days=21)).isoformat(), "allow_file_upload": True, "allow_text_submission": False, "allow_resubmission": False, "max_score": 100, "created_by": "user_inst002", "created_at": now},
         {"assignment_id": "asgn_003", "title": "Design a Mobile App UI", "description": "Create wireframes and a mockup for a mobile app.", "course_id": "course_003", "module_id": "", "due_date": (datetime.now(timezone.utc) + timedelta(days=10)).isoformat(), "allow_file_upload": True, "allow_text_submission": True, "allow_resubmission": True, "max_score": 100, "created_by": "user_inst003", "created_at": now},
-    ])
+    ]
+    db.assignments.insert_many(assignments)
 
     # Enrollments
     enrollments = []
     for i, s in enumerate(students):
-        num_courses = random.randint(1, 3)
-        enrolled_courses = random.sample(["course_001", "course_002", "course_003", "course_004"], min(num_courses, 4))
+        num_courses = rng.randint(1, 3)
+        enrolled_courses = rng.sample(["course_001", "course_002", "course_003", "course_004"], min(num_courses, 4))
         for cid in enrolled_courses:
             course_lessons = [l for l in all_lesson_ids if l["course_id"] == cid]
-            num_completed = random.randint(0, len(course_lessons))
-            completed = [l["lesson_id"] for l in random.sample(course_lessons, num_completed)] if course_lessons else []
+            num_completed = rng.randint(0, len(course_lessons))
+            completed = [l["lesson_id"] for l in rng.sample(course_lessons, num_completed)] if course_lessons else []
             progress = round(len(completed) / len(course_lessons) * 100, 1) if course_lessons else 0
             status = "completed" if progress >= 100 else "active"
-            e = {"enrollment_id": gid("enr_"), "student_id": s["user_id"], "course_id": cid, "progress": progress, "status": status, "completed_lessons": completed, "enrolled_at": (datetime.now(timezone.utc) - timedelta(days=random.randint(1, 60))).isoformat()}
+            e = {"enrollment_id": rid("enr_"), "student_id": s["user_id"], "course_id": cid, "progress": progress, "status": status, "completed_lessons": completed, "enrolled_at": (datetime.now(timezone.utc) - timedelta(days=rng.randint(1, 60))).isoformat(), "version": v}
             if status == "completed": e["completed_at"] = now
             enrollments.append(e)
     if enrollments: db.enrollments.insert_many(enrollments)
@@ -1204,43 +3446,163 @@ async def seed_data():
     # Quiz attempts, submissions, certs, notifs, logs
     attempts = []
     for e in enrollments[:8]:
-        quiz = db.quizzes.find_one({"course_id": e["course_id"]}, {"_id": 0})
+        quiz = next((q for q in quizzes if q["course_id"] == e["course_id"]), None)
         if quiz:
-            score = random.randint(40, 100)
-            attempts.append({"attempt_id": gid("att_"), "quiz_id": quiz["quiz_id"], "student_id": e["student_id"], "answers": [], "score": score, "passed": score >= quiz.get("pass_mark", 70), "attempted_at": now})
+            score = rng.randint(40, 100)
+            attempts.append({"attempt_id": rid("att_"), "quiz_id": quiz["quiz_id"], "student_id": e["student_id"], "answers": [], "score": score, "passed": score >= quiz.get("pass_mark", 70), "attempted_at": now})
     if attempts: db.quiz_attempts.insert_many(attempts)
 
     subs = []
     for e in enrollments[:5]:
-        asgn = db.assignments.find_one({"course_id": e["course_id"]}, {"_id": 0})
+        asgn = next((a for a in assignments if a["course_id"] == e["course_id"]), None)
         if asgn:
-            graded = random.choice([True, False])
-            subs.append({"submission_id": gid("sub_"), "assignment_id": asgn["assignment_id"], "student_id": e["student_id"], "content": "My submission.", "file_url": "", "grade": random.randint(60, 100) if graded else None, "feedback": "Good work!" if graded else "", "graded_by": "user_inst001" if graded else "", "submitted_at": now})
+            graded = rng.choice([True, False])
+            subs.append({"submission_id": rid("sub_"), "assignment_id": asgn["assignment_id"], "student_id": e["student_id"], "content": "My submission.", "file_url": "", "grade": rng.randint(60, 100) if graded else None, "feedback": "Good work!" if graded else "", "graded_by": "user_inst001" if graded else "", "submitted_at": now})
     if subs: db.submissions.insert_many(subs)
 
-    certs = [{"certificate_id": gid("cert_"), "student_id": e["student_id"], "course_id": e["course_id"], "template_id": "", "issued_by": "user_admin001", "issued_at": now} for e in enrollments if e["status"] == "completed"]
+    certs = [{"certificate_id": rid("cert_"), "student_id": e["student_id"], "course_id": e["course_id"], "template_id": "", "issued_by": "user_admin001", "issued_at": now} for e in enrollments if e["status"] == "completed"]
     if certs: db.certificates.insert_many(certs)
 
     db.notifications.insert_many([
-        {"notification_id": "notif_001", "title": "Welcome to Kids In Tech!", "message": "Start exploring courses and begin your learning journey!", "type": "announcement", "target_role": "all", "target_users": [], "created_by": "user_admin001", "read_by": [], "created_at": now},
-        {"notification_id": "notif_002", "title": "New Course Available", "message": "Advanced Python Programming is now available. Enroll today!", "type": "announcement", "target_role": "student", "target_users": [], "created_by": "user_admin001", "read_by": [], "created_at": now},
-        {"notification_id": "notif_003", "title": "Assignment Due Reminder", "message": "Build a Landing Page is due in 7 days.", "type": "reminder", "target_role": "student", "target_users": [], "created_by": "user_inst001", "read_by": [], "created_at": now},
+        {"notification_id": "notif_001", "title": "Welcome to Kids In Tech!", "message": "Start exploring courses and begin your learning journey!", "type": "announcement", "target_role": "all", "target_users": [], "created_by": "user_admin001", "read_by": [], "created_at": now, "version": v},
+        {"notification_id": "notif_002", "title": "New Course Available", "message": "Advanced Python Programming is now available. Enroll today!", "type": "announcement", "target_role": "student", "target_users": [], "created_by": "user_admin001", "read_by": [], "created_at": now, "version": v},
+        {"notification_id": "notif_003", "title": "Assignment Due Reminder", "message": "Build a Landing Page is due in 7 days.", "type": "reminder", "target_role": "student", "target_users": [], "created_by": "user_inst001", "read_by": [], "created_at": now, "version": v},
     ])
 
     logs = []
     for e in enrollments:
-        logs.append({"log_id": gid("log_"), "user_id": e["student_id"], "action": "enrolled", "details": {"course_id": e["course_id"]}, "timestamp": e["enrolled_at"]})
-    if logs: db.activity_logs.insert_many(logs)
+        logs.append({"log_id": rid("log_"), "user_id": e["student_id"], "action": "enrolled", "details": {"course_id": e["course_id"]}, "timestamp": e["enrolled_at"]})
+    if logs:
+        db.activity_logs.insert_many(logs)
+        rollup_activity(logs)
 
     db.settings.insert_one({"key": "platform", "name": "Kids In Tech LMS", "logo": "", "primary_color": "#0D9488"})
+    seed_synthetic(params, rng, hashes, now, v)
+    return {col: db[col].estimated_document_count() for col in ["users", "courses", "modules", "lessons", "quizzes", "assignments", "enrollments", "quiz_attempts", "submissions", "notifications", "activity_logs"]}
+
+@app.post("/api/seed")
+async def seed_data(request: Request):
+    if not SEED_OPEN: require_role(get_user(request), ["super_admin"])
+    body = await request.json() if await request.body() else {}
+    unknown = set(body) - set(SEED_DEFAULTS)
+    if unknown: raise HTTPException(400, f"Unknown seed parameters: {', '.join(sorted(unknown))}")
+    try:
+        params = {**SEED_DEFAULTS, **{k: int(v) for k, v in body.items()}}
+    except (TypeError, ValueError):
+        raise HTTPException(400, "Seed parameters must be integers")
+    if any(v < 0 for v in params.values()) or params["batch"] < 1: raise HTTPException(400, "Seed parameters must be non-negative")
+    over = [k for k, v in params.items() if v > SEED_LIMITS[k]]
+    if over: raise HTTPException(400, "Seed parameters too large: " + ", ".join(f"{k} > {SEED_LIMITS[k]}" for k in over))
+    start = time.perf_counter()
+    # Bulk load runs on a worker thread, outside the request's query accounting and budget
+    stats = await asyncio.get_running_loop().run_in_executor(None, seed_dataset, params)
+    bump_version("courses", "modules", "lessons", "enrollments", "settings", "roles")
+    rebuild_search_index()
+    return {"message": "Database seeded successfully", "params": params, "stats": stats, "elapsed_s": round(time.perf_counter() - start, 2)}
+
+@app.get("/api/metrics/queries")
+async def query_metrics(request: Request):
+    user = get_user(request)
+    require_role(user, ["super_admin"])
+    out = []
+    for key, agg in route_stats.items():
+        n = agg["requests"] or 1
+        out.append({"route": key, "requests": agg["requests"], "avg_queries": round(agg["queries"] / n, 2),
+                    "max_queries": agg["max_queries"], "avg_db_ms": round(agg["db_ms"] / n, 3),
+                    "avg_docs": round(agg["docs"] / n, 1), "budget": QUERY_BUDGETS.get(key, QUERY_BUDGET_DEFAULT)})
+    return sorted(out, key=lambda r: -r["avg_queries"])
+
+@app.get("/api/metrics/profiles")
+async def list_profiles(request: Request):
+    user = get_user(request)
+    require_role(user, ["super_admin"])
+    return [{k: v for k, v in p.items() if k != "stacks"} for p in reversed(profiles)]
 
-    return {"message": "Database seeded successfully", "stats": {
-        "users": db.users.count_documents({}), "courses": db.courses.count_documents({}),
-        "modules": db.modules.count_documents({}), "lessons": db.lessons.count_documents({}),
-        "quizzes": db.quizzes.count_documents({}), "assignments": db.assignments.count_documents({}),
-        "enrollments": db.enrollments.count_documents({}), "notifications": db.notifications.count_documents({})
-    }}
+@app.get("/api/metrics/profiles/{profile_id}")
+async def get_profile(profile_id: str, request: Request, format: str = "speedscope"):
+    user = get_user(request)
+    require_role(user, ["super_admin"])
+    p = next((p for p in profiles if p["profile_id"] == profile_id), None)
+    if not p: raise HTTPException(404, "Profile not found")
+    if format == "collapsed": return Response(collapsed(p["stacks"]), media_type="text/plain")
+    if format != "speedscope": raise HTTPException(400, "format must be speedscope or collapsed")
+    return speedscope(f'{p["route"]} ({p["profile_id"]})', p["stacks"], p["duration_ms"])
+
+@app.get("/api/metrics/slow-requests")
+async def list_slow_requests(request: Request):
+    user = get_user(request)
+    require_role(user, ["super_admin"])
+    return list(reversed(slow_requests))
+
+LOOP_LAG_INTERVAL = 0.5
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+
+async def sample_loop_lag():
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(LOOP_LAG_INTERVAL)
+        lag = max(loop.time() - start - LOOP_LAG_INTERVAL, 0.0)
+        gauges["loop_lag"] = lag
+        loop_lag.observe(lag)
+
+@app.on_event("startup")
+async def start_loop_lag_sampler():
+    app.state.loop_lag_task = asyncio.create_task(sample_loop_lag())
+
+@app.get("/api/metrics")
+async def prometheus_metrics(request: Request):
+    # Scrapers authenticate with METRICS_TOKEN; otherwise a super_admin session is required
+    if not METRICS_TOKEN or request.headers.get("Authorization", "") != f"Bearer {METRICS_TOKEN}":
+        require_role(get_user(request), ["super_admin"])
+    lines = request_latency.expose()
+    lines += ["# HELP kit_http_requests_total Requests by route template and status.", "# TYPE kit_http_requests_total counter"]
+    lines += [f'kit_http_requests_total{{method="{m}",route="{r}",status="{st}"}} {n}' for (m, r, st), n in sorted(request_counts.items())]
+    lines += ["# HELP kit_http_requests_in_flight Requests currently being handled.", "# TYPE kit_http_requests_in_flight gauge",
+              f"kit_http_requests_in_flight {gauges['in_flight']}"]
+    lines += loop_lag.expose()
+    lines += ["# HELP kit_event_loop_lag_last_seconds Most recent event loop lag sample.", "# TYPE kit_event_loop_lag_last_seconds gauge",
+              f"kit_event_loop_lag_last_seconds {gauges['loop_lag']:.6f}"]
+    workers = bcrypt_pool._max_workers
+    lines += ["# HELP kit_bcrypt_pending Password hash/verify calls submitted and not yet finished.", "# TYPE kit_bcrypt_pending gauge",
+              f"kit_bcrypt_pending {gauges['bcrypt_pending']}",
+              "# HELP kit_bcrypt_queue_depth Password hash/verify calls waiting for a free worker.", "# TYPE kit_bcrypt_queue_depth gauge",
+              f"kit_bcrypt_queue_depth {max(gauges['bcrypt_pending'] - workers, 0)}"]
+    lines += pool_wait.expose()
+    lines += ["# HELP kit_mongo_pool_checked_out Connections currently checked out of the pool.", "# TYPE kit_mongo_pool_checked_out gauge",
+              f"kit_mongo_pool_checked_out {gauges['pool_checked_out']}",
+              "# HELP kit_mongo_pool_checkout_failures_total Failed connection checkouts.", "# TYPE kit_mongo_pool_checkout_failures_total counter",
+              f"kit_mongo_pool_checkout_failures_total {gauges['pool_checkout_failures']}"]
+    lookups = cache_counts["hit"] + cache_counts["miss"]
+    lines += ["# HELP kit_response_cache_requests_total Response cache lookups by result.", "# TYPE kit_response_cache_requests_total counter"]
+    lines += [f'kit_response_cache_requests_total{{result="{k}"}} {cache_counts[k]}' for k in ("hit", "miss", "not_modified")]
+    lines += ["# HELP kit_response_cache_hit_ratio Share of response cache lookups served from memory.", "# TYPE kit_response_cache_hit_ratio gauge",
+              f"kit_response_cache_hit_ratio {cache_counts['hit'] / lookups if lookups else 0:.4f}",
+              "# HELP kit_response_cache_entries Entries held by the response cache.", "# TYPE kit_response_cache_entries gauge",
+              f"kit_response_cache_entries {len(response_cache)}"]
+    lines += ["# HELP kit_certificate_evaluations_total Enrollments evaluated for certificate eligibility.", "# TYPE kit_certificate_evaluations_total counter",
+              f"kit_certificate_evaluations_total {cert_counts['evaluated']}",
+              "# HELP kit_certificates_issued_total Certificates issued automatically.", "# TYPE kit_certificates_issued_total counter",
+              f"kit_certificates_issued_total {cert_counts['issued']}",
+              "# HELP kit_certificate_sweep_pending Pairs and courses waiting for the certificate sweeper.", "# TYPE kit_certificate_sweep_pending gauge",
+              f"kit_certificate_sweep_pending {len(cert_pending) + len(cert_pending_courses)}",
+              "# HELP kit_certificate_downloads_total Certificate downloads by whether a render was needed.", "# TYPE kit_certificate_downloads_total counter",
+              f'kit_certificate_downloads_total{{result="rendered"}} {cert_counts["rendered"]}',
+              f'kit_certificate_downloads_total{{result="cached"}} {cert_counts["render_hit"]}']
+    lines += ["# HELP kit_image_variants_total Image variant requests by whether a render was needed.", "# TYPE kit_image_variants_total counter",
+              f'kit_image_variants_total{{result="rendered"}} {image_counts["rendered"]}',
+              f'kit_image_variants_total{{result="cached"}} {image_counts["hit"]}',
+              "# HELP kit_image_sources_fetched_total Image sources downloaded by result.", "# TYPE kit_image_sources_fetched_total counter",
+              f'kit_image_sources_fetched_total{{result="ok"}} {image_counts["fetched"]}',
+              f'kit_image_sources_fetched_total{{result="failed"}} {image_counts["fetch_failed"]}',
+              "# HELP kit_image_cache_bytes Bytes of image files in this worker's disk caches.", "# TYPE kit_image_cache_bytes gauge",
+              f'kit_image_cache_bytes{{cache="variants"}} {variant_cache.bytes}',
+              f'kit_image_cache_bytes{{cache="sources"}} {source_cache.bytes}',
+              "# HELP kit_image_cache_evictions_total Files evicted from the image disk caches.", "# TYPE kit_image_cache_evictions_total counter",
+              f'kit_image_cache_evictions_total{{cache="variants"}} {image_counts["evicted"]}',
+              f'kit_image_cache_evictions_total{{cache="sources"}} {image_counts["source_evicted"]}']
+    return Response("\n".join(lines) + "\n", media_type="text/plain; version=0.0.4")
 
 @app.get("/api/health")
 async def health():
-    return {"status": "ok"}
+    return {"status": "ok", "cache_bus": cache_bus.state}
@@ -0,0 +1,77 @@
+"""Near-duplicate detection for text submissions with MinHash signatures and LSH banding.
+
+Each text is reduced to word shingles, and the shingle set to NUM_PERM minimum hashes;
+the fraction of positions two signatures agree on estimates the Jaccard similarity of
+their shingle sets. Signatures are cut into BANDS bands of ROWS rows and only texts
+that collide in at least one band are compared, so finding the near-duplicates among
+n submissions costs roughly O(n) instead of n^2 / 2 comparisons.
+"""
+import re
+import zlib
+
+import numpy as np
+
+SHINGLE = 5
+NUM_PERM = 128
+BANDS, ROWS = 32, 4  # pairs at Jaccard 0.5 collide in some band ~87% of the time, at 0.8 ~100%
+WORD = re.compile(r"\w+")
+
+# Fixed seed: signatures are stored, so every process must use the same permutations
+_rng = np.random.default_rng(20250101)
+_A = _rng.integers(0, 1 << 63, NUM_PERM, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+_B = _rng.integers(0, 1 << 63, NUM_PERM, dtype=np.uint64) * np.uint64(2)
+_SHINGLE_MIX = _rng.integers(0, 1 << 63, SHINGLE, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+_BAND_MIX = _rng.integers(0, 1 << 63, ROWS, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+
+
+def shingles(text, k=SHINGLE):
+    """32-bit hashes of each run of k words (all of them when the text is shorter), as a uint64 array."""
+    words = WORD.findall((text or "").lower())
+    if not words: return np.empty(0, dtype=np.uint64)
+    w = np.fromiter((zlib.crc32(word.encode()) for word in words), dtype=np.uint64, count=len(words))
+    k = min(k, len(w))
+    with np.errstate(over="ignore"):
+        h = sum(w[t:len(w) - k + 1 + t] * _SHINGLE_MIX[t] for t in range(k))
+    return np.unique(h >> np.uint64(32))
+
+
+def signature(text):
+    """NUM_PERM minhashes of the text as a list of ints, or None for an empty text."""
+    x = shingles(text)
+    if not len(x): return None
+    # Multiply-add-shift: the high 32 bits of (a * x + b) mod 2^64 are a universal hash of 32-bit x
+    with np.errstate(over="ignore"):
+        return ((_A[:, None] * x[None, :] + _B[:, None]) >> np.uint64(32)).min(axis=1).tolist()
+
+
+def candidate_pairs(signatures):
+    """Index pairs (i < j) whose signatures share at least one LSH band, as two int arrays."""
+    n = len(signatures)
+    if n < 2: return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    found = []
+    for band in range(BANDS):
+        rows = signatures[:, band * ROWS:(band + 1) * ROWS]
+        with np.errstate(over="ignore"): keys = (rows * _BAND_MIX).sum(axis=1)  # wraps mod 2^64; an extra collision only costs a comparison
+        order = np.argsort(keys, kind="stable")
+        keys = keys[order]
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        sizes = np.diff(np.r_[starts, n])
+        for start, size in zip(starts[sizes > 1], sizes[sizes > 1]):
+            members = np.sort(order[start:start + size])
+            i, j = np.triu_indices(size, k=1)
+            found.append(members[i] * n + members[j])
+    if not found: return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    pairs = np.unique(np.concatenate(found))
+    return pairs // n, pairs % n
+
+
+def near_duplicates(signatures, threshold=0.5):
+    """(i, j, estimated Jaccard) for every candidate pair at or above threshold, most similar first."""
+    sig = np.asarray(signatures, dtype=np.uint64).reshape(len(signatures), NUM_PERM)
+    i, j = candidate_pairs(sig)
+    if not len(i): return []
+    similarity = (sig[i] == sig[j]).mean(axis=1)
+    keep = similarity >= threshold
+    i, j, similarity = i[keep], j[keep], similarity[keep]
+    order = np.argsort(-similarity, kind="stable")
+    return [(int(i[k]), int(j[k]), float(similarity[k])) for k in order]
@@ -0,0 +1,75 @@
+"""
+Activity Rollup Tests - Kids In Tech LMS
+Testing: GET /api/analytics/activity timeline built from hourly/daily rollups
+"""
+import pytest
+import requests
+import os
+from datetime import datetime, timezone
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+
+class TestActivityTimeline:
+    """Learner activity timeline tests"""
+
+    @pytest.fixture(scope="class")
+    def admin_token(self):
+        response = requests.post(f"{BASE_URL}/api/auth/login", json={
+            "email": "admin@kidsintech.school", "password": "innovate@2025"
+        })
+        return response.json()["token"]
+
+    @pytest.fixture(scope="class")
+    def student(self):
+        response = requests.post(f"{BASE_URL}/api/auth/login", json={
+            "email": "ethan@student.kidsintech.school", "password": "student123"
+        })
+        return response.json()
+
+    def test_lesson_completion_appears_in_daily_rollup(self, admin_token, student):
+        """Completing a lesson should increment today's lesson_completed bucket for the course"""
+        headers = {"Authorization": f"Bearer {student['token']}"}
+        enrollments = requests.get(f"{BASE_URL}/api/enrollments", headers=headers).json()
+        if not enrollments:
+            pytest.skip("Student has no enrollments")
+        course_id = enrollments[0]["course_id"]
+        course = requests.get(f"{BASE_URL}/api/courses/{course_id}", headers=headers).json()
+        lesson_id = course["modules"][0]["lessons"][0]["lesson_id"]
+
+        admin_headers = {"Authorization": f"Bearer {admin_token}"}
+        params = {"granularity": "day", "course_id": course_id, "action": "lesson_completed"}
+        today = datetime.now(timezone.utc).date().isoformat()
+
+        def today_count():
+            series = requests.get(f"{BASE_URL}/api/analytics/activity", params=params, headers=admin_headers).json()["series"]
+            return sum(p["count"] for p in series if p["bucket"] == today)
+
+        before = today_count()
+        response = requests.post(f"{BASE_URL}/api/lessons/{lesson_id}/complete", headers=headers)
+        assert response.status_code == 200
+        assert today_count() == before + 1
+        print(f"✓ Daily rollup for {course_id} incremented to {before + 1}")
+
+    def test_hourly_granularity(self, admin_token):
+        """Hourly buckets use the YYYY-MM-DDTHH prefix"""
+        response = requests.get(f"{BASE_URL}/api/analytics/activity?granularity=hour",
+            headers={"Authorization": f"Bearer {admin_token}"})
+        assert response.status_code == 200
+        for point in response.json()["series"]:
+            assert len(point["bucket"]) == 13
+        print("✓ Hourly timeline returns hour buckets")
+
+    def test_invalid_granularity_rejected(self, admin_token):
+        response = requests.get(f"{BASE_URL}/api/analytics/activity?granularity=week",
+            headers={"Authorization": f"Bearer {admin_token}"})
+        assert response.status_code == 400
+        print("✓ Unsupported granularity returns 400")
+
+    def test_student_sees_only_own_timeline(self, student):
+        """Students are scoped to their own activity regardless of user_id param"""
+        response = requests.get(f"{BASE_URL}/api/analytics/activity?user_id=user_admin001",
+            headers={"Authorization": f"Bearer {student['token']}"})
+        assert response.status_code == 200
+        assert response.json()["user_id"] == student["user"]["user_id"]
+        print("✓ Student timeline scoped to self")
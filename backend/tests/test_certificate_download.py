@@ -0,0 +1,84 @@
+"""
+Certificate Download Tests - Kids In Tech LMS
+Testing: rendered certificate PDF/PNG downloads, render cache, ETag/304, byte ranges and template versions
+"""
+import requests
+import os
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+
+class TestCertificateDownload:
+
+    def get_headers(self, email, password):
+        token = requests.post(f"{BASE_URL}/api/auth/login", json={"email": email, "password": password}).json()["token"]
+        return {"Authorization": f"Bearer {token}"}
+
+    def earn_certificate(self, admin, student, template=None):
+        course = requests.post(f"{BASE_URL}/api/courses", json={"title": "TEST_Render course", "status": "published"}, headers=admin).json()
+        module = requests.post(f"{BASE_URL}/api/courses/{course['course_id']}/modules", json={"title": "TEST_Module"}, headers=admin).json()
+        lesson = requests.post(f"{BASE_URL}/api/modules/{module['module_id']}/lessons", json={"title": "TEST_Lesson", "status": "published"}, headers=admin).json()
+        if template: template.update(requests.post(f"{BASE_URL}/api/certificates/templates", json={**template, "course_id": course["course_id"]}, headers=admin).json())
+        requests.post(f"{BASE_URL}/api/enrollments", json={"course_id": course["course_id"]}, headers=student)
+        requests.post(f"{BASE_URL}/api/lessons/{lesson['lesson_id']}/complete", headers=student)
+        check = requests.get(f"{BASE_URL}/api/certificates/check/{course['course_id']}", headers=student).json()
+        return course["course_id"], check["certificate"]["certificate_id"]
+
+    def test_pdf_download_cached_with_etag(self):
+        admin = self.get_headers("admin@kidsintech.school", "innovate@2025")
+        student = self.get_headers("ethan@student.kidsintech.school", "student123")
+        course_id, cert_id = self.earn_certificate(admin, student)
+        url = f"{BASE_URL}/api/certificates/{cert_id}/download"
+        first = requests.get(url, headers=student)
+        assert first.status_code == 200
+        assert first.headers["Content-Type"] == "application/pdf"
+        assert first.content.startswith(b"%PDF")
+        etag = first.headers["ETag"]
+        second = requests.get(url, headers=admin)
+        assert second.headers["ETag"] == etag and second.content == first.content
+        assert requests.get(url, headers={**student, "If-None-Match": etag}).status_code == 304
+        png = requests.get(url, params={"format": "png"}, headers=student)
+        assert png.status_code == 200 and png.content.startswith(b"\x89PNG")
+        requests.delete(f"{BASE_URL}/api/courses/{course_id}", headers=admin)
+        print(f"✓ {len(first.content)} byte PDF rendered once, ETag {etag[:12]}…")
+
+    def test_byte_ranges(self):
+        admin = self.get_headers("admin@kidsintech.school", "innovate@2025")
+        student = self.get_headers("ethan@student.kidsintech.school", "student123")
+        course_id, cert_id = self.earn_certificate(admin, student)
+        url = f"{BASE_URL}/api/certificates/{cert_id}/download"
+        full = requests.get(url, headers=student).content
+        part = requests.get(url, headers={**student, "Range": "bytes=0-99"})
+        assert part.status_code == 206
+        assert part.content == full[:100]
+        assert part.headers["Content-Range"] == f"bytes 0-99/{len(full)}"
+        tail = requests.get(url, headers={**student, "Range": "bytes=-10"})
+        assert tail.status_code == 206 and tail.content == full[-10:]
+        assert requests.get(url, headers={**student, "Range": f"bytes={len(full)}-"}).status_code == 416
+        requests.delete(f"{BASE_URL}/api/courses/{course_id}", headers=admin)
+        print("✓ 206 partial content and 416 for unsatisfiable ranges")
+
+    def test_template_edit_rerenders(self):
+        admin = self.get_headers("admin@kidsintech.school", "innovate@2025")
+        student = self.get_headers("ethan@student.kidsintech.school", "student123")
+        template = {"name": "TEST_Template", "accent_color": "#0f766e"}
+        course_id, cert_id = self.earn_certificate(admin, student, template=template)
+        url = f"{BASE_URL}/api/certificates/{cert_id}/download"
+        before = requests.get(url, headers=student).headers["ETag"]
+        updated = requests.put(f"{BASE_URL}/api/certificates/templates/{template['template_id']}", json={"accent_color": "#b91c1c"}, headers=admin).json()
+        assert updated["version"] == template["version"] + 1
+        after = requests.get(url, headers=student).headers["ETag"]
+        assert after != before
+        requests.delete(f"{BASE_URL}/api/courses/{course_id}", headers=admin)
+        print("✓ Template edit produces a new rendering")
+
+    def test_access_control(self):
+        admin = self.get_headers("admin@kidsintech.school", "innovate@2025")
+        student = self.get_headers("ethan@student.kidsintech.school", "student123")
+        other = self.get_headers("liam@student.kidsintech.school", "student123")
+        course_id, cert_id = self.earn_certificate(admin, student)
+        assert requests.get(f"{BASE_URL}/api/certificates/{cert_id}/download", headers=other).status_code == 403
+        assert requests.get(f"{BASE_URL}/api/certificates/{cert_id}/download", params={"format": "docx"}, headers=student).status_code == 400
+        assert requests.get(f"{BASE_URL}/api/certificates/cert_missing/download", headers=student).status_code == 404
+        requests.delete(f"{BASE_URL}/api/courses/{course_id}", headers=admin)
+        print("✓ Only the owner, staff and admins can download")
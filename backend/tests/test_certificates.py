@@ -0,0 +1,76 @@
+"""
+Certificate Eligibility Tests - Kids In Tech LMS
+Testing: certificate check after lesson completion and quiz attempts, bulk course sweep and its access control
+"""
+import requests
+import os
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+
+class TestCertificateEligibility:
+
+    def get_headers(self, email, password):
+        token = requests.post(f"{BASE_URL}/api/auth/login", json={"email": email, "password": password}).json()["token"]
+        return {"Authorization": f"Bearer {token}"}
+
+    def make_course(self, admin):
+        course = requests.post(f"{BASE_URL}/api/courses", json={"title": "TEST_Certificate course", "status": "published"}, headers=admin).json()
+        module = requests.post(f"{BASE_URL}/api/courses/{course['course_id']}/modules", json={"title": "TEST_Module"}, headers=admin).json()
+        lesson = requests.post(f"{BASE_URL}/api/modules/{module['module_id']}/lessons", json={"title": "TEST_Lesson", "status": "published"}, headers=admin).json()
+        return course["course_id"], lesson["lesson_id"]
+
+    def test_issued_after_last_lesson(self):
+        admin = self.get_headers("admin@kidsintech.school", "innovate@2025")
+        student = self.get_headers("ethan@student.kidsintech.school", "student123")
+        course_id, lesson_id = self.make_course(admin)
+        assert requests.get(f"{BASE_URL}/api/certificates/check/{course_id}", headers=student).json() == {"eligible": False, "reason": "Not enrolled"}
+        requests.post(f"{BASE_URL}/api/enrollments", json={"course_id": course_id}, headers=student)
+        before = requests.get(f"{BASE_URL}/api/certificates/check/{course_id}", headers=student).json()
+        assert before["eligible"] is False and before["issued"] is False
+        assert before["lessons_completed"] == 0 and before["total_lessons"] == 1
+
+        requests.post(f"{BASE_URL}/api/lessons/{lesson_id}/complete", headers=student)
+        after = requests.get(f"{BASE_URL}/api/certificates/check/{course_id}", headers=student).json()
+        assert after["eligible"] is True and after["issued"] is True and after["all_lessons_done"] is True
+        again = requests.get(f"{BASE_URL}/api/certificates/check/{course_id}", headers=student).json()
+        assert again["certificate"]["certificate_id"] == after["certificate"]["certificate_id"]
+        certs = requests.get(f"{BASE_URL}/api/certificates", headers=student).json()
+        assert len([c for c in certs if c["course_id"] == course_id]) == 1
+        requests.delete(f"{BASE_URL}/api/courses/{course_id}", headers=admin)
+        print("✓ Certificate issued once after the last lesson")
+
+    def test_low_quiz_average_blocks_certificate(self):
+        admin = self.get_headers("admin@kidsintech.school", "innovate@2025")
+        student = self.get_headers("ethan@student.kidsintech.school", "student123")
+        course_id, lesson_id = self.make_course(admin)
+        quiz = requests.post(f"{BASE_URL}/api/quizzes", json={"title": "TEST_Quiz", "course_id": course_id, "questions": [
+            {"question_id": "q1", "question": "1 + 1?", "type": "multiple_choice", "options": ["1", "2"], "correct_answer": "2"}]}, headers=admin).json()
+        requests.post(f"{BASE_URL}/api/enrollments", json={"course_id": course_id}, headers=student)
+        requests.post(f"{BASE_URL}/api/lessons/{lesson_id}/complete", headers=student)
+        requests.post(f"{BASE_URL}/api/quizzes/{quiz['quiz_id']}/attempt", json={"answers": [{"question_id": "q1", "answer": "1"}]}, headers=student)
+        failed = requests.get(f"{BASE_URL}/api/certificates/check/{course_id}", headers=student).json()
+        assert failed["all_lessons_done"] is True and failed["avg_quiz_score"] == 0 and failed["eligible"] is False
+
+        requests.post(f"{BASE_URL}/api/quizzes/{quiz['quiz_id']}/attempt", json={"answers": [{"question_id": "q1", "answer": "2"}]}, headers=student)
+        passed = requests.get(f"{BASE_URL}/api/certificates/check/{course_id}", headers=student).json()
+        assert passed["avg_quiz_score"] == 100 and passed["eligible"] is True and passed["issued"] is True
+        requests.delete(f"{BASE_URL}/api/courses/{course_id}", headers=admin)
+        print("✓ Best quiz score counts towards eligibility")
+
+    def test_course_sweep(self):
+        admin = self.get_headers("admin@kidsintech.school", "innovate@2025")
+        response = requests.post(f"{BASE_URL}/api/certificates/sweep/course_001", headers=admin)
+        assert response.status_code == 200
+        data = response.json()
+        enrollments = requests.get(f"{BASE_URL}/api/enrollments?course_id=course_001", headers=admin).json()
+        assert data["evaluated"] == len(enrollments)
+        assert data["certified"] >= data["eligible"]
+        print(f"✓ Swept {data['evaluated']} enrollments in {data['elapsed_s']}s")
+
+    def test_sweep_admin_only(self):
+        admin = self.get_headers("admin@kidsintech.school", "innovate@2025")
+        sarah = self.get_headers("sarah@kidsintech.school", "instructor123")
+        assert requests.post(f"{BASE_URL}/api/certificates/sweep/course_001", headers=sarah).status_code == 403
+        assert requests.post(f"{BASE_URL}/api/certificates/sweep/course_missing", headers=admin).status_code == 404
+        print("✓ Sweep restricted to super admins")
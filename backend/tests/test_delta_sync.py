@@ -0,0 +1,91 @@
+"""
+Delta Sync Tests - Kids In Tech LMS
+Testing: ?since=<version> variants of users, courses, enrollments, notifications and course detail
+"""
+import pytest
+import requests
+import os
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+
+@pytest.fixture(scope="module")
+def admin_headers():
+    response = requests.post(f"{BASE_URL}/api/auth/login", json={
+        "email": "admin@kidsintech.school", "password": "innovate@2025"
+    })
+    return {"Authorization": f"Bearer {response.json()['token']}"}
+
+
+class TestDeltaSync:
+    """Change tracking for polled lists"""
+
+    @pytest.mark.parametrize("endpoint", ["users", "courses", "enrollments", "notifications"])
+    def test_unchanged_poll_returns_204(self, admin_headers, endpoint):
+        snapshot = requests.get(f"{BASE_URL}/api/{endpoint}?since=0", headers=admin_headers)
+        assert snapshot.status_code == 200
+        data = snapshot.json()
+        assert data["changed"] and data["deleted"] == []
+        poll = requests.get(f"{BASE_URL}/api/{endpoint}?since={data['version']}", headers=admin_headers)
+        assert poll.status_code == 204
+        print(f"✓ /api/{endpoint}?since={data['version']} -> 204")
+
+    def test_empty_snapshot_is_not_204(self, admin_headers):
+        response = requests.get(f"{BASE_URL}/api/users?search=zzzzqqq&since=0", headers=admin_headers)
+        assert response.status_code == 200
+        assert response.json()["changed"] == [] and response.json()["deleted"] == []
+        print("✓ Empty since=0 snapshot returns the envelope")
+
+    def test_user_update_and_delete_are_reported(self, admin_headers):
+        version = requests.get(f"{BASE_URL}/api/users?since=0", headers=admin_headers).json()["version"]
+        created = requests.post(f"{BASE_URL}/api/users", headers=admin_headers,
+            json={"email": "test_delta@student.kidsintech.school", "name": "TEST Delta", "role": "student"}).json()
+        delta = requests.get(f"{BASE_URL}/api/users?since={version}", headers=admin_headers).json()
+        assert created["user_id"] in [u["user_id"] for u in delta["changed"]]
+
+        requests.delete(f"{BASE_URL}/api/users/{created['user_id']}", headers=admin_headers)
+        delta = requests.get(f"{BASE_URL}/api/users?since={delta['version']}", headers=admin_headers).json()
+        assert delta["deleted"] == [created["user_id"]]
+        print("✓ Created and deleted users appear in successive deltas")
+
+    def test_password_change_is_reported(self, admin_headers):
+        created = requests.post(f"{BASE_URL}/api/users", headers=admin_headers,
+            json={"email": "test_delta_pw@student.kidsintech.school", "name": "TEST Password", "role": "student", "password": "first-pass"}).json()
+        version = requests.get(f"{BASE_URL}/api/users?since=0", headers=admin_headers).json()["version"]
+        token = requests.post(f"{BASE_URL}/api/auth/login", json={"email": created["email"], "password": "first-pass"}).json()["token"]
+        requests.post(f"{BASE_URL}/api/auth/change-password", headers={"Authorization": f"Bearer {token}"},
+            json={"current_password": "first-pass", "new_password": "second-pass"})
+        delta = requests.get(f"{BASE_URL}/api/users?since={version}", headers=admin_headers).json()
+        changed = {u["user_id"]: u for u in delta["changed"]}
+        assert created["user_id"] in changed and changed[created["user_id"]]["must_reset_password"] is False
+        requests.delete(f"{BASE_URL}/api/users/{created['user_id']}", headers=admin_headers)
+        print("✓ Cleared must_reset_password reaches user pollers")
+
+    def test_row_leaving_the_query_is_reported_deleted(self, admin_headers):
+        course = requests.post(f"{BASE_URL}/api/courses", headers=admin_headers,
+            json={"title": "TEST_Delta visibility", "status": "published", "visibility": "public"}).json()
+        snapshot = requests.get(f"{BASE_URL}/api/courses?since=0").json()
+        assert course["course_id"] in [c["course_id"] for c in snapshot["changed"]]
+        requests.put(f"{BASE_URL}/api/courses/{course['course_id']}", headers=admin_headers, json={"status": "draft"})
+        delta = requests.get(f"{BASE_URL}/api/courses?since={snapshot['version']}").json()
+        assert course["course_id"] in delta["deleted"] and delta["full"] is False
+        requests.delete(f"{BASE_URL}/api/courses/{course['course_id']}", headers=admin_headers)
+        print("✓ Unpublished course reported as deleted to anonymous pollers")
+
+    def test_course_detail_since(self, admin_headers):
+        course = requests.get(f"{BASE_URL}/api/courses/course_002?since=0").json()
+        assert requests.get(f"{BASE_URL}/api/courses/course_002?since={course['version']}").status_code == 204
+        requests.put(f"{BASE_URL}/api/courses/course_002", headers=admin_headers, json={"level": "beginner"})
+        response = requests.get(f"{BASE_URL}/api/courses/course_002?since={course['version']}")
+        assert response.status_code == 200
+        assert response.json()["version"] > course["version"]
+        print("✓ get_course?since returns 204 until the course changes")
+
+    def test_notification_read_is_a_change(self, admin_headers):
+        snapshot = requests.get(f"{BASE_URL}/api/notifications?since=0", headers=admin_headers).json()
+        notif_id = snapshot["changed"][0]["notification_id"]
+        requests.put(f"{BASE_URL}/api/notifications/{notif_id}/read", headers=admin_headers)
+        delta = requests.get(f"{BASE_URL}/api/notifications?since={snapshot['version']}", headers=admin_headers).json()
+        assert [n["notification_id"] for n in delta["changed"]] == [notif_id]
+        assert delta["changed"][0]["is_read"] is True
+        print("✓ Marking a notification read shows up in the next delta")
@@ -0,0 +1,65 @@
+"""
+Export Tests - Kids In Tech LMS
+Testing: streaming CSV/NDJSON exports at GET /api/export/{kind}
+"""
+import csv
+import io
+import json
+import requests
+import os
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+
+class TestExport:
+
+    def get_headers(self, email, password):
+        token = requests.post(f"{BASE_URL}/api/auth/login", json={"email": email, "password": password}).json()["token"]
+        return {"Authorization": f"Bearer {token}"}
+
+    def test_enrollments_csv_matches_list(self):
+        headers = self.get_headers("admin@kidsintech.school", "innovate@2025")
+        response = requests.get(f"{BASE_URL}/api/export/enrollments", headers=headers)
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/csv")
+        assert "attachment" in response.headers["content-disposition"]
+        rows = list(csv.DictReader(io.StringIO(response.text)))
+        listed = requests.get(f"{BASE_URL}/api/enrollments", headers=headers).json()
+        assert len(rows) == len(listed)
+        by_id = {e["enrollment_id"]: e for e in listed}
+        for row in rows:
+            assert row["course_title"] == by_id[row["enrollment_id"]]["course_title"]
+            assert row["student_name"] == by_id[row["enrollment_id"]]["student_name"]
+        print(f"✓ {len(rows)} enrollment rows exported")
+
+    def test_ndjson_exports(self):
+        headers = self.get_headers("admin@kidsintech.school", "innovate@2025")
+        for kind, key in (("submissions", "assignment_title"), ("quiz_attempts", "quiz_title"), ("users", "email")):
+            response = requests.get(f"{BASE_URL}/api/export/{kind}?format=ndjson", headers=headers)
+            assert response.status_code == 200
+            rows = [json.loads(line) for line in response.text.splitlines()]
+            assert rows and all(key in r for r in rows)
+            assert all("password_hash" not in r for r in rows)
+            print(f"✓ {kind}: {len(rows)} NDJSON rows")
+
+    def test_course_filter(self):
+        headers = self.get_headers("admin@kidsintech.school", "innovate@2025")
+        response = requests.get(f"{BASE_URL}/api/export/enrollments?format=ndjson&course_id=course_001", headers=headers)
+        rows = [json.loads(line) for line in response.text.splitlines()]
+        assert all(r["course_id"] == "course_001" for r in rows)
+        print(f"✓ {len(rows)} rows for course_001")
+
+    def test_instructor_scoped_to_own_courses(self):
+        headers = self.get_headers("sarah@kidsintech.school", "instructor123")
+        rows = [json.loads(line) for line in requests.get(f"{BASE_URL}/api/export/enrollments?format=ndjson", headers=headers).text.splitlines()]
+        assert all(r["course_id"] in ("course_001", "course_004") for r in rows)
+        assert requests.get(f"{BASE_URL}/api/export/users", headers=headers).status_code == 403
+        print("✓ Instructor export limited to own courses")
+
+    def test_errors(self):
+        admin = self.get_headers("admin@kidsintech.school", "innovate@2025")
+        student = self.get_headers("ethan@student.kidsintech.school", "student123")
+        assert requests.get(f"{BASE_URL}/api/export/enrollments", headers=student).status_code == 403
+        assert requests.get(f"{BASE_URL}/api/export/grades", headers=admin).status_code == 404
+        assert requests.get(f"{BASE_URL}/api/export/users?format=xlsx", headers=admin).status_code == 400
+        print("✓ Export errors")
@@ -0,0 +1,71 @@
+"""
+Batch Grading Tests - Kids In Tech LMS
+Testing: PUT /api/submissions/grade-batch summary, validation and instructor scoping
+"""
+import requests
+import os
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+
+class TestGradeBatch:
+
+    def get_headers(self, email, password):
+        token = requests.post(f"{BASE_URL}/api/auth/login", json={"email": email, "password": password}).json()["token"]
+        return {"Authorization": f"Bearer {token}"}
+
+    def submit(self, assignment_id, headers, content):
+        return requests.post(f"{BASE_URL}/api/assignments/{assignment_id}/submit", json={"content": content}, headers=headers).json()["submission_id"]
+
+    def test_batch_grades_and_summary(self):
+        admin = self.get_headers("admin@kidsintech.school", "innovate@2025")
+        student = self.get_headers("ethan@student.kidsintech.school", "student123")
+        ids = [self.submit("asgn_001", student, f"TEST_batch {i}") for i in range(3)]
+        grades = [{"submission_id": sid, "grade": 80 + i, "feedback": f"Nice {i}"} for i, sid in enumerate(ids)]
+        response = requests.put(f"{BASE_URL}/api/submissions/grade-batch",
+                                json={"grades": grades + [{"submission_id": "sub_missing", "grade": 50}]}, headers=admin)
+        assert response.status_code == 200
+        data = response.json()
+        assert data["requested"] == 4 and data["matched"] == 3 and data["modified"] == 3
+        assert data["not_found"] == ["sub_missing"] and data["forbidden"] == []
+        subs = {s["submission_id"]: s for s in requests.get(f"{BASE_URL}/api/submissions?assignment_id=asgn_001", headers=admin).json()}
+        for i, sid in enumerate(ids):
+            assert subs[sid]["grade"] == 80 + i and subs[sid]["feedback"] == f"Nice {i}"
+            assert subs[sid]["graded_at"] == data["graded_at"]
+        print("✓ 3 submissions graded in one batch")
+
+    def test_grade_only_entry_keeps_feedback(self):
+        admin = self.get_headers("admin@kidsintech.school", "innovate@2025")
+        student = self.get_headers("ethan@student.kidsintech.school", "student123")
+        sid = self.submit("asgn_001", student, "TEST_batch regrade")
+        url = f"{BASE_URL}/api/submissions/grade-batch"
+        requests.put(url, json={"grades": [{"submission_id": sid, "grade": 70, "feedback": "Check your margins"}]}, headers=admin)
+        requests.put(url, json={"grades": [{"submission_id": sid, "grade": 85}]}, headers=admin)
+        sub = next(s for s in requests.get(f"{BASE_URL}/api/submissions?assignment_id=asgn_001", headers=admin).json() if s["submission_id"] == sid)
+        assert sub["grade"] == 85 and sub["feedback"] == "Check your margins"
+        print("✓ Grade-only batch entry leaves feedback alone")
+
+    def test_instructor_only_grades_own_courses(self):
+        admin = self.get_headers("admin@kidsintech.school", "innovate@2025")
+        sarah = self.get_headers("sarah@kidsintech.school", "instructor123")
+        student = self.get_headers("ethan@student.kidsintech.school", "student123")
+        other = requests.post(f"{BASE_URL}/api/assignments", json={"title": "TEST_Batch other course", "course_id": "course_003"}, headers=admin).json()
+        own_id = self.submit("asgn_001", student, "TEST_batch own")
+        other_id = self.submit(other["assignment_id"], student, "TEST_batch other")
+        data = requests.put(f"{BASE_URL}/api/submissions/grade-batch", json={"grades": [
+            {"submission_id": own_id, "grade": 90}, {"submission_id": other_id, "grade": 90}]}, headers=sarah).json()
+        assert data["matched"] == 1 and data["forbidden"] == [other_id]
+        subs = {s["submission_id"]: s for s in requests.get(f"{BASE_URL}/api/submissions", headers=admin).json()}
+        assert subs[own_id]["grade"] == 90 and subs[other_id]["grade"] is None
+        requests.delete(f"{BASE_URL}/api/assignments/{other['assignment_id']}", headers=admin)
+        print("✓ Submissions outside the instructor's courses are skipped")
+
+    def test_validation(self):
+        admin = self.get_headers("admin@kidsintech.school", "innovate@2025")
+        student = self.get_headers("ethan@student.kidsintech.school", "student123")
+        url = f"{BASE_URL}/api/submissions/grade-batch"
+        assert requests.put(url, json={"grades": [{"submission_id": "sub_x", "grade": 1}]}, headers=student).status_code == 403
+        assert requests.put(url, json={"grades": []}, headers=admin).status_code == 400
+        assert requests.put(url, json={"grades": [{"grade": 10}]}, headers=admin).status_code == 400
+        assert requests.put(url, json={"grades": [{"submission_id": "sub_x", "grade": "A"}]}, headers=admin).status_code == 400
+        print("✓ Students forbidden, malformed batches rejected")
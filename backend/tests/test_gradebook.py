@@ -0,0 +1,80 @@
+"""
+Gradebook Tests - Kids In Tech LMS
+Testing: GET /api/courses/{course_id}/gradebook matrix, weighted totals and column stats
+"""
+import requests
+import os
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+
+class TestGradebook:
+
+    def get_headers(self, email, password):
+        token = requests.post(f"{BASE_URL}/api/auth/login", json={"email": email, "password": password}).json()["token"]
+        return {"Authorization": f"Bearer {token}"}
+
+    def test_matrix_shape(self):
+        headers = self.get_headers("admin@kidsintech.school", "innovate@2025")
+        response = requests.get(f"{BASE_URL}/api/courses/course_001/gradebook", headers=headers)
+        assert response.status_code == 200
+        data = response.json()
+        ids = [c["id"] for c in data["columns"]]
+        assert {"quiz_001", "quiz_002", "asgn_001"} <= set(ids)
+        assert ids[-1] == "progress"
+        enrollments = requests.get(f"{BASE_URL}/api/enrollments?course_id=course_001", headers=headers).json()
+        assert len(data["students"]) == len(data["scores"]) == len(data["totals"]) == len(enrollments)
+        assert all(len(row) == len(ids) for row in data["scores"])
+        print(f"✓ {len(data['students'])} x {len(ids)} gradebook")
+
+    def test_scores_reflect_attempts_and_progress(self):
+        headers = self.get_headers("admin@kidsintech.school", "innovate@2025")
+        student = self.get_headers("ethan@student.kidsintech.school", "student123")
+        me = requests.get(f"{BASE_URL}/api/auth/me", headers=student).json()
+        requests.post(f"{BASE_URL}/api/enrollments", json={"course_id": "course_001"}, headers=student)
+        quiz = requests.get(f"{BASE_URL}/api/quizzes/quiz_002", headers=headers).json()
+        answers = [{"question_id": q["question_id"], "answer": q["correct_answer"]} for q in quiz["questions"]]
+        requests.post(f"{BASE_URL}/api/quizzes/quiz_002/attempt", json={"answers": answers}, headers=student)
+        data = requests.get(f"{BASE_URL}/api/courses/course_001/gradebook", headers=headers).json()
+        i = [s["student_id"] for s in data["students"]].index(me["user_id"])
+        j = [c["id"] for c in data["columns"]].index("quiz_002")
+        assert data["scores"][i][j] == 100
+        enrollment = next(e for e in requests.get(f"{BASE_URL}/api/enrollments?course_id=course_001", headers=headers).json() if e["student_id"] == me["user_id"])
+        assert data["scores"][i][-1] == round(enrollment["progress"], 1)
+        assert 0 <= data["totals"][i] <= 100
+        print(f"✓ Best quiz score 100, total {data['totals'][i]}")
+
+    def test_column_stats_and_weights(self):
+        headers = self.get_headers("admin@kidsintech.school", "innovate@2025")
+        data = requests.get(f"{BASE_URL}/api/courses/course_001/gradebook?quiz_weight=0&assignment_weight=0&progress_weight=1", headers=headers).json()
+        progress = [row[-1] for row in data["scores"]]
+        assert data["totals"] == progress
+        stats = data["columns"][-1]["stats"]
+        assert stats["count"] == len(progress)
+        assert stats["min"] <= stats["median"] <= stats["max"]
+        for c in data["columns"]:
+            assert c["stats"]["count"] == 0 or c["stats"]["mean"] is not None
+        print(f"✓ Progress-only totals, stats {stats}")
+
+    def test_empty_course(self):
+        headers = self.get_headers("admin@kidsintech.school", "innovate@2025")
+        course = requests.post(f"{BASE_URL}/api/courses", json={"title": "TEST_Empty gradebook"}, headers=headers).json()
+        response = requests.get(f"{BASE_URL}/api/courses/{course['course_id']}/gradebook", headers=headers)
+        assert response.status_code == 200
+        data = response.json()
+        assert data["students"] == [] and data["scores"] == [] and data["totals"] == []
+        assert data["columns"][-1]["stats"] == {"count": 0, "mean": None, "median": None, "std": None, "min": None, "max": None}
+        assert data["total_stats"]["count"] == 0 and data["total_stats"]["mean"] is None
+        requests.delete(f"{BASE_URL}/api/courses/{course['course_id']}", headers=headers)
+        print("✓ Course without enrollments has an empty gradebook")
+
+    def test_access(self):
+        student = self.get_headers("ethan@student.kidsintech.school", "student123")
+        other_instructor = self.get_headers("maria@kidsintech.school", "instructor123")
+        owner = self.get_headers("sarah@kidsintech.school", "instructor123")
+        assert requests.get(f"{BASE_URL}/api/courses/course_001/gradebook", headers=student).status_code == 403
+        assert requests.get(f"{BASE_URL}/api/courses/course_001/gradebook", headers=other_instructor).status_code == 403
+        assert requests.get(f"{BASE_URL}/api/courses/course_001/gradebook", headers=owner).status_code == 200
+        assert requests.get(f"{BASE_URL}/api/courses/missing/gradebook", headers=owner).status_code == 404
+        assert requests.get(f"{BASE_URL}/api/courses/course_001/gradebook?missing=ignore", headers=owner).status_code == 400
+        print("✓ Gradebook access rules")
@@ -0,0 +1,64 @@
+"""
+Quiz Item Analysis Tests - Kids In Tech LMS
+Testing: per-question difficulty, discrimination and distractor counts, score distribution, caching and access control
+"""
+import os
+
+import pytest
+import requests
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+
+class TestItemAnalysis:
+
+    def get_headers(self, email, password):
+        response = requests.post(f"{BASE_URL}/api/auth/login", json={"email": email, "password": password})
+        assert response.status_code == 200
+        return {"Authorization": f"Bearer {response.json()['token']}"}
+
+    def test_analysis_structure(self):
+        headers = self.get_headers("admin@kidsintech.school", "innovate@2025")
+        response = requests.get(f"{BASE_URL}/api/quizzes/quiz_001/analysis", headers=headers)
+        assert response.status_code == 200
+        data = response.json()
+        quiz = requests.get(f"{BASE_URL}/api/quizzes/quiz_001").json()
+        assert [q["question_id"] for q in data["questions"]] == [q["question_id"] for q in quiz["questions"]]
+        for item in data["questions"]:
+            assert sum(o["count"] for o in item["options"]) + item["blank"] + item["other"] == data["attempts"]
+            assert sum(o["correct"] for o in item["options"]) == 1
+            assert "difficulty" in item and "discrimination" in item
+        assert len(data["score_distribution"]["bins"]) == 10
+        assert sum(b["count"] for b in data["score_distribution"]["bins"]) == data["attempts"]
+        print(f"✓ Analysis of {data['attempts']} attempts over {len(data['questions'])} questions")
+
+    def test_cached_until_new_attempt(self):
+        admin = self.get_headers("admin@kidsintech.school", "innovate@2025")
+        student = self.get_headers("ethan@student.kidsintech.school", "student123")
+        first = requests.get(f"{BASE_URL}/api/quizzes/quiz_001/analysis", headers=admin).json()
+        again = requests.get(f"{BASE_URL}/api/quizzes/quiz_001/analysis", headers=admin).json()
+        assert again["generated_at"] == first["generated_at"]
+
+        quiz = requests.get(f"{BASE_URL}/api/quizzes/quiz_001").json()
+        answers = [{"question_id": q["question_id"], "answer": q["correct_answer"]} for q in quiz["questions"]]
+        response = requests.post(f"{BASE_URL}/api/quizzes/quiz_001/attempt", json={"answers": answers}, headers=student)
+        if response.status_code != 200: pytest.skip("No attempts left for the demo student")
+
+        fresh = requests.get(f"{BASE_URL}/api/quizzes/quiz_001/analysis", headers=admin).json()
+        assert fresh["attempts"] == first["attempts"] + 1
+        assert fresh["generated_at"] != first["generated_at"]
+        print("✓ Cached result reused, then refreshed after a new attempt")
+
+    def test_instructor_scoped_to_own_courses(self):
+        sarah = self.get_headers("sarah@kidsintech.school", "instructor123")
+        maria = self.get_headers("maria@kidsintech.school", "instructor123")
+        assert requests.get(f"{BASE_URL}/api/quizzes/quiz_001/analysis", headers=sarah).status_code == 200
+        assert requests.get(f"{BASE_URL}/api/quizzes/quiz_001/analysis", headers=maria).status_code == 403
+        print("✓ Instructors limited to their own courses")
+
+    def test_student_forbidden_and_unknown_quiz(self):
+        student = self.get_headers("ethan@student.kidsintech.school", "student123")
+        admin = self.get_headers("admin@kidsintech.school", "innovate@2025")
+        assert requests.get(f"{BASE_URL}/api/quizzes/quiz_001/analysis", headers=student).status_code == 403
+        assert requests.get(f"{BASE_URL}/api/quizzes/quiz_missing/analysis", headers=admin).status_code == 404
+        print("✓ Students forbidden, unknown quiz 404")
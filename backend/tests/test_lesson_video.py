@@ -0,0 +1,74 @@
+"""
+Lesson Video Tests - Kids In Tech LMS
+Testing: self-hosted lesson video attach/detach and /api/media range streaming with ETag and cache headers
+"""
+import os
+
+import requests
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+
+class TestLessonVideo:
+
+    def get_headers(self, email, password):
+        token = requests.post(f"{BASE_URL}/api/auth/login", json={"email": email, "password": password}).json()["token"]
+        return {"Authorization": f"Bearer {token}"}
+
+    def upload(self, headers, data, filename):
+        session = requests.post(f"{BASE_URL}/api/uploads", json={"filename": filename, "size": len(data)}, headers=headers).json()
+        return requests.put(f"{BASE_URL}/api/uploads/{session['upload_id']}", params={"offset": 0}, data=data, headers=headers).json()["file"]
+
+    def make_lesson(self, admin):
+        course = requests.post(f"{BASE_URL}/api/courses", json={"title": "TEST_Video course"}, headers=admin).json()
+        module = requests.post(f"{BASE_URL}/api/courses/{course['course_id']}/modules", json={"title": "TEST_Module"}, headers=admin).json()
+        lesson = requests.post(f"{BASE_URL}/api/modules/{module['module_id']}/lessons", json={"title": "TEST_Video lesson", "type": "video"}, headers=admin).json()
+        return course["course_id"], lesson["lesson_id"]
+
+    def test_attach_and_stream(self):
+        admin = self.get_headers("admin@kidsintech.school", "innovate@2025")
+        course_id, lesson_id = self.make_lesson(admin)
+        data = os.urandom(600_000)
+        file = self.upload(admin, data, "TEST_intro.mp4")
+        assert file["content_type"] == "video/mp4"
+        lesson = requests.put(f"{BASE_URL}/api/lessons/{lesson_id}/video", json={"file_id": file["file_id"]}, headers=admin).json()
+        assert lesson["video_url"] == f"/api/media/{file['sha256']}"
+
+        url = f"{BASE_URL}{lesson['video_url']}"
+        full = requests.get(url)  # no credentials: <video> elements cannot send a bearer token
+        assert full.status_code == 200 and full.content == data
+        assert full.headers["Content-Type"] == "video/mp4"
+        assert full.headers["Accept-Ranges"] == "bytes"
+        assert "immutable" in full.headers["Cache-Control"]
+        assert full.headers["ETag"] == f'"{file["sha256"]}"'
+        seek = requests.get(url, headers={"Range": "bytes=500000-"})
+        assert seek.status_code == 206 and seek.content == data[500_000:]
+        assert seek.headers["Content-Range"] == f"bytes 500000-599999/{len(data)}"
+        stale = requests.get(url, headers={"Range": "bytes=0-9", "If-Range": '"other"'})
+        assert stale.status_code == 200 and len(stale.content) == len(data)
+        assert requests.get(url, headers={"If-None-Match": full.headers["ETag"]}).status_code == 304
+        head = requests.head(url)
+        assert head.status_code == 200 and head.headers["Content-Length"] == str(len(data)) and not head.content
+
+        assert requests.delete(f"{BASE_URL}/api/lessons/{lesson_id}/video", headers=admin).status_code == 200
+        assert requests.get(f"{BASE_URL}/api/lessons/{lesson_id}").json()["video_url"] == ""
+        requests.delete(f"{BASE_URL}/api/courses/{course_id}", headers=admin)
+        print("✓ Video streamed with ranges, ETag and immutable caching")
+
+    def test_rejects_bad_attachments(self):
+        admin = self.get_headers("admin@kidsintech.school", "innovate@2025")
+        student = self.get_headers("ethan@student.kidsintech.school", "student123")
+        maria = self.get_headers("maria@kidsintech.school", "instructor123")
+        course_id, lesson_id = self.make_lesson(admin)
+        notes = self.upload(admin, b"not a video", "TEST_notes.txt")
+        video = self.upload(admin, os.urandom(1000), "TEST_clip.webm")
+        url = f"{BASE_URL}/api/lessons/{lesson_id}/video"
+        assert requests.put(url, json={"file_id": notes["file_id"]}, headers=admin).status_code == 400
+        assert requests.put(url, json={"file_id": video["file_id"]}, headers=student).status_code == 403
+        assert requests.put(url, json={"file_id": video["file_id"]}, headers=maria).status_code == 403
+        assert requests.put(url, json={"file_id": video["file_id"]}, headers=admin).status_code == 200
+        assert requests.delete(url, headers=maria).status_code == 403
+        assert requests.get(f"{BASE_URL}/api/lessons/{lesson_id}", headers=admin).json()["video_url"] == f"/api/media/{video['sha256']}"
+        assert requests.get(f"{BASE_URL}/api/media/{notes['sha256']}").status_code == 404  # uploads are not media until attached
+        requests.delete(f"{BASE_URL}/api/courses/{course_id}", headers=admin)
+        print("✓ Non-video files, students and other instructors rejected")
@@ -0,0 +1,63 @@
+"""
+Metrics Tests - Kids In Tech LMS
+Testing: Prometheus exposition at GET /api/metrics
+"""
+import re
+import requests
+import os
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+
+def parse(text):
+    samples = {}
+    for line in text.splitlines():
+        if line and not line.startswith("#"):
+            name, value = line.rsplit(" ", 1)
+            samples[name] = float(value)
+    return samples
+
+
+class TestPrometheusMetrics:
+
+    def get_admin_headers(self):
+        token = requests.post(f"{BASE_URL}/api/auth/login", json={
+            "email": "admin@kidsintech.school", "password": "innovate@2025"
+        }).json()["token"]
+        return {"Authorization": f"Bearer {token}"}
+
+    def test_requires_auth(self):
+        assert requests.get(f"{BASE_URL}/api/metrics").status_code == 401
+        print("✓ Metrics require authentication")
+
+    def test_exposition_format(self):
+        headers = self.get_admin_headers()
+        requests.get(f"{BASE_URL}/api/courses/course_001")
+        response = requests.get(f"{BASE_URL}/api/metrics", headers=headers)
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        samples = parse(response.text)
+        for name in ("kit_http_requests_in_flight", "kit_event_loop_lag_last_seconds", "kit_bcrypt_queue_depth",
+                     "kit_mongo_pool_checked_out", "kit_response_cache_hit_ratio"):
+            assert name in samples, name
+        assert 'kit_http_request_duration_seconds_count{method="GET",route="/api/courses/{course_id}"}' in samples
+        assert samples["kit_http_requests_in_flight"] >= 1
+        print(f"✓ {len(samples)} samples exposed")
+
+    def test_histogram_buckets_cumulative(self):
+        headers = self.get_admin_headers()
+        text = requests.get(f"{BASE_URL}/api/metrics", headers=headers).text
+        pattern = re.compile(r'kit_http_request_duration_seconds_bucket\{method="GET",route="/api/metrics",le="([^"]+)"\} (\d+)')
+        counts = [int(c) for _, c in pattern.findall(text)]
+        assert counts and counts == sorted(counts)
+        print(f"✓ {len(counts)} cumulative buckets")
+
+    def test_login_counted_and_cache_ratio(self):
+        headers = self.get_admin_headers()
+        requests.get(f"{BASE_URL}/api/courses")
+        requests.get(f"{BASE_URL}/api/courses")
+        samples = parse(requests.get(f"{BASE_URL}/api/metrics", headers=headers).text)
+        assert samples['kit_http_requests_total{method="POST",route="/api/auth/login",status="200"}'] >= 1
+        assert samples['kit_response_cache_requests_total{result="hit"}'] >= 1
+        assert 0 < samples["kit_response_cache_hit_ratio"] <= 1
+        print(f"✓ Cache hit ratio {samples['kit_response_cache_hit_ratio']}")
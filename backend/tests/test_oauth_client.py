@@ -0,0 +1,131 @@
+"""
+OAuth Session Exchange Tests - Kids In Tech LMS
+Testing: pooled session exchange client (keep-alive, retries, timeouts, session_id cache) against a local stub server
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from oauth_client import SessionExchange, SessionExchangeError
+
+
+class StubAuth(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so connection reuse is observable
+    hits = Counter()
+    ports = set()
+
+    def do_GET(self):
+        sid = self.headers.get("X-Session-ID", "")
+        StubAuth.hits[sid] += 1
+        StubAuth.ports.add(self.client_address[1])
+        if sid == "slow": time.sleep(1)
+        if sid == "bad": return self.reply(401, {"detail": "invalid"})
+        if sid == "down" or (sid == "flaky" and StubAuth.hits[sid] < 3): return self.reply(503, {"detail": "busy"})
+        self.reply(200, {"email": f"{sid}@example.com", "name": sid, "session_token": f"tok_{sid}"})
+
+    def reply(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def stub_url():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), StubAuth)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}/session-data"
+    httpd.shutdown()
+
+
+def run(url, scenario, **kwargs):
+    async def go():
+        exchange = SessionExchange(url, backoff=0.01, **kwargs)
+        await exchange.start()
+        try:
+            return await scenario(exchange)
+        finally:
+            await exchange.close()
+    return asyncio.run(go())
+
+
+class TestSessionExchange:
+
+    def setup_method(self):
+        StubAuth.hits.clear()
+        StubAuth.ports.clear()
+
+    def test_connection_reused(self, stub_url):
+        async def scenario(ex):
+            return [await ex.fetch(f"user{i}") for i in range(5)]
+        results = run(stub_url, scenario)
+        assert [r["email"] for r in results] == [f"user{i}@example.com" for i in range(5)]
+        assert len(StubAuth.ports) == 1
+        print("✓ 5 exchanges over 1 connection")
+
+    def test_repeated_session_id_served_from_cache(self, stub_url):
+        async def scenario(ex):
+            first = await ex.fetch("dup")
+            second = await ex.fetch("dup")
+            return first, second
+        first, second = run(stub_url, scenario)
+        assert first == second
+        assert StubAuth.hits["dup"] == 1
+        print("✓ Duplicate callback did not hit upstream")
+
+    def test_concurrent_duplicates_share_one_request(self, stub_url):
+        async def scenario(ex):
+            return await asyncio.gather(*(ex.fetch("slow") for _ in range(4)))
+        results = run(stub_url, scenario)
+        assert all(r["name"] == "slow" for r in results)
+        assert StubAuth.hits["slow"] == 1
+        print("✓ Concurrent duplicates coalesced")
+
+    def test_cancelled_caller_does_not_strand_others(self, stub_url):
+        async def scenario(ex):
+            first = asyncio.create_task(ex.fetch("slow"))
+            second = asyncio.create_task(ex.fetch("slow"))
+            await asyncio.sleep(0.1)
+            first.cancel()  # the first caller's client disconnected
+            return await asyncio.wait_for(second, 5)
+        assert run(stub_url, scenario)["name"] == "slow"
+        assert StubAuth.hits["slow"] == 1
+        print("✓ Concurrent caller still answered after the first one was cancelled")
+
+    def test_retries_transient_errors(self, stub_url):
+        data = run(stub_url, lambda ex: ex.fetch("flaky"))
+        assert data["name"] == "flaky"
+        assert StubAuth.hits["flaky"] == 3
+        print("✓ Retried 503 twice then succeeded")
+
+    def test_gives_up_after_retries(self, stub_url):
+        with pytest.raises(SessionExchangeError):
+            run(stub_url, lambda ex: ex.fetch("down"), retries=2)
+        assert StubAuth.hits["down"] == 3
+        print("✓ Gave up after 2 retries")
+
+    def test_rejected_session_not_retried_or_cached(self, stub_url):
+        async def scenario(ex):
+            return await ex.fetch("bad"), await ex.fetch("bad")
+        assert run(stub_url, scenario) == (None, None)
+        assert StubAuth.hits["bad"] == 2
+        print("✓ 401 returned None without retry")
+
+    def test_timeout(self, stub_url):
+        with pytest.raises(SessionExchangeError):
+            run(stub_url, lambda ex: ex.fetch("slow"), timeout=httpx.Timeout(0.2), retries=1)
+        print("✓ Upstream timeout surfaces as SessionExchangeError")
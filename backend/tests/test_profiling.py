@@ -0,0 +1,59 @@
+"""
+Profiling Tests - Kids In Tech LMS
+Testing: on-demand request profiling (X-Profile header), profile retrieval, slow-request log
+"""
+import requests
+import os
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+
+class TestRequestProfiling:
+
+    def get_headers(self, email, password):
+        token = requests.post(f"{BASE_URL}/api/auth/login", json={"email": email, "password": password}).json()["token"]
+        return {"Authorization": f"Bearer {token}"}
+
+    def test_profile_header_captures_speedscope(self):
+        headers = self.get_headers("admin@kidsintech.school", "innovate@2025")
+        response = requests.get(f"{BASE_URL}/api/analytics/overview", headers={**headers, "X-Profile": "1"})
+        assert response.status_code == 200
+        profile_id = response.headers.get("X-Profile-Id")
+        assert profile_id
+        listed = requests.get(f"{BASE_URL}/api/metrics/profiles", headers=headers).json()
+        assert any(p["profile_id"] == profile_id and p["route"] == "GET /api/analytics/overview" for p in listed)
+        profile = requests.get(f"{BASE_URL}/api/metrics/profiles/{profile_id}", headers=headers).json()
+        assert profile["profiles"][0]["type"] == "sampled"
+        assert len(profile["profiles"][0]["samples"]) == len(profile["profiles"][0]["weights"])
+        print(f"✓ Profile {profile_id}: {len(profile['shared']['frames'])} frames")
+
+    def test_collapsed_format(self):
+        headers = self.get_headers("admin@kidsintech.school", "innovate@2025")
+        profile_id = requests.get(f"{BASE_URL}/api/courses", headers={**headers, "X-Profile": "1"}).headers["X-Profile-Id"]
+        response = requests.get(f"{BASE_URL}/api/metrics/profiles/{profile_id}?format=collapsed", headers=headers)
+        assert response.status_code == 200
+        for line in response.text.strip().splitlines():
+            assert line.rsplit(" ", 1)[1].isdigit()
+        print("✓ Collapsed stacks served")
+
+    def test_non_admin_header_ignored(self):
+        headers = self.get_headers("ethan@student.kidsintech.school", "student123")
+        response = requests.get(f"{BASE_URL}/api/courses", headers={**headers, "X-Profile": "1"})
+        assert response.status_code == 200
+        assert "X-Profile-Id" not in response.headers
+        assert requests.get(f"{BASE_URL}/api/metrics/profiles", headers=headers).status_code == 403
+        print("✓ Students cannot profile")
+
+    def test_unknown_profile(self):
+        headers = self.get_headers("admin@kidsintech.school", "innovate@2025")
+        assert requests.get(f"{BASE_URL}/api/metrics/profiles/prof_missing", headers=headers).status_code == 404
+        print("✓ Unknown profile returns 404")
+
+    def test_slow_request_log(self):
+        headers = self.get_headers("admin@kidsintech.school", "innovate@2025")
+        response = requests.get(f"{BASE_URL}/api/metrics/slow-requests", headers=headers)
+        assert response.status_code == 200
+        for entry in response.json():
+            assert {"route", "path_params", "query_params", "queries", "duration_ms"} <= entry.keys()
+        assert requests.get(f"{BASE_URL}/api/metrics/slow-requests").status_code == 401
+        print(f"✓ {len(response.json())} slow requests logged")
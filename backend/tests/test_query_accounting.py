@@ -0,0 +1,88 @@
+"""
+Query Accounting Tests - Kids In Tech LMS
+Testing: per-request Mongo command accounting (Server-Timing) and GET /api/metrics/queries
+"""
+import re
+import requests
+import os
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+
+class TestQueryAccounting:
+
+    def test_server_timing_header(self):
+        response = requests.get(f"{BASE_URL}/api/courses")
+        assert response.status_code == 200
+        timing = response.headers.get("Server-Timing", "")
+        assert re.search(r'db;dur=[\d.]+;desc="\d+ queries, \d+ docs"', timing), timing
+        assert re.search(r"app;dur=[\d.]+", timing), timing
+        print(f"✓ Server-Timing: {timing}")
+
+    def test_metrics_grouped_by_route_template(self):
+        token = requests.post(f"{BASE_URL}/api/auth/login", json={
+            "email": "admin@kidsintech.school", "password": "innovate@2025"
+        }).json()["token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        requests.get(f"{BASE_URL}/api/courses/course_001")
+        requests.get(f"{BASE_URL}/api/courses/course_002")
+        response = requests.get(f"{BASE_URL}/api/metrics/queries", headers=headers)
+        assert response.status_code == 200
+        routes = {r["route"]: r for r in response.json()}
+        assert "GET /api/courses/{course_id}" in routes
+        assert routes["GET /api/courses/{course_id}"]["requests"] >= 2
+        print(f"✓ {len(routes)} routes tracked")
+
+    def test_unmatched_paths_share_one_route(self):
+        token = requests.post(f"{BASE_URL}/api/auth/login", json={
+            "email": "admin@kidsintech.school", "password": "innovate@2025"
+        }).json()["token"]
+        for i in range(3):
+            assert requests.get(f"{BASE_URL}/api/TEST_probe_{i}.php").status_code == 404
+        routes = {r["route"]: r for r in requests.get(f"{BASE_URL}/api/metrics/queries", headers={"Authorization": f"Bearer {token}"}).json()}
+        assert routes["GET unmatched"]["requests"] >= 3
+        assert not [route for route in routes if "TEST_probe" in route]
+        print("✓ Unmatched paths grouped under 'GET unmatched'")
+
+    def test_metrics_admin_only(self):
+        assert requests.get(f"{BASE_URL}/api/metrics/queries").status_code == 401
+
+    def queries(self, response):
+        return int(re.search(r'desc="(\d+) queries', response.headers["Server-Timing"]).group(1))
+
+    def test_name_joins_batched(self):
+        token = requests.post(f"{BASE_URL}/api/auth/login", json={
+            "email": "admin@kidsintech.school", "password": "innovate@2025"
+        }).json()["token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        before = requests.get(f"{BASE_URL}/api/submissions", headers=headers)
+        student = requests.post(f"{BASE_URL}/api/auth/login", json={
+            "email": "ethan@student.kidsintech.school", "password": "student123"
+        }).json()["token"]
+        for i in range(5):
+            requests.post(f"{BASE_URL}/api/assignments/asgn_001/submit", json={"content": f"TEST_loader {i}"},
+                          headers={"Authorization": f"Bearer {student}"})
+        after = requests.get(f"{BASE_URL}/api/submissions", headers=headers)
+        assert len(after.json()) == len(before.json()) + 5
+        assert all(s["student_name"] != "Unknown" for s in after.json() if s["content"].startswith("TEST_loader"))
+        assert self.queries(after) == self.queries(before)
+
+        certs = requests.get(f"{BASE_URL}/api/certificates", headers=headers)
+        assert certs.status_code == 200
+        assert self.queries(certs) <= self.queries(requests.get(f"{BASE_URL}/api/auth/me", headers=headers)) + 3
+        print(f"✓ list_submissions: {self.queries(after)} queries for {len(after.json())} rows")
+
+    def test_enrollment_lesson_totals_batched(self):
+        token = requests.post(f"{BASE_URL}/api/auth/login", json={
+            "email": "admin@kidsintech.school", "password": "innovate@2025"
+        }).json()["token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        enrollments = requests.get(f"{BASE_URL}/api/enrollments", headers=headers)
+        rows = enrollments.json()
+        assert len(rows) > 4
+        lessons = {}
+        for e in rows: lessons.setdefault(e["course_id"], set()).add(e["total_lessons"])
+        assert all(len(totals) == 1 for totals in lessons.values()) and lessons["course_001"].pop() > 0
+        # enrollments + courses + users + one lesson count aggregate
+        assert self.queries(enrollments) <= self.queries(requests.get(f"{BASE_URL}/api/auth/me", headers=headers)) + 4
+        print(f"✓ list_enrollments: {self.queries(enrollments)} queries for {len(rows)} rows")
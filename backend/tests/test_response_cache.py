@@ -0,0 +1,110 @@
+"""
+Response Cache Tests - Kids In Tech LMS
+Testing: ETag / If-None-Match handling and version-based invalidation on read-mostly endpoints
+"""
+import pytest
+import requests
+import os
+import time
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+
+class TestETagCaching:
+    """ETag and 304 behaviour for catalog reads"""
+
+    @pytest.fixture(scope="class")
+    def admin_headers(self):
+        response = requests.post(f"{BASE_URL}/api/auth/login", json={
+            "email": "admin@kidsintech.school", "password": "innovate@2025"
+        })
+        return {"Authorization": f"Bearer {response.json()['token']}"}
+
+    def test_get_course_returns_304_when_unchanged(self):
+        """A repeat request with the same ETag gets 304 and no body"""
+        first = requests.get(f"{BASE_URL}/api/courses/course_001")
+        assert first.status_code == 200
+        etag = first.headers.get("ETag")
+        assert etag
+        second = requests.get(f"{BASE_URL}/api/courses/course_001", headers={"If-None-Match": etag})
+        assert second.status_code == 304
+        assert second.content == b""
+        print(f"✓ GET /api/courses/course_001 revalidated with {etag}")
+
+    def test_course_update_invalidates_etag(self, admin_headers):
+        """Writing a course bumps its version so the old ETag no longer matches"""
+        etag = requests.get(f"{BASE_URL}/api/courses/course_001").headers["ETag"]
+        course = requests.get(f"{BASE_URL}/api/courses/course_001").json()
+        requests.put(f"{BASE_URL}/api/courses/course_001", headers=admin_headers,
+            json={"description": course["description"] + " "})
+        response = requests.get(f"{BASE_URL}/api/courses/course_001", headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.headers["ETag"] != etag
+        requests.put(f"{BASE_URL}/api/courses/course_001", headers=admin_headers,
+            json={"description": course["description"]})
+        print("✓ Course update produced a new ETag")
+
+    def test_catalog_is_cached_per_audience(self, admin_headers):
+        """Anonymous visitors and admins never share a cached catalog"""
+        public = requests.get(f"{BASE_URL}/api/courses")
+        admin = requests.get(f"{BASE_URL}/api/courses", headers=admin_headers)
+        assert public.status_code == 200 and admin.status_code == 200
+        assert all(c["status"] == "published" for c in public.json())
+        assert len(admin.json()) >= len(public.json())
+        response = requests.get(f"{BASE_URL}/api/courses", headers={"If-None-Match": admin.headers["ETag"]})
+        if admin.headers["ETag"] != public.headers["ETag"]:
+            assert response.status_code == 200
+        print(f"✓ Public catalog {len(public.json())} courses, admin catalog {len(admin.json())}")
+
+    def test_settings_still_require_admin(self):
+        """Cached endpoints keep their permission checks"""
+        response = requests.get(f"{BASE_URL}/api/settings")
+        assert response.status_code == 401
+        print("✓ Cached settings endpoint still rejects anonymous viewers")
+
+
+class TestCrossWorkerInvalidation:
+    """With several workers, a write on one must invalidate every worker's cache (via the cache bus)"""
+
+    @pytest.fixture(scope="class")
+    def admin_headers(self):
+        response = requests.post(f"{BASE_URL}/api/auth/login", json={
+            "email": "admin@kidsintech.school", "password": "innovate@2025"
+        })
+        return {"Authorization": f"Bearer {response.json()['token']}"}
+
+    def test_stale_etag_never_revalidates_after_write(self, admin_headers):
+        """Warm every worker, write once, then no worker may answer the old ETag with 304"""
+        etag = None
+        for _ in range(12):
+            etag = requests.get(f"{BASE_URL}/api/courses/course_003").headers["ETag"]
+        course = requests.get(f"{BASE_URL}/api/courses/course_003").json()
+        requests.put(f"{BASE_URL}/api/courses/course_003", headers=admin_headers,
+            json={"description": course["description"] + " "})
+        try:
+            time.sleep(0.5)  # change-stream propagation to the other workers
+            statuses = {requests.get(f"{BASE_URL}/api/courses/course_003", headers={"If-None-Match": etag}).status_code
+                        for _ in range(12)}
+            assert statuses == {200}
+        finally:
+            requests.put(f"{BASE_URL}/api/courses/course_003", headers=admin_headers,
+                json={"description": course["description"]})
+        print(f"✓ Old ETag rejected by every worker (cache bus: {requests.get(f'{BASE_URL}/api/health').json().get('cache_bus')})")
+
+    def test_direct_database_write_invalidates_cache(self):
+        """A write the API never saw (another worker or host) only reaches the cache through the bus"""
+        if requests.get(f"{BASE_URL}/api/health").json().get("cache_bus") != "running" or not os.environ.get("MONGO_URL"):
+            pytest.skip("needs a replica set, the server's MONGO_URL/DB_NAME and a running cache bus")
+        from pymongo import MongoClient
+        courses = MongoClient(os.environ["MONGO_URL"])[os.environ["DB_NAME"]].courses
+        etag = requests.get(f"{BASE_URL}/api/courses/course_003").headers["ETag"]
+        original = courses.find_one({"course_id": "course_003"})["description"]
+        courses.update_one({"course_id": "course_003"}, {"$set": {"description": original + " "}})
+        try:
+            deadline = time.monotonic() + 5
+            while requests.get(f"{BASE_URL}/api/courses/course_003", headers={"If-None-Match": etag}).status_code == 304:
+                assert time.monotonic() < deadline, "cache bus did not invalidate within 5s"
+                time.sleep(0.1)
+        finally:
+            courses.update_one({"course_id": "course_003"}, {"$set": {"description": original}})
+        print("✓ Out-of-band write invalidated the cached course")
@@ -0,0 +1,146 @@
+"""
+Search Tests - Kids In Tech LMS
+Testing: /api/search over courses, lessons and users; indexed search in list_courses / list_users
+"""
+import pytest
+import requests
+import os
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+
+@pytest.fixture(scope="module")
+def admin_headers():
+    response = requests.post(f"{BASE_URL}/api/auth/login", json={
+        "email": "admin@kidsintech.school", "password": "innovate@2025"
+    })
+    return {"Authorization": f"Bearer {response.json()['token']}"}
+
+
+class TestGlobalSearch:
+    """Ranked, paginated search endpoint"""
+
+    def test_prefix_match(self):
+        """A partial word finds courses by prefix"""
+        response = requests.get(f"{BASE_URL}/api/search?q=pyth&types=courses")
+        assert response.status_code == 200
+        titles = [r["title"] for r in response.json()["results"]]
+        assert "Advanced Python Programming" in titles
+        print(f"✓ 'pyth' matched {titles}")
+
+    def test_typo_tolerance(self):
+        """A single-character typo still matches"""
+        response = requests.get(f"{BASE_URL}/api/search?q=desgin&types=courses")
+        titles = [r["title"] for r in response.json()["results"]]
+        assert "Creative Design Masterclass" in titles
+        print("✓ 'desgin' matched 'Creative Design Masterclass'")
+
+    def test_regex_characters_are_literal(self):
+        """User input is tokenized, never evaluated as a pattern"""
+        response = requests.get(f"{BASE_URL}/api/search", params={"q": ".*(["})
+        assert response.status_code == 200
+        assert response.json()["total"] == 0
+        print("✓ Regex metacharacters do not match everything")
+
+    def test_users_only_for_admin(self, admin_headers):
+        anon = requests.get(f"{BASE_URL}/api/search?q=sarah").json()
+        assert all(r["type"] != "users" for r in anon["results"])
+        admin = requests.get(f"{BASE_URL}/api/search?q=sarah", headers=admin_headers).json()
+        assert any(r["type"] == "users" and r["id"] == "user_inst001" for r in admin["results"])
+        print("✓ User results restricted to super admins")
+
+    def test_users_type_filter_not_widened(self):
+        """Asking only for users without the right to see them returns nothing, not everything"""
+        anon = requests.get(f"{BASE_URL}/api/search?q=a&types=users").json()
+        assert anon["total"] == 0 and anon["results"] == []
+        token = requests.post(f"{BASE_URL}/api/auth/login", json={"email": "ethan@student.kidsintech.school", "password": "student123"}).json()["token"]
+        student = requests.get(f"{BASE_URL}/api/search?q=alex&types=users", headers={"Authorization": f"Bearer {token}"}).json()
+        assert student["results"] == []
+        print("✓ types=users returns nothing to anonymous callers and students")
+
+    def test_lesson_hits_keep_kind(self):
+        response = requests.get(f"{BASE_URL}/api/search?q=responsive&types=lessons").json()
+        assert response["results"] and all(r["type"] == "lessons" for r in response["results"])
+        assert all("lesson_type" in r for r in response["results"])
+        assert "<mark>responsive</mark>" in response["results"][0]["snippet"].lower()
+        print("✓ Lesson hits keep their kind and carry a snippet")
+
+    def test_draft_courses_hidden_from_public(self):
+        """Unpublished course 'Digital Marketing Strategy' is not returned anonymously"""
+        response = requests.get(f"{BASE_URL}/api/search?q=marketing&types=courses").json()
+        assert response["total"] == 0
+        print("✓ Draft course hidden from public search")
+
+    def test_pagination(self, admin_headers):
+        first = requests.get(f"{BASE_URL}/api/search?q=s&limit=2&page=1", headers=admin_headers).json()
+        second = requests.get(f"{BASE_URL}/api/search?q=s&limit=2&page=2", headers=admin_headers).json()
+        assert len(first["results"]) <= 2
+        assert first["total"] == second["total"]
+        assert not {r["id"] for r in first["results"]} & {r["id"] for r in second["results"]}
+        print(f"✓ Paginated {first['total']} results")
+
+
+class TestIndexedListFilters:
+    """list_courses / list_users search uses the index and stays current on writes"""
+
+    def test_list_users_search(self, admin_headers):
+        response = requests.get(f"{BASE_URL}/api/users?search=liam", headers=admin_headers)
+        assert response.status_code == 200
+        assert [u["email"] for u in response.json()] == ["liam@student.kidsintech.school"]
+        print("✓ list_users search=liam")
+
+    def test_new_course_is_searchable(self, admin_headers):
+        created = requests.post(f"{BASE_URL}/api/courses", headers=admin_headers,
+            json={"title": "TEST_Quantum Origami", "status": "published"}).json()
+        try:
+            found = requests.get(f"{BASE_URL}/api/courses?search=origami", headers=admin_headers).json()
+            assert [c["course_id"] for c in found] == [created["course_id"]]
+            requests.put(f"{BASE_URL}/api/courses/{created['course_id']}", headers=admin_headers,
+                json={"title": "TEST_Quantum Knitting"})
+            assert requests.get(f"{BASE_URL}/api/courses?search=origami", headers=admin_headers).json() == []
+        finally:
+            requests.delete(f"{BASE_URL}/api/courses/{created['course_id']}", headers=admin_headers)
+        print("✓ Course index updated on create/update")
+
+
+class TestLessonContentSearch:
+    """Lesson body search scoped to a course, with highlighted snippets"""
+
+    def test_content_match_with_snippet(self):
+        """'responsive' appears only in lesson content of course_001"""
+        response = requests.get(f"{BASE_URL}/api/courses/course_001/lessons/search?q=responsive")
+        assert response.status_code == 200
+        hits = response.json()
+        assert hits, "Expected a lesson mentioning 'responsive'"
+        assert hits[0]["course_id"] == "course_001"
+        assert "<mark>responsive</mark>" in hits[0]["snippet"].lower()
+        print(f"✓ Content search hit '{hits[0]['title']}': {hits[0]['snippet']}")
+
+    def test_scoped_to_course(self):
+        """A term from course_002 content is not found inside course_001"""
+        response = requests.get(f"{BASE_URL}/api/courses/course_001/lessons/search?q=pandas")
+        assert response.status_code == 200
+        assert response.json() == []
+        other = requests.get(f"{BASE_URL}/api/courses/course_002/lessons/search?q=pandas").json()
+        assert other and all(h["course_id"] == "course_002" for h in other)
+        print("✓ Lesson search is scoped per course")
+
+    def test_lesson_updates_reindexed(self, admin_headers):
+        modules = requests.get(f"{BASE_URL}/api/courses/course_003/modules").json()
+        lesson = requests.post(f"{BASE_URL}/api/modules/{modules[0]['module_id']}/lessons", headers=admin_headers,
+            json={"title": "TEST_Kerning", "content": "<p>Spacing between <b>glyphs</b> matters.</p>", "status": "published"}).json()
+        try:
+            hits = requests.get(f"{BASE_URL}/api/courses/course_003/lessons/search?q=glyphs").json()
+            assert [h["lesson_id"] for h in hits] == [lesson["lesson_id"]]
+            requests.put(f"{BASE_URL}/api/lessons/{lesson['lesson_id']}", headers=admin_headers,
+                json={"content": "<p>Letter spacing.</p>"})
+            assert requests.get(f"{BASE_URL}/api/courses/course_003/lessons/search?q=glyphs").json() == []
+        finally:
+            requests.delete(f"{BASE_URL}/api/lessons/{lesson['lesson_id']}", headers=admin_headers)
+        assert requests.get(f"{BASE_URL}/api/courses/course_003/lessons/search?q=spacing").json() == []
+        print("✓ Lesson index follows create/update/delete")
+
+    def test_hidden_course_returns_404(self):
+        response = requests.get(f"{BASE_URL}/api/courses/course_005/lessons/search?q=seo")
+        assert response.status_code == 404
+        print("✓ Draft/private course not searchable anonymously")
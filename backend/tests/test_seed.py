@@ -0,0 +1,59 @@
+"""
+Seed Generator Tests - Kids In Tech LMS
+Testing: POST /api/seed with synthetic volume parameters
+"""
+import requests
+import os
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+PARAMS = {"seed": 7, "schools": 3, "students": 40, "courses": 3, "modules": 2, "lessons": 2,
+          "attempts": 60, "submissions": 30, "events": 80}
+
+
+class TestSyntheticSeed:
+
+    def get_headers(self):
+        token = requests.post(f"{BASE_URL}/api/auth/login", json={"email": "admin@kidsintech.school", "password": "innovate@2025"}).json()["token"]
+        return {"Authorization": f"Bearer {token}"}
+
+    def test_synthetic_volume_and_determinism(self):
+        admin = self.get_headers()
+        first = requests.post(f"{BASE_URL}/api/seed", json=PARAMS, headers=admin)
+        assert first.status_code == 200
+        stats = first.json()["stats"]
+        assert stats["users"] >= 14 + 40
+        assert stats["courses"] == 5 + 3
+        assert stats["lessons"] == 20 + 3 * 2 * 2
+        assert stats["activity_logs"] >= 80
+        token = requests.post(f"{BASE_URL}/api/auth/login", json={
+            "email": "syn000005@student.kidsintech.school", "password": "student123"
+        }).json()["token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        enrolled = sorted(e["enrollment_id"] for e in requests.get(f"{BASE_URL}/api/enrollments", headers=headers).json())
+        assert enrolled
+        requests.post(f"{BASE_URL}/api/seed", json=PARAMS, headers=self.get_headers())
+        again = sorted(e["enrollment_id"] for e in requests.get(f"{BASE_URL}/api/enrollments", headers=headers).json())
+        assert again == enrolled
+        print(f"✓ Synthetic seed: {stats}")
+
+    def test_invalid_parameters(self):
+        admin = self.get_headers()
+        assert requests.post(f"{BASE_URL}/api/seed", json={"teachers": 5}, headers=admin).status_code == 400
+        assert requests.post(f"{BASE_URL}/api/seed", json={"students": -1}, headers=admin).status_code == 400
+        assert requests.post(f"{BASE_URL}/api/seed", json={"events": 10 ** 9}, headers=admin).status_code == 400
+        print("✓ Invalid and oversized seed parameters rejected")
+
+    def test_reseed_forces_full_resync(self):
+        admin = self.get_headers()
+        cursor = requests.get(f"{BASE_URL}/api/users?since=0", headers=admin).json()["version"]
+        requests.post(f"{BASE_URL}/api/seed", headers=admin)
+        poll = requests.get(f"{BASE_URL}/api/users?since={cursor}", headers=self.get_headers())
+        assert poll.status_code == 200 and poll.json()["full"] is True
+        print("✓ Cursors from before a reseed get a full resync")
+
+    def test_default_seed_restores_demo(self):
+        response = requests.post(f"{BASE_URL}/api/seed", headers=self.get_headers())
+        assert response.status_code == 200
+        assert response.json()["stats"]["users"] == 14
+        print("✓ Demo dataset restored")
@@ -0,0 +1,86 @@
+"""
+Submission Similarity Tests - Kids In Tech LMS
+Testing: MinHash/LSH near-duplicate detection (unit, 10k-submission scale) and the per-assignment similarity endpoint
+"""
+import os
+import sys
+import time
+import random
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import similarity
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+ESSAY = ("Variables store values that a program can change while it runs. A loop repeats a block of code "
+         "until a condition is false, and a function groups steps so they can be reused with different inputs. "
+         "In my game the score variable goes up every time the player collects a coin and the loop checks for collisions.")
+
+
+class TestMinHash:
+
+    def test_identical_and_unrelated(self):
+        sigs = [similarity.signature(ESSAY), similarity.signature(ESSAY.upper()), similarity.signature("Completely unrelated words about painting sunsets.")]
+        assert similarity.near_duplicates(sigs) == [(0, 1, 1.0)]
+        assert similarity.signature("") is None and similarity.signature("  ...  ") is None
+        print("✓ Case-insensitive copy found, unrelated text ignored")
+
+    def test_lsh_scales_to_10k_submissions(self):
+        rng = random.Random(7)
+        vocab = [f"word{i}" for i in range(5000)]
+        texts = [" ".join(rng.choice(vocab) for _ in range(rng.randint(150, 300))) for _ in range(10000)]
+        planted = set()
+        for _ in range(20):
+            src = rng.randrange(len(texts))
+            words = texts[src].split()
+            for _ in range(len(words) // 40): words[rng.randrange(len(words))] = rng.choice(vocab)
+            texts.append(" ".join(words))
+            planted.add((src, len(texts) - 1))
+        sigs = [similarity.signature(t) for t in texts]
+        start = time.perf_counter()
+        found = {(i, j) for i, j, _ in similarity.near_duplicates(sigs, 0.5)}
+        elapsed = time.perf_counter() - start
+        assert planted <= found
+        assert len(found - planted) == 0
+        assert elapsed < 5
+        print(f"✓ {len(planted)} planted copies found among {len(texts)} submissions in {elapsed:.2f}s")
+
+
+class TestSimilarityEndpoint:
+
+    def get_headers(self, email, password):
+        response = requests.post(f"{BASE_URL}/api/auth/login", json={"email": email, "password": password})
+        assert response.status_code == 200
+        return {"Authorization": f"Bearer {response.json()['token']}"}
+
+    def test_copied_submission_flagged(self):
+        admin = self.get_headers("admin@kidsintech.school", "innovate@2025")
+        assignment = requests.post(f"{BASE_URL}/api/assignments", json={"title": "TEST_Similarity essay", "course_id": "course_001"}, headers=admin).json()
+        aid = assignment["assignment_id"]
+        ethan = self.get_headers("ethan@student.kidsintech.school", "student123")
+        requests.post(f"{BASE_URL}/api/assignments/{aid}/submit", json={"content": ESSAY}, headers=ethan)
+        requests.post(f"{BASE_URL}/api/assignments/{aid}/submit", json={"content": ESSAY.replace("my game", "our game")}, headers=admin)
+        requests.post(f"{BASE_URL}/api/assignments/{aid}/submit", json={"content": ESSAY + " Resubmitted."}, headers=ethan)
+
+        response = requests.get(f"{BASE_URL}/api/assignments/{aid}/similarity", headers=admin)
+        assert response.status_code == 200
+        data = response.json()
+        assert data["submissions"] == 3
+        assert data["total_pairs"] == 2  # ethan's own resubmission is not reported
+        for pair in data["pairs"]:
+            assert pair["a"]["student_id"] != pair["b"]["student_id"]
+            assert pair["similarity"] >= 0.5
+        requests.delete(f"{BASE_URL}/api/assignments/{aid}", headers=admin)
+        print("✓ Copied submissions flagged across students")
+
+    def test_access_control(self):
+        student = self.get_headers("ethan@student.kidsintech.school", "student123")
+        maria = self.get_headers("maria@kidsintech.school", "instructor123")
+        admin = self.get_headers("admin@kidsintech.school", "innovate@2025")
+        assert requests.get(f"{BASE_URL}/api/assignments/asgn_001/similarity", headers=student).status_code == 403
+        assert requests.get(f"{BASE_URL}/api/assignments/asgn_001/similarity", headers=maria).status_code == 403
+        assert requests.get(f"{BASE_URL}/api/assignments/asgn_missing/similarity", headers=admin).status_code == 404
+        assert requests.get(f"{BASE_URL}/api/assignments/asgn_001/similarity", params={"threshold": 0}, headers=admin).status_code == 400
+        print("✓ Students and other instructors forbidden, bad input rejected")
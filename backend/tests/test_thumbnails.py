@@ -0,0 +1,102 @@
+"""
+Image Thumbnail Tests - Kids In Tech LMS
+Testing: resized WebP/JPEG variants (unit), /api/images registration and serving, course list thumbnail URLs
+"""
+import io
+import os
+import sys
+
+import pytest
+import requests
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import thumbnails
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+
+def png_bytes(size, mode="RGB", color="red"):
+    buf = io.BytesIO()
+    Image.new(mode, size, color).save(buf, "PNG")
+    return buf.getvalue()
+
+
+class TestResize:
+
+    def test_variants_cropped_to_size(self, tmp_path):
+        src = tmp_path / "wide.png"
+        src.write_bytes(png_bytes((1600, 600)))
+        for variant, (width, height) in thumbnails.VARIANTS.items():
+            for fmt in thumbnails.FORMATS:
+                img = Image.open(io.BytesIO(thumbnails.resize(str(src), variant, fmt)))
+                assert img.size == (width, height) and img.format == fmt.upper()
+        print("✓ Every variant has its exact size in both formats")
+
+    def test_transparent_source(self, tmp_path):
+        src = tmp_path / "logo.png"
+        src.write_bytes(png_bytes((300, 300), "RGBA", (0, 0, 0, 0)))
+        assert Image.open(io.BytesIO(thumbnails.resize(str(src), "avatar", "jpeg"))).getpixel((10, 10)) == (255, 255, 255)
+        assert Image.open(io.BytesIO(thumbnails.resize(str(src), "avatar", "webp"))).mode == "RGBA"
+        print("✓ Alpha flattened onto white for JPEG, kept for WebP")
+
+    def test_not_an_image(self, tmp_path):
+        src = tmp_path / "notes.png"
+        src.write_bytes(b"definitely not a png")
+        with pytest.raises(ValueError):
+            thumbnails.resize(str(src), "card", "webp")
+        print("✓ Unreadable source raises ValueError")
+
+
+class TestImageEndpoints:
+
+    def get_headers(self, email, password):
+        token = requests.post(f"{BASE_URL}/api/auth/login", json={"email": email, "password": password}).json()["token"]
+        return {"Authorization": f"Bearer {token}"}
+
+    def upload(self, headers, data, filename):
+        session = requests.post(f"{BASE_URL}/api/uploads", json={"filename": filename, "size": len(data)}, headers=headers).json()
+        return requests.put(f"{BASE_URL}/api/uploads/{session['upload_id']}", params={"offset": 0}, data=data, headers=headers).json()["file"]
+
+    def test_course_list_thumbnails(self):
+        admin = self.get_headers("admin@kidsintech.school", "innovate@2025")
+        file = self.upload(admin, png_bytes((1920, 1080), color="navy"), "TEST_cover.png")
+        course = requests.post(f"{BASE_URL}/api/courses", json={"title": "TEST_Thumbnail course", "thumbnail": file["url"],
+                                                                 "status": "published", "visibility": "public"}, headers=admin).json()
+        listed = next(c for c in requests.get(f"{BASE_URL}/api/courses").json() if c["course_id"] == course["course_id"])
+        assert set(listed["thumbnails"]) == {"card", "card_2x"}
+
+        url = f"{BASE_URL}{listed['thumbnails']['card']['webp']}"
+        first = requests.get(url)  # public: <img> tags send no bearer token
+        assert first.status_code == 200 and first.headers["Content-Type"] == "image/webp"
+        assert first.headers["Cache-Control"] == "public, max-age=31536000, immutable"
+        assert Image.open(io.BytesIO(first.content)).size == thumbnails.VARIANTS["card"]
+        second = requests.get(url)
+        assert second.content == first.content and second.headers["ETag"] == first.headers["ETag"]
+        assert requests.get(url, headers={"If-None-Match": first.headers["ETag"]}).status_code == 304
+        jpeg = requests.get(f"{BASE_URL}{listed['thumbnails']['card_2x']['jpeg']}")
+        assert jpeg.headers["Content-Type"] == "image/jpeg" and Image.open(io.BytesIO(jpeg.content)).size == thumbnails.VARIANTS["card_2x"]
+        requests.delete(f"{BASE_URL}/api/courses/{course['course_id']}", headers=admin)
+        print("✓ Course list links cached, immutable thumbnail variants")
+
+    def test_register_image(self):
+        admin = self.get_headers("admin@kidsintech.school", "innovate@2025")
+        student = self.get_headers("liam@student.kidsintech.school", "student123")
+        file = self.upload(student, png_bytes((400, 500), color="green"), "TEST_me.png")
+        r = requests.post(f"{BASE_URL}/api/images", json={"file_id": file["file_id"]}, headers=student)
+        assert r.status_code == 200 and r.json()["url"] == file["url"]
+        avatar = requests.get(f"{BASE_URL}{r.json()['variants']['avatar']['webp']}")
+        assert Image.open(io.BytesIO(avatar.content)).size == thumbnails.VARIANTS["avatar"]
+        requests.put(f"{BASE_URL}/api/auth/profile", json={"picture": file["url"]}, headers=student)
+        assert requests.get(f"{BASE_URL}/api/auth/me", headers=student).json()["pictures"]["avatar"] == r.json()["variants"]["avatar"]
+
+        notes = self.upload(admin, b"plain text", "TEST_notes.txt")
+        assert requests.post(f"{BASE_URL}/api/images", json={"file_id": notes["file_id"]}, headers=admin).status_code == 400
+        assert requests.post(f"{BASE_URL}/api/images", json={"file_id": file["file_id"]}, headers=self.get_headers(
+            "ethan@student.kidsintech.school", "student123")).status_code == 400
+        assert requests.post(f"{BASE_URL}/api/images", json={"url": "http://127.0.0.1/admin.png"}, headers=admin).status_code == 400
+        assert requests.post(f"{BASE_URL}/api/images", json={"url": "https://example.com/huge.png"}, headers=student).status_code == 403
+        assert requests.post(f"{BASE_URL}/api/images", json={"url": "file:///etc/passwd"}, headers=admin).status_code == 400
+        assert requests.get(f"{BASE_URL}/api/images/{'0' * 32}/card.webp").status_code == 404
+        assert requests.get(f"{BASE_URL}{r.json()['variants']['avatar']['webp'].replace('avatar', 'poster')}").status_code == 404
+        print("✓ Uploads registered; private hosts, other users' files and unknown keys rejected")
@@ -0,0 +1,134 @@
+"""
+Upload Storage Tests - Kids In Tech LMS
+Testing: chunked resumable uploads, sha256 deduplication, quotas, file downloads with ranges and assignment attachments
+"""
+import os
+import hashlib
+
+import requests
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+
+class TestUploads:
+
+    def get_headers(self, email, password):
+        token = requests.post(f"{BASE_URL}/api/auth/login", json={"email": email, "password": password}).json()["token"]
+        return {"Authorization": f"Bearer {token}"}
+
+    def upload(self, headers, data, filename="TEST_notes.bin", chunk=100_000):
+        session = requests.post(f"{BASE_URL}/api/uploads", json={"filename": filename, "size": len(data)}, headers=headers).json()
+        for offset in range(0, len(data), chunk):
+            result = requests.put(f"{BASE_URL}/api/uploads/{session['upload_id']}", params={"offset": offset},
+                                  data=data[offset:offset + chunk], headers=headers).json()
+        return result
+
+    def test_chunked_resumable_upload(self):
+        headers = self.get_headers("ethan@student.kidsintech.school", "student123")
+        data = os.urandom(250_000)
+        session = requests.post(f"{BASE_URL}/api/uploads", json={"filename": "TEST_project.zip", "size": len(data), "content_type": "application/zip"}, headers=headers).json()
+        url = f"{BASE_URL}/api/uploads/{session['upload_id']}"
+        assert session["offset"] == 0 and session["status"] == "uploading"
+        first = requests.put(url, params={"offset": 0}, data=data[:100_000], headers=headers).json()
+        assert first["offset"] == 100_000
+        stale = requests.put(url, params={"offset": 0}, data=data[:100_000], headers=headers)
+        assert stale.status_code == 409 and stale.json()["offset"] == 100_000
+        assert requests.get(url, headers=headers).json()["offset"] == 100_000  # where a client resumes after a dropped connection
+        done = requests.put(url, params={"offset": 100_000}, data=data[100_000:], headers=headers).json()
+        assert done["status"] == "complete"
+        assert done["file"]["sha256"] == hashlib.sha256(data).hexdigest()
+
+        download = requests.get(f"{BASE_URL}{done['file']['url']}", headers=headers)
+        assert download.status_code == 200 and download.content == data
+        assert download.headers["Content-Type"] == "application/zip"
+        part = requests.get(f"{BASE_URL}{done['file']['url']}", headers={**headers, "Range": "bytes=1000-1999"})
+        assert part.status_code == 206 and part.content == data[1000:2000]
+        print("✓ 250 KB uploaded in resumable chunks and downloaded with ranges")
+
+    def test_duplicate_content_skips_upload(self):
+        headers = self.get_headers("ethan@student.kidsintech.school", "student123")
+        data = os.urandom(50_000)
+        first = self.upload(headers, data)
+        digest = hashlib.sha256(data).hexdigest()
+        again = requests.post(f"{BASE_URL}/api/uploads", json={"filename": "TEST_copy.bin", "size": len(data), "sha256": digest}, headers=headers).json()
+        assert again["status"] == "complete" and again["offset"] == len(data)
+        assert again["file"]["sha256"] == digest and again["file"]["file_id"] != first["file"]["file_id"]
+        assert requests.get(f"{BASE_URL}{again['file']['url']}", headers=headers).content == data
+        print("✓ Known content completed without sending bytes")
+
+    def test_declared_digest_of_others_file_needs_bytes(self):
+        owner = self.get_headers("ethan@student.kidsintech.school", "student123")
+        other = self.get_headers("liam@student.kidsintech.school", "student123")
+        data = os.urandom(20_000)
+        self.upload(owner, data)
+        claim = requests.post(f"{BASE_URL}/api/uploads", json={"filename": "TEST_guess.bin", "size": len(data),
+                                                               "sha256": hashlib.sha256(data).hexdigest()}, headers=other).json()
+        assert claim["status"] == "uploading" and claim["offset"] == 0 and "file" not in claim
+        requests.delete(f"{BASE_URL}/api/uploads/{claim['upload_id']}", headers=other)
+        print("✓ Another user's digest does not complete an upload")
+
+    def test_limits_and_quota(self):
+        headers = self.get_headers("liam@student.kidsintech.school", "student123")
+        quota = requests.get(f"{BASE_URL}/api/storage/quota", headers=headers).json()
+        too_big = requests.post(f"{BASE_URL}/api/uploads", json={"filename": "TEST_big.bin", "size": quota["max_file"] + 1}, headers=headers)
+        assert too_big.status_code == 413
+        sessions, status = [], 200
+        for _ in range(quota["quota"] // quota["max_file"] + 2):
+            response = requests.post(f"{BASE_URL}/api/uploads", json={"filename": "TEST_fill.bin", "size": quota["max_file"]}, headers=headers)
+            status = response.status_code
+            if status != 200: break
+            sessions.append(response.json()["upload_id"])
+        assert status == 413
+        for upload_id in sessions:
+            assert requests.delete(f"{BASE_URL}/api/uploads/{upload_id}", headers=headers).status_code == 200
+        assert requests.get(f"{BASE_URL}/api/storage/quota", headers=headers).json()["used"] == quota["used"]
+        session = requests.post(f"{BASE_URL}/api/uploads", json={"filename": "TEST_small.bin", "size": 10}, headers=headers).json()
+        overrun = requests.put(f"{BASE_URL}/api/uploads/{session['upload_id']}", params={"offset": 0}, data=b"x" * 11, headers=headers)
+        assert overrun.status_code == 413
+        print("✓ Per-file limit, quota reservations and declared sizes enforced")
+
+    def test_chunk_limit(self):
+        headers = self.get_headers("ethan@student.kidsintech.school", "student123")
+        session = requests.post(f"{BASE_URL}/api/uploads", json={"filename": "TEST_chunky.bin", "size": 20 * 1024 * 1024}, headers=headers).json()
+        chunk_size = session["chunk_size"]
+        url = f"{BASE_URL}/api/uploads/{session['upload_id']}"
+        assert requests.put(url, params={"offset": 0}, data=b"x" * (chunk_size + 1), headers=headers).status_code == 413
+        streamed = requests.put(url, params={"offset": 0}, data=iter([b"x" * 65536] * (chunk_size // 65536 + 1)), headers=headers)
+        assert streamed.status_code == 413  # sent chunked, without a Content-Length
+        requests.delete(url, headers=headers)
+        print(f"✓ Chunks over {chunk_size} bytes rejected with and without Content-Length")
+
+    def test_attach_to_submission(self):
+        student = self.get_headers("ethan@student.kidsintech.school", "student123")
+        other = self.get_headers("liam@student.kidsintech.school", "student123")
+        instructor = self.get_headers("sarah@kidsintech.school", "instructor123")
+        file = self.upload(student, b"print('hello')\n", filename="TEST_hello.py")["file"]
+        sub = requests.post(f"{BASE_URL}/api/assignments/asgn_001/submit", json={"content": "See file", "file_id": file["file_id"]}, headers=student).json()
+        assert sub["file_url"] == file["url"]
+        assert requests.get(f"{BASE_URL}{file['url']}", headers=instructor).content == b"print('hello')\n"
+        assert requests.get(f"{BASE_URL}{file['url']}", headers=other).status_code == 403
+        maria = self.get_headers("maria@kidsintech.school", "instructor123")  # teaches course_003/005, not course_001
+        assert requests.get(f"{BASE_URL}{file['url']}", headers=maria).status_code == 403
+        assert requests.post(f"{BASE_URL}/api/assignments/asgn_001/submit", json={"file_id": file["file_id"]}, headers=other).status_code == 400
+        print("✓ Uploaded file attached to a submission")
+
+    def test_active_content_downloaded_as_attachment(self):
+        headers = self.get_headers("ethan@student.kidsintech.school", "student123")
+        page = self.upload(headers, b"<script>alert(document.cookie)</script>", filename="TEST_page.html")["file"]
+        response = requests.get(f"{BASE_URL}{page['url']}", headers=headers)
+        assert response.headers["Content-Disposition"].startswith("attachment")
+        assert response.headers["X-Content-Type-Options"] == "nosniff"
+        notes = self.upload(headers, b"plain notes", filename="TEST_notes.txt")["file"]
+        assert requests.get(f"{BASE_URL}{notes['url']}", headers=headers).headers["Content-Disposition"].startswith("inline")
+        print("✓ HTML served as an attachment with nosniff; plain text inline")
+
+    def test_unicode_filename(self):
+        headers = self.get_headers("ethan@student.kidsintech.school", "student123")
+        file = self.upload(headers, b"%PDF-1.4 report", filename='évil—report"\r\nX-Injected: 1.pdf')["file"]
+        assert file["filename"] == "évil—reportX-Injected: 1.pdf"
+        response = requests.get(f"{BASE_URL}{file['url']}", headers=headers)
+        assert response.status_code == 200 and "X-Injected" not in response.headers
+        disposition = response.headers["Content-Disposition"]
+        assert disposition.startswith('inline; filename="_vil_reportX-Injected: 1.pdf"')
+        assert "filename*=UTF-8''%C3%A9vil%E2%80%94report" in disposition
+        print(f"✓ Non-ASCII filename encoded: {disposition}")
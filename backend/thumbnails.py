@@ -0,0 +1,38 @@
+"""Resize course thumbnails and profile pictures with Pillow.
+
+resize() runs in worker processes, so it only takes plain data (the path of the source
+file) and imports nothing from the server. Variants are cropped to their aspect ratio
+around the centre, so cards and avatars line up whatever the source shape.
+"""
+import io
+
+from PIL import Image, ImageOps
+
+RENDERER_VERSION = 1  # bump when the output changes; it is part of every variant URL and cache file
+VARIANTS = {"card": (480, 270), "card_2x": (960, 540), "avatar": (96, 96), "avatar_2x": (192, 192)}
+FORMATS = {"webp": "image/webp", "jpeg": "image/jpeg"}
+QUALITY = {"webp": 80, "jpeg": 82}
+MAX_PIXELS = 50_000_000  # larger sources are refused rather than decoded
+
+
+def resize(path, variant, fmt):
+    """The variant of the image at path encoded as fmt. Raises ValueError for anything Pillow cannot read."""
+    width, height = VARIANTS[variant]
+    try:
+        with Image.open(path) as img:
+            if img.width * img.height > MAX_PIXELS: raise ValueError(f"Image is larger than {MAX_PIXELS} pixels")
+            # JPEG sources decode straight at 1/2, 1/4 or 1/8 scale when that is still big enough
+            img.draft("RGB", (max(width, height),) * 2)
+            img = ImageOps.exif_transpose(img)
+            img = img.convert("RGBA" if img.mode in ("RGBA", "LA", "PA") or "transparency" in img.info else "RGB")
+    except (OSError, SyntaxError, Image.DecompressionBombError) as e:
+        raise ValueError(f"Not a supported image: {e}") from None
+    img = ImageOps.fit(img, (width, height), Image.Resampling.LANCZOS)
+    if fmt == "jpeg" and img.mode == "RGBA":
+        flat = Image.new("RGB", img.size, "white")
+        flat.paste(img, mask=img.getchannel("A"))
+        img = flat
+    out = io.BytesIO()
+    if fmt == "webp": img.save(out, "WEBP", quality=QUALITY[fmt], method=4)
+    else: img.save(out, "JPEG", quality=QUALITY[fmt], optimize=True, progressive=True)
+    return out.getvalue()
@@ -68,9 +68,11 @@ class LMSBackendTester:
         return success
     
     def test_seed_data(self):
-        """Test seeding database"""
+        """Test seeding database (needs the demo super admin, or a server started with SEED_OPEN=true on a fresh database)"""
         print("\n🔍 Testing Database Seeding...")
-        response, error = self.make_request('POST', 'api/seed')
+        login, _ = self.make_request('POST', 'api/auth/login', {"email": "admin@kidsintech.school", "password": "innovate@2025"})
+        token = login.json().get('token') if login is not None and login.status_code == 200 else None
+        response, error = self.make_request('POST', 'api/seed', token=token)
         
         if error:
             self.log_result("Database Seed", False, error)
@@ -25,4 +25,25 @@ API.interceptors.response.use(
   }
 );
 
+// Merge a ?since= delta ({ version, changed, deleted }) into a list keyed by `key`
+export const applyDelta = (list, { changed, deleted }, key) => {
+  const updates = new Map(changed.map(x => [x[key], x]));
+  const removed = new Set(deleted);
+  const merged = list.filter(x => !removed.has(x[key])).map(x => updates.get(x[key]) || x);
+  const known = new Set(merged.map(x => x[key]));
+  return [...changed.filter(x => !known.has(x[key])), ...merged];
+};
+
+// Poll a list endpoint with ?since=, asking for a full list again whenever the params change.
+// The server answers with a full list (full: true) when the client's version is too old.
+export const syncList = (url, params, syncRef, setList, key) => {
+  const scope = JSON.stringify(params);
+  const since = syncRef.current?.scope === scope ? syncRef.current.version : 0;
+  return API.get(url, { params: { ...params, since } }).then(res => {
+    if (res.status === 204) return;
+    syncRef.current = { scope, version: res.data.version };
+    setList(prev => (since === 0 || res.data.full ? res.data.changed : applyDelta(prev, res.data, key)));
+  });
+};
+
 export default API;
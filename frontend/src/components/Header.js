@@ -1,8 +1,8 @@
-import React, { useState, useEffect, useCallback } from 'react';
+import React, { useState, useEffect, useCallback, useRef } from 'react';
 import { useAuth } from '../context/AuthContext';
 import { useLanguage } from '../context/LanguageContext';
 import { Bell, Search, ChevronDown, X, Globe } from 'lucide-react';
-import API from '../api';
+import API, { syncList } from '../api';
 
 export default function Header() {
   const { user, logout } = useAuth();
@@ -11,13 +11,11 @@ export default function Header() {
   const [showNotifs, setShowNotifs] = useState(false);
   const [showLang, setShowLang] = useState(false);
   const [notifications, setNotifications] = useState([]);
-  const [unreadCount, setUnreadCount] = useState(0);
+
+  const notifSync = useRef(null);
 
   const fetchNotifs = useCallback(() => {
-    API.get('/api/notifications').then(res => {
-      setNotifications(res.data);
-      setUnreadCount(res.data.filter(n => !n.is_read).length);
-    }).catch(() => {});
+    syncList('/api/notifications', {}, notifSync, setNotifications, 'notification_id').catch(() => {});
   }, []);
 
   useEffect(() => {
@@ -26,10 +24,11 @@ export default function Header() {
     return () => clearInterval(interval);
   }, [fetchNotifs]);
 
+  const unreadCount = notifications.filter(n => !n.is_read).length;
+
   const markRead = async (id) => {
     await API.put(`/api/notifications/${id}/read`).catch(() => {});
     setNotifications(prev => prev.map(n => n.notification_id === id ? { ...n, is_read: true } : n));
-    setUnreadCount(prev => Math.max(0, prev - 1));
   };
 
   const handleLangSwitch = (lang) => {
@@ -1,5 +1,5 @@
-import React, { useState, useEffect, useCallback } from 'react';
-import API from '../../api';
+import React, { useState, useEffect, useCallback, useRef } from 'react';
+import API, { syncList } from '../../api';
 import { useAuth } from '../../context/AuthContext';
 import { useLanguage } from '../../context/LanguageContext';
 import { Plus, Search, Edit2, Trash2, Eye, X, ChevronRight, GripVertical } from 'lucide-react';
@@ -27,8 +27,10 @@ export default function Courses() {
   const [confirmDelete, setConfirmDelete] = useState(null);
   const [editingLesson, setEditingLesson] = useState(null);
 
+  const courseSync = useRef(null);
+
   const fetchCourses = useCallback(() => {
-    API.get('/api/courses', { params: { search: search || undefined } }).then(r => setCourses(r.data)).catch(() => {}).finally(() => setLoading(false));
+    syncList('/api/courses', { search: search || undefined }, courseSync, setCourses, 'course_id').catch(() => {}).finally(() => setLoading(false));
   }, [search]);
 
   useEffect(() => { fetchCourses(); const interval = setInterval(fetchCourses, 20000); return () => clearInterval(interval); }, [fetchCourses]);
@@ -255,7 +257,7 @@ export default function Courses() {
                           <span className={`text-xs px-1.5 py-0.5 rounded ${l.type === 'video' ? 'bg-blue-50 text-blue-600' : l.type === 'text' ? 'bg-green-50 text-green-600' : 'bg-purple-50 text-purple-600'}`}>{l.type}</span>
                         </div>
                         <button onClick={() => deleteLesson(l.lesson_id)} className="p-1 rounded hover:bg-red-50 text-red-400"><Trash2 size={12} /></button>
-                        <button onClick={() => setEditingLesson(l)} className="p-1 rounded hover:bg-[#F0FDFA] text-[#0D9488]" data-testid={`edit-lesson-${l.lesson_id}`}><Edit2 size={12} /></button>
+                        <button onClick={() => API.get(`/api/lessons/${l.lesson_id}`).then(r => setEditingLesson(r.data)).catch(() => toast.error('Error loading lesson'))} className="p-1 rounded hover:bg-[#F0FDFA] text-[#0D9488]" data-testid={`edit-lesson-${l.lesson_id}`}><Edit2 size={12} /></button>
                       </div>
                     ))}
                     {lessonForm?.moduleId === m.module_id ? (
@@ -1,5 +1,5 @@
-import React, { useState, useEffect, useCallback } from 'react';
-import API from '../../api';
+import React, { useState, useEffect, useCallback, useRef } from 'react';
+import API, { syncList } from '../../api';
 import { useLanguage } from '../../context/LanguageContext';
 import { Plus, Search, Edit2, Trash2, X, ShieldBan, ShieldCheck, Eye, ChevronDown } from 'lucide-react';
 import ConfirmModal from '../../components/ConfirmModal';
@@ -43,11 +43,13 @@ export default function Users({ role: filterRole }) {
     course_ids: []
   };
 
+  const userSync = useRef(null);
+
   const fetchData = useCallback(() => {
     Promise.all([
-      API.get('/api/users', { params: { role: filterRole, search: search || undefined } }),
-      API.get('/api/courses')
-    ]).then(([u, c]) => { setUsers(u.data); setCourses(c.data); }).catch(() => {}).finally(() => setLoading(false));
+      syncList('/api/users', { role: filterRole, search: search || undefined }, userSync, setUsers, 'user_id'),
+      API.get('/api/courses').then(c => setCourses(c.data))
+    ]).catch(() => {}).finally(() => setLoading(false));
   }, [search, filterRole]);
 
   useEffect(() => { fetchData(); const interval = setInterval(fetchData, 20000); return () => clearInterval(interval); }, [fetchData]);
@@ -1,4 +1,4 @@
-import React, { useState, useEffect, useCallback } from 'react';
+import React, { useState, useEffect, useCallback, useRef } from 'react';
 import { useParams, useNavigate } from 'react-router-dom';
 import API from '../../api';
 import { useAuth } from '../../context/AuthContext';
@@ -14,23 +14,30 @@ export default function CourseView() {
   const [course, setCourse] = useState(null);
   const [enrollment, setEnrollment] = useState(null);
   const [activeLesson, setActiveLesson] = useState(null);
+  const [lessonBody, setLessonBody] = useState(null);
   const [expandedModules, setExpandedModules] = useState({});
   const [quizzes, setQuizzes] = useState([]);
   const [certStatus, setCertStatus] = useState(null);
   const [loading, setLoading] = useState(true);
 
+  const courseSync = useRef(null);
+
   const fetchCourseData = useCallback(() => {
+    // Polls send the last seen course version and get 204 back while nothing changed
+    const since = courseSync.current?.courseId === courseId ? courseSync.current.version : undefined;
     Promise.all([
-      API.get(`/api/courses/${courseId}`),
+      API.get(`/api/courses/${courseId}`, { params: { since } }),
       API.get('/api/enrollments', { params: { course_id: courseId } }),
       API.get('/api/quizzes', { params: { course_id: courseId } }),
       API.get(`/api/certificates/check/${courseId}`).catch(() => ({ data: null })),
     ]).then(([c, e, q, cert]) => {
-      setCourse(c.data);
       const myEnrollment = e.data.find(en => en.student_id === user?.user_id);
       setEnrollment(myEnrollment);
       setQuizzes(q.data);
       setCertStatus(cert.data);
+      if (c.status === 204) return;
+      courseSync.current = { courseId, version: c.data.version || 0 };
+      setCourse(c.data);
       const expanded = {};
       c.data.modules?.forEach(m => { expanded[m.module_id] = true; });
       setExpandedModules(expanded);
@@ -40,6 +47,13 @@ export default function CourseView() {
     }).catch(() => toast.error('Error loading course')).finally(() => setLoading(false));
   }, [courseId, user?.user_id]);
 
+  // Course data is an outline; load the active lesson's body on demand
+  useEffect(() => {
+    if (!activeLesson?.lesson_id) return;
+    setLessonBody(null);
+    API.get(`/api/lessons/${activeLesson.lesson_id}`).then(r => setLessonBody(r.data)).catch(() => toast.error('Error loading lesson'));
+  }, [activeLesson?.lesson_id]);
+
   // Poll for live updates
   useEffect(() => {
     fetchCourseData();
@@ -180,14 +194,14 @@ export default function CourseView() {
             </div>
             <h1 className="text-2xl font-bold text-[#0F172A] mb-6">{activeLesson.title}</h1>
 
-            {activeLesson.youtube_url && (
+            {lessonBody?.youtube_url && (
               <div className="aspect-video rounded-2xl overflow-hidden mb-6 bg-[#0F172A] shadow-lg">
-                <iframe src={activeLesson.youtube_url} className="w-full h-full" allow="accelerometer; autoplay; clipboard-write; encrypted-media; gyroscope; picture-in-picture" allowFullScreen title={activeLesson.title} />
+                <iframe src={lessonBody.youtube_url} className="w-full h-full" allow="accelerometer; autoplay; clipboard-write; encrypted-media; gyroscope; picture-in-picture" allowFullScreen title={activeLesson.title} />
               </div>
             )}
 
             <div className="bg-white rounded-2xl border border-[#E2E8F0] p-6 md:p-8 prose shadow-sm" data-testid="lesson-text-content">
-              <div dangerouslySetInnerHTML={{ __html: activeLesson.content }} />
+              <div dangerouslySetInnerHTML={{ __html: lessonBody?.content || '' }} />
             </div>
 
             <div className="mt-6 flex items-center justify-between">
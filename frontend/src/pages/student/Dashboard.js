@@ -1,8 +1,8 @@
-import React, { useState, useEffect, useCallback } from 'react';
+import React, { useState, useEffect, useCallback, useRef } from 'react';
 import { useNavigate } from 'react-router-dom';
 import { useAuth } from '../../context/AuthContext';
 import { useLanguage } from '../../context/LanguageContext';
-import API from '../../api';
+import { syncList } from '../../api';
 import { BookOpen, Clock, CheckCircle2, TrendingUp, ChevronRight, Sparkles } from 'lucide-react';
 
 export default function StudentDashboard() {
@@ -13,10 +13,10 @@ export default function StudentDashboard() {
   const [loading, setLoading] = useState(true);
   const [activeTab, setActiveTab] = useState('active');
 
+  const enrollmentSync = useRef(null);
+
   const fetchEnrollments = useCallback(() => {
-    API.get('/api/enrollments').then(r => {
-      setEnrollments(r.data);
-    }).catch(() => {}).finally(() => setLoading(false));
+    syncList('/api/enrollments', {}, enrollmentSync, setEnrollments, 'enrollment_id').catch(() => {}).finally(() => setLoading(false));
   }, []);
 
   useEffect(() => {